@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from flag_catalog import load_catalog
+from flag_generator import generate_flags
+from flag_index import FlagIndex
+from flag_matrix import AttributeMatrix
+
+# -------------------------
+# Batched query evaluation
+# -------------------------
+# Evaluates a batch of random colour/pattern queries (the shapes an
+# analytics job or a test harness fires off) two ways: one search() call
+# per query against the bitset index, and one pass through the dense
+# attribute matrix. Both must produce the same result sets.
+
+
+def random_queries(index, count, seed):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        colours = rng.sample(index.colours, rng.randint(0, 3))
+        patterns = rng.sample(index.patterns, rng.randint(0, 1))
+        queries.append((colours, patterns))
+    return queries
+
+
+def best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        value = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return value, best * 1000
+
+
+def bench(label, index, queries, repeat):
+    started = time.perf_counter()
+    matrix = AttributeMatrix.from_index(index)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    looped, loop_ms = best_of(lambda: [index.search(c, p) for c, p in queries], repeat)
+    looped_counts, count_ms = best_of(lambda: [index.count(c, p) for c, p in queries], repeat)
+    batched, batch_ms = best_of(lambda: matrix.batch_results(queries), repeat)
+    batched_counts, batch_count_ms = best_of(lambda: matrix.batch_counts(queries), repeat)
+
+    ok = (
+        [[f["code"] for f in r] for r in looped] == [[f["code"] for f in r] for r in batched]
+        and looped_counts == batched_counts
+    )
+    return {
+        "catalog": label,
+        "flags": index.size,
+        "attributes": len(matrix.attributes),
+        "queries": len(queries),
+        "matrix_build_ms": build_ms,
+        "loop_search_ms": loop_ms,
+        "batch_results_ms": batch_ms,
+        "loop_count_ms": count_ms,
+        "batch_counts_ms": batch_count_ms,
+        "identical": ok,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare batched matrix queries with looping over search()")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--scales", default="10000,100000", help="comma-separated synthetic catalog sizes")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+
+    real = load_catalog(BASE_DIR)
+    indexes = {"flags.json": real.index}
+    for size in (int(s) for s in args.scales.split(",") if s.strip()):
+        indexes[f"synthetic {size}"] = FlagIndex(generate_flags(real.flags, size, args.seed))
+
+    results = [
+        bench(label, index, random_queries(index, args.queries, args.seed), args.repeat)
+        for label, index in indexes.items()
+    ]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for r in results:
+            print(
+                f"{r['catalog']:18} {r['queries']} queries  search() loop {r['loop_search_ms']:8.1f} ms  "
+                f"batch {r['batch_results_ms']:8.1f} ms  count() loop {r['loop_count_ms']:7.1f} ms  "
+                f"batch counts {r['batch_counts_ms']:7.1f} ms  {'ok' if r['identical'] else 'MISMATCH'}"
+            )
+    return 0 if all(r["identical"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from flag_catalog import load_catalog
+from flag_colour import NAMED_COLOURS
+from flag_tagging import PALETTE, ColourShares, load_shares
+
+# -------------------------
+# Colour shares
+# -------------------------
+# Times colour share predicates ("blue >= 30%", "mostly red") and exact
+# colour lookups ("exact:#ce1126") at growing catalog sizes, and naming a
+# hex code. Synthetic catalogs reuse the measured rows of real flags (or
+# random rows, and no exact colours, when flag_tagging.py hasn't been run).
+
+CODES = ["#%02x%02x%02x" % rgb for shades in NAMED_COLOURS.values() for rgb in shades]
+
+PREDICATES = {
+    "at_least": lambda shares, rng: shares.compare([rng.choice(PALETTE.names)], ">=", rng.randrange(5, 60)),
+    "at_most": lambda shares, rng: shares.compare([rng.choice(PALETTE.names)], "<=", rng.randrange(0, 20)),
+    "two_colours": lambda shares, rng: shares.compare(rng.sample(PALETTE.names, 2), ">=", rng.randrange(30, 90)),
+    "mostly": lambda shares, rng: shares.mostly([rng.choice(PALETTE.names)]),
+    "exact": lambda shares, rng: shares.exact(rng.choice(CODES)),
+}
+
+
+def synthetic_shares(real, size, rng):
+    if real is None:
+        rows = rng.dirichlet(np.ones(len(PALETTE.names)), size)
+        return ColourShares(PALETTE.names, np.rint(rows * 255).astype(np.uint8), np.ones(size, dtype=bool))
+    picks = rng.choice(np.flatnonzero(real.measured), size)
+    exact = copy.copy(real.exact_colours)
+    exact.images = real.exact_colours.images[picks]
+    return ColourShares(PALETTE.names, real.shares[picks], np.ones(size, dtype=bool), exact)
+
+
+def bench(label, shares, args):
+    result = {"catalog": label, "flags": len(shares.shares), "shares_kb": shares.shares.nbytes / 1024}
+    for name, predicate in PREDICATES.items():
+        if name == "exact" and shares.exact_colours is None:
+            continue
+        rng = random.Random(args.seed)
+        started = time.perf_counter()
+        for _ in range(args.lookups):
+            predicate(shares, rng)
+        result[f"{name}_ms"] = (time.perf_counter() - started) * 1000 / args.lookups
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time colour share predicates")
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--scales", default="10000,100000,300000", help="comma-separated synthetic catalog sizes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+
+    catalog = load_catalog(BASE_DIR)
+    started = time.perf_counter()
+    real = load_shares(catalog)
+    load_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    for code in CODES * 20:
+        PALETTE.name_of(tuple(int(code[i:i + 2], 16) for i in (1, 3, 5)))
+    name_us = (time.perf_counter() - started) * 1e6 / (len(CODES) * 20)
+    rng = np.random.default_rng(args.seed)
+    tables = {}
+    if real is not None:
+        tables["flags.json"] = real
+    for size in (int(s) for s in args.scales.split(",") if s.strip()):
+        tables[f"synthetic {size}"] = synthetic_shares(real, size, rng)
+
+    results = [bench(label, shares, args) for label, shares in tables.items()]
+    if args.json:
+        print(json.dumps({"load_ms": load_ms, "name_of_us": name_us, "results": results}, indent=2))
+        return
+    if real is not None:
+        print(f"load_shares {load_ms:.1f} ms")
+    print(f"hex code -> colour name {name_us:.1f} us")
+    for r in results:
+        timings = "  ".join(f"{name} {r[f'{name}_ms']:6.3f} ms" for name in PREDICATES if f"{name}_ms" in r)
+        print(f"{r['catalog']:18} {r['shares_kb']:8.1f} KB  {timings}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from flag_catalog import build_catalog, load_catalog
+from flag_generator import generate_flags
+from flag_names import NameIndex, name_keys
+from flag_terms import TermResolver, normalize
+
+# -------------------------
+# Country name autocomplete
+# -------------------------
+# Times NameIndex.complete() on the prefixes people type (1 to 6 letters of
+# a real name) against a linear scan over every name, at growing catalog
+# sizes. The index should stay flat while the scan grows with the catalog.
+# "first" is what the first keystroke costs a freshly loaded compiled
+# catalog: mapping the stored index plus one lookup. "typo" is the first
+# misspelt country name resolved on another fresh load (the query box's
+# cold path), and "fuzzy" the same lookups once warm.
+
+
+def prefixes(flags, count, rng):
+    names = [normalize(f["country"]) for f in flags]
+    picked = []
+    for _ in range(count):
+        name = rng.choice(names)
+        picked.append(name[:rng.randint(1, min(6, len(name)))])
+    return picked
+
+
+def linear_complete(keys, flags, prefix, limit):
+    prefix = normalize(prefix)
+    starts, words, seen = [], [], set()
+    for key, position, word in keys:
+        if position not in seen and key.startswith(prefix):
+            seen.add(position)
+            (words if word else starts).append(flags[position])
+    return (starts + words)[:limit]
+
+
+def timed(fn, items):
+    started = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - started) * 1e6 / len(items)
+
+
+def typos(flags, count, rng):
+    # Whole names with two neighbouring letters swapped
+    picked = []
+    for _ in range(count):
+        name = normalize(rng.choice(flags)["country"])
+        i = rng.randrange(len(name) - 1)
+        picked.append(name[:i] + name[i + 1] + name[i] + name[i + 2:])
+    return picked
+
+
+def cold_lookups(flags, prefix, typo_list, limit):
+    catalog_dir = tempfile.mkdtemp(prefix="flag-names-")
+    try:
+        source = os.path.join(catalog_dir, "flags.json")
+        with open(source, "w", encoding="utf-8") as f:
+            json.dump(flags, f)
+        build_catalog(source)
+
+        catalog = load_catalog(catalog_dir)
+        started = time.perf_counter()
+        catalog.names().complete(prefix, limit)
+        first_ms = (time.perf_counter() - started) * 1000
+
+        catalog = load_catalog(catalog_dir)
+        started = time.perf_counter()
+        resolver = TermResolver(catalog.index, catalog.names)
+        resolver.resolve(typo_list[0], ("country",))
+        typo_ms = (time.perf_counter() - started) * 1000
+        fuzzy_us = timed(lambda t: resolver.names.fuzzy(t, 2), typo_list)
+        return first_ms, typo_ms, fuzzy_us
+    finally:
+        shutil.rmtree(catalog_dir, ignore_errors=True)
+
+
+def bench(label, flags, args):
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    index = NameIndex(flags)
+    build_ms = (time.perf_counter() - started) * 1000
+    keys = [entry for i, f in enumerate(flags) for entry in name_keys(f["country"], i)]
+    queries = prefixes(flags, args.lookups, rng)
+    result = {
+        "catalog": label,
+        "flags": len(flags),
+        "build_ms": build_ms,
+        "index_us": timed(lambda p: index.complete(p, args.limit), queries),
+    }
+    result["first_ms"], result["typo_ms"], result["fuzzy_us"] = cold_lookups(
+        flags, queries[0], typos(flags, max(1, args.lookups // 10), rng), args.limit
+    )
+    if len(flags) <= args.scan_max:
+        few = queries[:max(1, args.lookups // 20)]
+        result["scan_us"] = timed(lambda p: linear_complete(keys, flags, p, args.limit), few)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time country name autocomplete against a linear scan")
+    parser.add_argument("--lookups", type=int, default=2_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--scales", default="1000,10000,100000,300000", help="comma-separated synthetic catalog sizes")
+    parser.add_argument("--scan-max", type=int, default=100_000, help="skip the linear scan above this size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+
+    real = load_catalog(BASE_DIR, compiled=False)
+    catalogs = {"flags.json": real.flags}
+    for size in (int(s) for s in args.scales.split(",") if s.strip()):
+        catalogs[f"synthetic {size}"] = generate_flags(real.flags, size, args.seed)
+
+    results = [bench(label, flags, args) for label, flags in catalogs.items()]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for r in results:
+        scan = f"{r['scan_us']:10.1f} us" if "scan_us" in r else "    skipped"
+        print(f"{r['catalog']:18} build {r['build_ms']:8.1f} ms  first {r['first_ms']:6.2f} ms  "
+              f"complete {r['index_us']:6.1f} us  scan {scan}  typo {r['typo_ms']:6.2f} ms  "
+              f"fuzzy {r['fuzzy_us']:7.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from flag_catalog import load_catalog
+from flag_photo import match_photo
+
+# -------------------------
+# Query by image
+# -------------------------
+# End-to-end latency of match_photo() on phone-sized JPEGs: a real flag
+# pasted onto a background at 4000x3000 (12 MP) with sensor noise and a
+# little blur, decoded, clustered and ranked against the catalog. Also
+# reports how often the photographed flag comes back first / in the top 5;
+# the default 100 seeded photos are the set accuracy is quoted on, as a
+# handful of photos swings it by tens of points. Accuracy is much lower
+# until flag_features.py has been run.
+
+
+def fake_photo(path, size, rng):
+    flag = Image.open(path).convert("RGB")
+    width = int(size[0] * rng.uniform(0.6, 1.0))
+    flag = flag.resize((width, width * flag.height // flag.width))
+    photo = Image.new("RGB", size, tuple(rng.randrange(40, 200) for _ in range(3)))
+    photo.paste(flag, ((size[0] - flag.width) // 2, (size[1] - flag.height) // 2))
+    noise = np.random.default_rng(rng.randrange(2**32)).integers(-16, 16, (size[1], size[0], 3), dtype=np.int16)
+    pixels = np.clip(np.asarray(photo, dtype=np.int16) + noise, 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).filter(ImageFilter.GaussianBlur(1.5)).save(buf, "JPEG", quality=88)
+    return buf.getvalue()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time query-by-image on phone-sized photos")
+    parser.add_argument("--photos", type=int, default=100)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    catalog = load_catalog(BASE_DIR)
+    catalog.matrix()
+    catalog.features()
+    flags = rng.sample(catalog.flags, min(args.photos, len(catalog.flags)))
+    photos = [(flag, fake_photo(os.path.join(BASE_DIR, flag["file"]), (args.width, args.height), rng)) for flag in flags]
+
+    timings, first, top5 = [], 0, 0
+    for flag, data in photos:
+        started = time.perf_counter()
+        results, _ = match_photo(catalog, io.BytesIO(data))
+        timings.append((time.perf_counter() - started) * 1000)
+        codes = [f["code"] for f in results]
+        first += codes[:1] == [flag["code"]]
+        top5 += flag["code"] in codes[:5]
+
+    timings.sort()
+    result = {
+        "photos": len(photos),
+        "megapixels": args.width * args.height / 1e6,
+        "median_ms": statistics.median(timings),
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        "max_ms": timings[-1],
+        "top1": first / len(photos),
+        "top5": top5 / len(photos),
+        "features": catalog.features() is not None,
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(
+        f"{result['photos']} photos at {result['megapixels']:.0f} MP  median {result['median_ms']:.1f} ms  "
+        f"p95 {result['p95_ms']:.1f} ms  max {result['max_ms']:.1f} ms  "
+        f"top-1 {result['top1']:.0%}  top-5 {result['top5']:.0%}"
+        + ("" if result["features"] else "  (colours only, no feature vectors)")
+    )
+
+
+if __name__ == "__main__":
+    main()
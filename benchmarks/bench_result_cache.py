@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from flag_catalog import Catalog, load_catalog
+from flag_generator import generate_flags
+from flag_index import FlagIndex
+from flag_query import QueryPlanner
+from flag_search import SearchCache
+
+# -------------------------
+# Result cache under skewed traffic
+# -------------------------
+# Replays a Zipf-distributed stream of searches, the way real traffic keeps
+# repeating a few popular ones, typed with random case, spacing and term
+# order, through SearchCache and straight through the query planner.
+
+
+def distinct_searches(index, count, rng):
+    # Small vocabularies have fewer combinations than asked for, so stop
+    # after a bounded number of draws
+    searches = set()
+    for _ in range(count * 20):
+        if len(searches) >= count:
+            break
+        colours = tuple(sorted(rng.sample(index.colours, rng.randint(0, 3))))
+        patterns = tuple(sorted(rng.sample(index.patterns, rng.randint(0, 1))))
+        searches.add((colours, patterns))
+    return sorted(searches)
+
+
+def scramble(terms, rng):
+    terms = list(terms) * rng.randint(1, 2)
+    rng.shuffle(terms)
+    return [rng.choice((str.upper, str.lower, str.capitalize))(t) + " " * rng.randint(0, 2) for t in terms]
+
+
+def traffic(index, requests, distinct, skew, seed):
+    rng = random.Random(seed)
+    searches = distinct_searches(index, distinct, rng)
+    weights = [1 / (rank + 1) ** skew for rank in range(len(searches))]
+    stream = rng.choices(searches, weights, k=requests)
+    return [(scramble(c, rng), scramble(p, rng)) for c, p in stream]
+
+
+def bench(label, catalog, args):
+    stream = traffic(catalog.index, args.requests, args.distinct, args.skew, args.seed)
+    planner = QueryPlanner(catalog.index)
+    cache = SearchCache(catalog, args.max_entries)
+
+    def normalized(terms):
+        return [t.strip().lower() for t in terms]
+
+    started = time.perf_counter()
+    for colours, patterns in stream:
+        planner.search("", normalized(colours), normalized(patterns))
+    uncached_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    for colours, patterns in stream:
+        cache.search(colours, patterns)
+    cached_ms = (time.perf_counter() - started) * 1000
+
+    return {"catalog": label, "requests": len(stream), "uncached_ms": uncached_ms,
+            "cached_ms": cached_ms, **cache.stats()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay skewed search traffic through the result cache")
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--distinct", type=int, default=2_000, help="distinct searches in the stream")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent")
+    parser.add_argument("--max-entries", type=int, default=256)
+    parser.add_argument("--scales", default="100000", help="comma-separated synthetic catalog sizes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+
+    real = load_catalog(BASE_DIR)
+    catalogs = {"flags.json": real}
+    for size in (int(s) for s in args.scales.split(",") if s.strip()):
+        flags = generate_flags(real.flags, size, args.seed)
+        catalogs[f"synthetic {size}"] = Catalog(flags, FlagIndex(flags), f"synthetic-{size}", None)
+
+    results = [bench(label, catalog, args) for label, catalog in catalogs.items()]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for r in results:
+        print(
+            f"{r['catalog']:18} {r['requests']} requests  uncached {r['uncached_ms']:8.1f} ms  "
+            f"cached {r['cached_ms']:8.1f} ms  hit rate {r['hit_rate']:.1%}  "
+            f"{r['evictions']} evictions"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from flag_catalog import load_catalog
+from flag_features import FEATURES, FeatureIndex, load_features
+from flag_generator import generate_flags
+
+# -------------------------
+# Similar flags
+# -------------------------
+# Times FeatureIndex.similar() at growing catalog sizes. Synthetic flags
+# have no artwork, so each gets a real flag's vector with a little noise
+# (or random vectors when flag_features.py hasn't been run).
+
+
+def synthetic_vectors(real, size, rng):
+    if real is None:
+        vectors = rng.random((size, FEATURES), dtype=np.float32)
+    else:
+        vectors = real.vectors[rng.integers(0, len(real.vectors), size)]
+        vectors = vectors + rng.normal(0, 0.02, vectors.shape).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def bench(label, index, args):
+    rng = random.Random(args.seed)
+    probes = [rng.choice(index.flags) for _ in range(args.lookups)]
+    index.similar(probes[0], args.k)
+    started = time.perf_counter()
+    for flag in probes:
+        index.similar(flag, args.k)
+    elapsed = time.perf_counter() - started
+    return {
+        "catalog": label,
+        "flags": len(index.flags),
+        "vectors_mb": index.vectors.nbytes / 2**20,
+        "similar_ms": elapsed * 1000 / len(probes),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time similar-flag lookups")
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--k", type=int, default=24)
+    parser.add_argument("--scales", default="10000,100000,300000", help="comma-separated synthetic catalog sizes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+
+    catalog = load_catalog(BASE_DIR)
+    real = load_features(catalog)
+    rng = np.random.default_rng(args.seed)
+    indexes = {}
+    if real is not None:
+        indexes["flags.json"] = real
+    for size in (int(s) for s in args.scales.split(",") if s.strip()):
+        flags = generate_flags(catalog.flags, size, args.seed)
+        indexes[f"synthetic {size}"] = FeatureIndex(flags, synthetic_vectors(real, size, rng))
+
+    results = [bench(label, index, args) for label, index in indexes.items()]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for r in results:
+        print(f"{r['catalog']:18} {r['vectors_mb']:7.1f} MB  similar {r['similar_ms']:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from streamlit.testing.v1 import AppTest
+
+# -------------------------
+# Streamlit grid rendering
+# -------------------------
+# Re-runs flag_finder_streamlit.py headlessly in each layout mode and
+# measures rerun wall time and the size of the element protos the rerun
+# produces (what goes down the websocket as deltas). Image elements also
+# cost one HTTP media request each, so those are counted separately.
+#
+# Both app modes draw from the atlas when there is one, so the baseline is
+# the app's original grid: the same flags, each opened at full resolution,
+# resized and sent as its own st.image in an st.columns row.
+
+APP = os.path.join(BASE_DIR, "flag_finder_streamlit.py")
+
+
+def _walk(node):
+    proto = getattr(node, "proto", None)
+    size = proto.ByteSize() if proto is not None and hasattr(proto, "ByteSize") else 0
+    elements = 1 if proto is not None else 0
+    images = 1 if getattr(node, "type", None) == "image" else 0
+    for child in getattr(node, "children", {}).values():
+        child_size, child_elements, child_images = _walk(child)
+        size += child_size
+        elements += child_elements
+        images += child_images
+    return size, elements, images
+
+
+def image_grid(base_dir, flags):
+    import os
+
+    import streamlit as st
+    from PIL import Image, ImageDraw
+
+    def load_flag_image(path):
+        try:
+            img = Image.open(os.path.join(base_dir, path)).resize((80, 50))
+        except FileNotFoundError:
+            img = Image.new("RGB", (80, 50), color="gray")
+            ImageDraw.Draw(img).text((5, 20), "No Img", fill="white")
+        return img
+
+    for i in range(0, len(flags), 6):
+        row_flags = flags[i:i + 6]
+        cols = st.columns(len(row_flags))
+        for col, flag in zip(cols, row_flags):
+            col.image(load_flag_image(flag["file"]))
+            col.caption(flag["country"].capitalize())
+
+
+def bench_baseline(flags, reruns):
+    at = AppTest.from_function(image_grid, args=(BASE_DIR, flags), default_timeout=120)
+    at.run()
+    return _measure(at, "st.image", len(flags), reruns)
+
+
+def bench_mode(mode, reruns):
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.run()
+    at.sidebar.radio[0].set_value(mode)
+    at.run()
+    flags = list(at.session_state["results"])
+    return _measure(at, mode, len(flags), reruns), flags
+
+
+def _measure(at, mode, flags, reruns):
+    timings = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - started)
+
+    payload, elements, images = _walk(at._tree)
+    return {
+        "mode": mode,
+        "flags": flags,
+        "rerun_ms_median": statistics.median(timings) * 1000,
+        "rerun_ms_min": min(timings) * 1000,
+        "delta_bytes": payload,
+        "elements": elements,
+        "media_requests": images,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare Streamlit grid render modes")
+    parser.add_argument("--reruns", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+
+    results = []
+    for mode in ("Columns", "Mosaic"):
+        result, flags = bench_mode(mode, args.reruns)
+        results.append(result)
+    results.insert(0, bench_baseline(flags, args.reruns))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for r in results:
+        print(
+            f"{r['mode']:9} {r['flags']} flags  rerun {r['rerun_ms_median']:7.1f} ms  "
+            f"deltas {r['delta_bytes'] / 1024:7.1f} KB  {r['elements']} elements  "
+            f"{r['media_requests']} media requests"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import json
+import mmap
+import os
+import random
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from flag_catalog import load_catalog
+from flag_generator import generate_flags
+from flag_text import TextIndex, _WORDS
+from flag_terms import normalize
+
+# -------------------------
+# Fun fact full-text search
+# -------------------------
+# Builds the BM25 index for the real and synthetic catalogs, writes it out
+# and maps it back the way the compiled catalog does, then replays one to
+# three word queries drawn from the facts themselves on one core.
+
+
+def queries(flags, count, rng):
+    words = sorted({w for f in flags[:5000] for w in _WORDS.findall(normalize(f.get("fun_fact", ""))) if len(w) > 3})
+    return [" ".join(rng.sample(words, rng.randint(1, 3))) for _ in range(count)]
+
+
+def bench(label, flags, args):
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    built = TextIndex.build(flags)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    with tempfile.TemporaryFile() as f:
+        f.write(built.to_bytes())
+        f.flush()
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        started = time.perf_counter()
+        index = TextIndex.from_buffer(buf)
+        load_ms = (time.perf_counter() - started) * 1000
+
+        stream = queries(flags, args.queries, rng)
+        started = time.perf_counter()
+        hits = sum(len(index.search(q, args.limit)) for q in stream)
+        elapsed = time.perf_counter() - started
+        del index
+        buf.close()
+
+    return {
+        "catalog": label,
+        "flags": len(flags),
+        "terms": len(built.terms),
+        "postings": len(built.docs),
+        "build_ms": build_ms,
+        "load_ms": load_ms,
+        "queries_per_s": len(stream) / elapsed,
+        "mean_hits": hits / len(stream),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time BM25 fun fact search")
+    parser.add_argument("--queries", type=int, default=5_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--scales", default="10000,100000", help="comma-separated synthetic catalog sizes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+
+    real = load_catalog(BASE_DIR)
+    catalogs = {"flags.json": real.flags}
+    for size in (int(s) for s in args.scales.split(",") if s.strip()):
+        catalogs[f"synthetic {size}"] = generate_flags(real.flags, size, args.seed)
+
+    results = [bench(label, flags, args) for label, flags in catalogs.items()]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for r in results:
+        print(
+            f"{r['catalog']:18} {r['terms']:6} terms {r['postings']:8} postings  build {r['build_ms']:8.1f} ms  "
+            f"load {r['load_ms']:6.2f} ms  {r['queries_per_s']:8.0f} queries/s  {r['mean_hits']:.1f} hits"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from nicegui import Client, core
+from nicegui.page import page
+
+import flag_finder_nicegui as ng_app
+from flag_session import LOAD_BATCH
+
+# -------------------------
+# Concurrent session load test
+# -------------------------
+# Simulates many browsers on the NiceGUI page at once. Each client gets its
+# own FlagFinderPage, types its own search into the page's inputs and then
+# scrolls with random pauses, so the live searches and scroll events of all
+# the pages interleave on one event loop, exactly like concurrent websocket
+# handlers. Every page must end up showing its own full, in-order result
+# list in its own tile row, whatever the other pages were doing.
+
+ROW_HEIGHT = 120
+VIEWPORT = 800
+
+
+async def type_search(view, colours, patterns):
+    view.search_colours.set_value(', '.join(colours))
+    view.search_patterns.set_value(', '.join(patterns))
+    # Each value change restarts the debounced live search; wait for the last
+    await view.live_task
+
+
+async def scroll_to_end(rng, view):
+    scroll_top = 0
+    while view.session.has_more():
+        await asyncio.sleep(rng.random() * 0.002)
+        scroll_height = (len(view.tile_row.default_slot.children) // 6 + 1) * ROW_HEIGHT
+        scroll_top = min(scroll_top + rng.randint(100, 900), max(0, scroll_height - VIEWPORT))
+        view.handle_scroll(SimpleNamespace(args={
+            'scrollTop': scroll_top, 'clientHeight': VIEWPORT, 'scrollHeight': scroll_height,
+        }))
+
+
+def check_page(view, expected):
+    # The page's own session holds its results, scrolled to the end, and its
+    # tile row shows exactly those flags, in order
+    codes = [flag["code"] for flag in expected]
+    tiles = [view.tiles.get(code) for code in codes]
+    return (
+        [flag["code"] for flag in view.session.results] == codes
+        and view.session.shown_count == len(expected)
+        and view.tile_row.default_slot.children == tiles
+        and all(tile is not None and tile.parent_slot.parent is view.tile_row for tile in tiles)
+    )
+
+
+async def simulate_client(rng, view, searches):
+    ok = True
+    expected = []
+    for _ in range(searches):
+        colours = rng.sample(ng_app.INDEX.colours, rng.randint(1, 2))
+        patterns = rng.sample(ng_app.INDEX.patterns, rng.randint(0, 1))
+        expected = ng_app.INDEX.search(colours, patterns)
+        if not expected:
+            expected = ng_app.closest(colours, patterns)
+        await type_search(view, colours, patterns)
+        await scroll_to_end(rng, view)
+        ok = ok and check_page(view, expected)
+    return ok, len(expected)
+
+
+async def run(clients, searches, seed):
+    # The live search runs as a NiceGUI background task, which goes on the
+    # loop ui.run would otherwise have set up
+    core.loop = asyncio.get_running_loop()
+    rng = random.Random(seed)
+    pages = []
+    for _ in range(clients):
+        client = Client(page('/load'), request=None)
+        with client:
+            pages.append((client, ng_app.FlagFinderPage()))
+
+    tasks = [simulate_client(random.Random(rng.random()), view, searches) for _, view in pages]
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    # No two pages may share a session or a tile
+    sessions = {id(view.session) for _, view in pages}
+    tiles = [id(tile) for _, view in pages for tile in view.tile_row.default_slot.children]
+    isolated = len(sessions) == len(pages) and len(set(tiles)) == len(tiles)
+    for client, _ in pages:
+        client.delete()
+    return outcomes, isolated, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent NiceGUI pages searching and scrolling their own results")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--searches", type=int, default=3, help="searches per client")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    outcomes, isolated, elapsed = asyncio.run(run(args.clients, args.searches, args.seed))
+    failed = sum(1 for ok, _ in outcomes if not ok)
+    batches = sum(-(-total // LOAD_BATCH) for _, total in outcomes) * args.searches
+    print(f"{args.clients} pages, {batches} batches in {elapsed:.2f}s: {args.clients - failed} correct, {failed} wrong"
+          + ("" if isolated else ", pages shared sessions or tiles"))
+    return 1 if failed or not isolated else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
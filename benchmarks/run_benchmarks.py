@@ -0,0 +1,313 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from PIL import Image
+
+from flag_catalog import build_catalog, load_catalog
+from flag_generator import generate_flags
+from flag_thumbnails import ThumbnailCache
+
+# -------------------------
+# Benchmark suite
+# -------------------------
+# Times catalog loading, search, thumbnail loading and grid construction
+# against the real flags.json and synthetic catalogs, and writes one JSON
+# document so runs on different commits can be diffed:
+#
+#   python benchmarks/run_benchmarks.py --output bench_output.txt
+#
+# The Tkinter benchmark needs a display; on a headless box run it under a
+# virtual one (xvfb-run python benchmarks/run_benchmarks.py). Without a
+# display it is reported as skipped. A stage that fails is reported as
+# {"error": ...} and the rest of the suite still runs.
+
+DEFAULT_SCALES = (10_000, 100_000)
+
+QUERY_SHAPES = {
+    "empty": ([], []),
+    "single_colour": (["red"], []),
+    "many_colours": (["red", "white", "blue", "yellow"], []),
+    "colour_pattern": (["red", "white"], ["star"]),
+    "zero_hit": (["maroon", "orange"], ["dragon"]),
+}
+
+
+def timed(fn, repeat, number=1, setup=None):
+    # setup runs before each timed run, outside the timer
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - started) / number * 1000)
+    times.sort()
+    return {
+        "runs": repeat * number,
+        "min_ms": times[0],
+        "median_ms": statistics.median(times),
+        "mean_ms": statistics.fmean(times),
+        "p95_ms": times[min(len(times) - 1, int(len(times) * 0.95))],
+    }
+
+
+def failed(e):
+    return {"error": f"{type(e).__name__}: {e}"}
+
+
+def linear_search(flags, colours, patterns):
+    # The per-flag scan the frontends used before the bitset index, kept as
+    # a reference point
+    results = []
+    for flag in flags:
+        if colours and not all(c in flag["colours"] for c in colours):
+            continue
+        if patterns and not all(p in flag["patterns"] for p in patterns):
+            continue
+        results.append(flag)
+    return results
+
+
+# -------------------------
+# Benchmarks
+# -------------------------
+def bench_catalog_load(catalog_dir, repeat):
+    source = os.path.join(catalog_dir, "flags.json")
+    build_catalog(source)
+
+    def json_load():
+        with open(source, "r", encoding="utf-8") as f:
+            json.load(f)
+
+    return {
+        "json.load": timed(json_load, repeat),
+        "load_catalog (json)": timed(lambda: load_catalog(catalog_dir, compiled=False), repeat),
+        "load_catalog (compiled)": timed(lambda: load_catalog(catalog_dir), repeat),
+    }
+
+
+def bench_search(catalog, repeat):
+    results = {}
+    for shape, (colours, patterns) in QUERY_SHAPES.items():
+        number = 50 if catalog.index.size <= 10_000 else 5
+        results[shape] = {
+            "hits": catalog.index.count(colours, patterns),
+            "search": timed(lambda: catalog.index.search(colours, patterns), repeat, number),
+            "count": timed(lambda: catalog.index.count(colours, patterns), repeat, number),
+            "facets": timed(lambda: catalog.index.facets(catalog.index.mask(colours, patterns)), repeat, number),
+            "closest": timed(lambda: catalog.matrix().closest(
+                {("colour", c) for c in colours} | {("pattern", p) for p in patterns}), repeat, number),
+            "linear_scan": timed(lambda: linear_search(catalog.flags, colours, patterns), max(3, repeat // 5)),
+        }
+    return results
+
+
+def bench_flag_images(flags, sample):
+    files = [flag["file"] for flag in flags[:sample]]
+    cache_dir = tempfile.mkdtemp(prefix="flag-thumbs-")
+    try:
+        cold = ThumbnailCache(BASE_DIR, cache_dir)
+        cold_runs = iter(files)
+        cold_stats = timed(lambda: cold.load(next(cold_runs)), len(files))
+        warm = ThumbnailCache(BASE_DIR, cache_dir)
+        warm_runs = iter(files * 5)
+        warm_stats = timed(lambda: warm.load(next(warm_runs)), len(files) * 5)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    originals = iter(files)
+
+    def decode_original():
+        with Image.open(os.path.join(BASE_DIR, next(originals))) as img:
+            img.resize((80, 50))
+
+    return {
+        "flags": len(files),
+        "load_flag_image (cold)": cold_stats,
+        "load_flag_image (warm)": warm_stats,
+        "decode original + resize": timed(decode_original, len(files)),
+    }
+
+
+def bench_tkinter(result_sets, repeat):
+    if not os.environ.get("DISPLAY") and sys.platform.startswith("linux"):
+        return {"skipped": "no display (run under xvfb-run)"}
+    try:
+        import flag_finder_tkinter as tk_app
+    except Exception as e:
+        return {"skipped": f"{type(e).__name__}: {e}"}
+
+    results = {}
+    try:
+        tk_app.root.geometry("1280x800")
+        tk_app.controls_frame.place_forget()
+        tk_app.root.update()
+
+        for label, flags in result_sets.items():
+            def show():
+                tk_app.display_flags(flags)
+                tk_app.root.update_idletasks()
+
+            def resize():
+                tk_app.grid.canvas.config(width=900)
+                tk_app.grid.layout()
+                tk_app.root.update_idletasks()
+                tk_app.grid.canvas.config(width=1280)
+                tk_app.grid.layout()
+                tk_app.root.update_idletasks()
+
+            def scroll():
+                tk_app.grid.canvas.yview_scroll(3, "units")
+                tk_app.root.update_idletasks()
+
+            results[label] = {
+                "display_flags": timed(show, repeat),
+                "resize_relayout": timed(resize, repeat),
+                "scroll": timed(scroll, repeat * 5),
+                "cells": len(tk_app.grid.cells),
+            }
+    except Exception as e:
+        return failed(e)
+    finally:
+        tk_app.root.destroy()
+    return results
+
+
+def bench_nicegui(result_sets, repeat):
+    try:
+        from nicegui import Client
+        from nicegui.page import page
+        import flag_finder_nicegui as ng_app
+    except Exception as e:
+        return {"skipped": f"{type(e).__name__}: {e}"}
+
+    results = {}
+    try:
+        with Client(page("/benchmark"), request=None):
+            view = ng_app.FlagFinderPage()
+            for label, flags in result_sets.items():
+                # Tiles are reused across searches, so empty the page first
+                # or every run after the first would redraw nothing
+                def clear():
+                    view.session.start([])
+                    view.display_flags()
+
+                def first_batch():
+                    view.session.start(flags)
+                    view.display_flags()
+
+                def next_batch():
+                    if not view.session.has_more():
+                        view.session.start(flags)
+                    view.display_flags(append=True)
+
+                results[label] = {
+                    "display_flags": timed(first_batch, repeat, setup=clear),
+                    "display_flags (append)": timed(next_batch, repeat),
+                    "elements": len(list(view.result_container.descendants())),
+                }
+    except Exception as e:
+        return failed(e)
+    return results
+
+
+# -------------------------
+# Runner
+# -------------------------
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scales, repeat, image_sample, only):
+    real = load_catalog(BASE_DIR)
+    catalogs = {"flags.json": (BASE_DIR, real)}
+    tmp_dirs = []
+    for size in scales:
+        catalog_dir = tempfile.mkdtemp(prefix=f"flag-catalog-{size}-")
+        tmp_dirs.append(catalog_dir)
+        with open(os.path.join(catalog_dir, "flags.json"), "w", encoding="utf-8") as f:
+            json.dump(generate_flags(real.flags, size), f)
+        catalogs[f"synthetic {size}"] = (catalog_dir, load_catalog(catalog_dir))
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "repeat": repeat,
+        "benchmarks": {},
+    }
+    benches = report["benchmarks"]
+
+    def catalog_load():
+        results = {
+            label: bench_catalog_load(catalog_dir, repeat) for label, (catalog_dir, _) in catalogs.items()
+            if catalog_dir != BASE_DIR
+        }
+        scratch = tempfile.mkdtemp(prefix="flag-catalog-real-")
+        tmp_dirs.append(scratch)
+        shutil.copyfile(os.path.join(BASE_DIR, "flags.json"), os.path.join(scratch, "flags.json"))
+        results["flags.json"] = bench_catalog_load(scratch, repeat)
+        return results
+
+    result_sets = {label: catalog.flags for label, (_, catalog) in catalogs.items()}
+    stages = [
+        ("catalog", "catalog_load", catalog_load),
+        ("search", "search", lambda: {label: bench_search(catalog, repeat) for label, (_, catalog) in catalogs.items()}),
+        ("images", "flag_images", lambda: bench_flag_images(real.flags, image_sample)),
+        ("tkinter", "tkinter_grid", lambda: bench_tkinter(result_sets, max(3, repeat // 4))),
+        ("nicegui", "nicegui_grid", lambda: bench_nicegui(result_sets, max(3, repeat // 4))),
+    ]
+    try:
+        for name, key, stage in stages:
+            if name not in only:
+                continue
+            try:
+                benches[key] = stage()
+            except Exception as e:
+                benches[key] = failed(e)
+    finally:
+        for path in tmp_dirs:
+            shutil.rmtree(path, ignore_errors=True)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flag Finder benchmark suite")
+    parser.add_argument("--scales", default=",".join(str(s) for s in DEFAULT_SCALES),
+                        help="comma-separated synthetic catalog sizes (empty for none)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--images", type=int, default=40, help="flags sampled for the thumbnail benchmark")
+    parser.add_argument("--only", default="catalog,search,images,tkinter,nicegui")
+    parser.add_argument("--output", default=None, help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    report = run(scales, args.repeat, args.images, set(args.only.split(",")))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,446 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+from collections.abc import Mapping, Sequence
+
+from flag_index import FlagIndex
+
+# -------------------------
+# Compiled catalog format
+# -------------------------
+# flags.catalog is flags.json compiled into one little-endian file that the
+# apps memory-map at startup instead of parsing JSON:
+#
+#   header    magic, format version, flag count, flags.json size + mtime,
+#             sha1 of flags.json, then an (offset, length) pair per section
+#   strings   interned string table: count, byte offsets[count + 1],
+#             utf-8 blob
+#   flags     (country, code, file) string ids per flag
+#   colours   colour id column: offsets[n + 1], u16 vocab ids
+#   patterns  pattern id column: offsets[n + 1], u16 vocab ids
+#   vocab     sorted colour/pattern string ids and the example flag shown
+#             for each pattern in the help
+#   masks     one precomputed bitmask per colour then per pattern
+#   facts     fun_fact offsets[n + 1] and utf-8 blob, decoded on demand
+#   text      BM25 postings over the fun facts (see flag_text), mapped
+#             as they are the first time a text search runs
+#   names     sorted country name keys for autocomplete and trigram
+#             postings for misspelt names (see flag_names), mapped the
+#             same way
+#
+# Loading reads nothing per flag: the flags are a sequence over the mapped
+# columns that builds a flag's record the first time it is asked for, and
+# each mask is read out of the mapped file the first time it is used, so
+# every worker shares the same pages instead of holding its own catalog.
+#
+# The artifact is stale (and flags.json is loaded instead) whenever the
+# recorded size/mtime of flags.json no longer matches or the format
+# version has moved on.
+
+MAGIC = b"FLAGCAT\0"
+FORMAT_VERSION = 5
+SECTIONS = ("strings", "flags", "colours", "patterns", "vocab", "masks", "facts", "text", "names")
+
+HEADER = struct.Struct("<8sIIQq20s")
+SECTION = struct.Struct("<QQ")
+
+DEFAULT_SOURCE = "flags.json"
+
+# Points the apps and tools at another flags.json (e.g. one written by
+# flag_generator.py); its images are resolved relative to that file
+CATALOG_ENV = "FLAG_FINDER_CATALOG"
+
+
+def catalog_location(base_dir):
+    path = os.environ.get(CATALOG_ENV)
+    if not path:
+        return base_dir, DEFAULT_SOURCE
+    path = os.path.abspath(path)
+    return os.path.dirname(path), os.path.basename(path)
+
+
+def artifact_path(source):
+    return os.path.splitext(source)[0] + ".catalog"
+
+
+def _u32s(values):
+    return struct.pack(f"<{len(values)}I", *values)
+
+
+def _read_u32s(buf, offset, count):
+    return struct.unpack_from(f"<{count}I", buf, offset)
+
+
+def _mask_bytes(mask, size):
+    return mask.to_bytes((size + 7) // 8, "little")
+
+
+# -------------------------
+# Catalog
+# -------------------------
+class Catalog:
+    def __init__(self, flags, index, version, source, compiled=False):
+        self.flags = flags
+        self.index = index
+        self.version = version
+        self.source = source
+        self.compiled = compiled
+        self._matrix = None
+        self._names = None
+        # (buffer, offset) of the text and names sections in a compiled
+        # catalog
+        self._text_source = None
+        self._names_source = None
+        self._text = None
+        self._features = None
+        # features_stamp() of the files when they last failed to load
+        self._features_missed = None
+        self._shares = None
+
+    @property
+    def colours(self):
+        return self.index.colours
+
+    @property
+    def patterns(self):
+        return self.index.patterns
+
+    def example_flag(self, pattern):
+        return self.index.example(pattern)
+
+    def matrix(self):
+        # Dense attribute matrix for batched queries; NumPy is only imported
+        # the first time something asks for it
+        if self._matrix is None:
+            from flag_matrix import AttributeMatrix
+            self._matrix = AttributeMatrix.from_index(self.index)
+        return self._matrix
+
+    def names(self):
+        # Country name autocomplete index: mapped from the compiled catalog,
+        # or built from the flags on first use
+        if self._names is None:
+            from flag_names import NameIndex
+            if self._names_source is not None:
+                self._names = NameIndex.from_buffer(*self._names_source, self.flags)
+            else:
+                self._names = NameIndex(self.flags)
+        return self._names
+
+    def text(self):
+        # Fun fact full-text index: mapped from the compiled catalog, or
+        # built from the flags when there isn't one
+        if self._text is None:
+            from flag_text import TextIndex
+            if self._text_source is not None:
+                self._text = TextIndex.from_buffer(*self._text_source)
+            else:
+                self._text = TextIndex.build(self.flags)
+        return self._text
+
+    def features(self):
+        # Image feature vectors written by flag_features.py, or None until
+        # they have been built
+        if self._features is None:
+            from flag_features import features_stamp, load_features
+            stamp = features_stamp(self.source)
+            if stamp != self._features_missed:
+                self._features = load_features(self)
+                self._features_missed = stamp
+        return self._features
+
+    def shares(self):
+        # Measured colour area of every flag from flag_tagging.py, or None
+        # until it has been run
+        if self._shares is None:
+            from flag_tagging import load_shares
+            self._shares = load_shares(self)
+        return self._shares
+
+
+class _MappedMasks(Mapping):
+    # name -> bitmask for one run of masks in the mapped file; each is
+    # turned into an int the first time it is looked up
+    def __init__(self, buf, offset, width, names):
+        self._buf = buf
+        self._offsets = {name: offset + i * width for i, name in enumerate(names)}
+        self._width = width
+        self._masks = {}
+
+    def __getitem__(self, name):
+        mask = self._masks.get(name)
+        if mask is None:
+            off = self._offsets[name]
+            mask = self._masks[name] = int.from_bytes(self._buf[off:off + self._width], "little")
+        return mask
+
+    def __iter__(self):
+        return iter(self._offsets)
+
+    def __len__(self):
+        return len(self._offsets)
+
+
+class _FlagTable(Sequence):
+    # The compiled catalog's flags, read-only, over the mapped columns. A
+    # flag's record is built the first time it is asked for and kept, so
+    # the same position always gives the same dict.
+    def __init__(self, buf, n, sections):
+        view = memoryview(buf)
+        self._buf = buf
+        self._n = n
+
+        off, _ = sections["strings"]
+        (count,) = _read_u32s(buf, off, 1)
+        self._string_offsets = view[off + 4:off + 4 * (count + 2)].cast("I")
+        self._string_blob = off + 4 * (count + 2)
+
+        off, _ = sections["vocab"]
+        n_colours, n_patterns = _read_u32s(buf, off, 2)
+        vocab = [self._string(sid) for sid in _read_u32s(buf, off + 8, n_colours + n_patterns)]
+        self.colours, self.patterns = vocab[:n_colours], vocab[n_colours:]
+        examples = _read_u32s(buf, off + 8 + 4 * (n_colours + n_patterns), n_patterns)
+        self.examples = dict(zip(self.patterns, examples))
+
+        off, _ = sections["flags"]
+        self._rows = view[off:off + 12 * n].cast("I")
+        self._colour_ids = self._id_column(view, sections["colours"][0], self.colours)
+        self._pattern_ids = self._id_column(view, sections["patterns"][0], self.patterns)
+
+        off, _ = sections["facts"]
+        self._fact_offsets = view[off:off + 4 * (n + 1)].cast("I")
+        self._fact_blob = off + 4 * (n + 1)
+        self._records = [None] * n
+
+    def _id_column(self, view, off, names):
+        n = self._n
+        offsets = view[off:off + 4 * (n + 1)].cast("I")
+        ids = view[off + 4 * (n + 1):off + 4 * (n + 1) + 2 * offsets[n]].cast("H")
+        # Flags sharing a colour/pattern combination share one tuple
+        return offsets, ids, names, {}
+
+    def _string(self, sid):
+        offsets = self._string_offsets
+        return self._buf[self._string_blob + offsets[sid]:self._string_blob + offsets[sid + 1]].decode("utf-8")
+
+    def _names(self, column, pos):
+        offsets, ids, names, shared = column
+        key = tuple(ids[offsets[pos]:offsets[pos + 1]])
+        value = shared.get(key)
+        if value is None:
+            value = shared[key] = tuple(names[i] for i in key)
+        return value
+
+    def _fun_fact(self, pos):
+        offsets = self._fact_offsets
+        return self._buf[self._fact_blob + offsets[pos]:self._fact_blob + offsets[pos + 1]].decode("utf-8")
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [self[i] for i in range(*pos.indices(self._n))]
+        if pos < 0:
+            pos += self._n
+        if not 0 <= pos < self._n:
+            raise IndexError("flag index out of range")
+        flag = self._records[pos]
+        if flag is None:
+            rows = self._rows
+            flag = self._records[pos] = _FlagRecord(
+                country=self._string(rows[3 * pos]), code=self._string(rows[3 * pos + 1]),
+                file=self._string(rows[3 * pos + 2]),
+                colours=self._names(self._colour_ids, pos), patterns=self._names(self._pattern_ids, pos),
+            )
+            flag._facts = self._fun_fact
+            flag._pos = pos
+        return flag
+
+    def __iter__(self):
+        for pos in range(self._n):
+            yield self[pos]
+
+
+class _FlagRecord(dict):
+    # Flag dict whose fun_fact is only decoded from the mapped file when
+    # something actually asks for it
+    __slots__ = ("_facts", "_pos")
+
+    def __missing__(self, key):
+        if key != "fun_fact":
+            raise KeyError(key)
+        value = self._facts(self._pos)
+        self[key] = value
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+# -------------------------
+# Build
+# -------------------------
+def build_catalog(source, output=None):
+    from flag_names import NameIndex
+    from flag_text import TextIndex
+
+    output = output or artifact_path(source)
+    with open(source, "rb") as f:
+        raw = f.read()
+    stat = os.stat(source)
+    flags = json.loads(raw.decode("utf-8"))
+    index = FlagIndex(flags)
+    n = len(flags)
+
+    strings = []
+    string_ids = {}
+
+    def intern(text):
+        sid = string_ids.get(text)
+        if sid is None:
+            sid = string_ids[text] = len(strings)
+            strings.append(text)
+        return sid
+
+    colour_ids = {c: i for i, c in enumerate(index.colours)}
+    pattern_ids = {p: i for i, p in enumerate(index.patterns)}
+
+    flag_rows = []
+    colour_offsets, colour_column = [0], []
+    pattern_offsets, pattern_column = [0], []
+    fact_offsets, fact_blob = [0], bytearray()
+    for flag in flags:
+        flag_rows.extend((intern(flag["country"]), intern(flag["code"]), intern(flag["file"])))
+        colour_column.extend(colour_ids[c] for c in flag["colours"])
+        colour_offsets.append(len(colour_column))
+        pattern_column.extend(pattern_ids[p] for p in flag["patterns"])
+        pattern_offsets.append(len(pattern_column))
+        fact_blob += flag.get("fun_fact", "").encode("utf-8")
+        fact_offsets.append(len(fact_blob))
+
+    vocab_sids = [intern(c) for c in index.colours] + [intern(p) for p in index.patterns]
+    examples = [(index.pattern_bits[p] & -index.pattern_bits[p]).bit_length() - 1 for p in index.patterns]
+
+    # Byte offsets, so the loader can decode any one string on its own
+    encoded = [text.encode("utf-8") for text in strings]
+    string_offsets = [0]
+    for data in encoded:
+        string_offsets.append(string_offsets[-1] + len(data))
+    string_blob = b"".join(encoded)
+
+    sections = {
+        "strings": _u32s([len(strings)]) + _u32s(string_offsets) + string_blob,
+        "flags": _u32s(flag_rows),
+        "colours": _u32s(colour_offsets) + struct.pack(f"<{len(colour_column)}H", *colour_column),
+        "patterns": _u32s(pattern_offsets) + struct.pack(f"<{len(pattern_column)}H", *pattern_column),
+        "vocab": _u32s([len(index.colours), len(index.patterns)]) + _u32s(vocab_sids) + _u32s(examples),
+        "masks": b"".join(_mask_bytes(index.colour_bits[c], n) for c in index.colours)
+        + b"".join(_mask_bytes(index.pattern_bits[p], n) for p in index.patterns),
+        "facts": _u32s(fact_offsets) + bytes(fact_blob),
+        "text": TextIndex.build(flags).to_bytes(),
+        "names": NameIndex(flags).to_bytes(),
+    }
+
+    table_size = SECTION.size * len(SECTIONS)
+    # Sections start 8-byte aligned so their arrays can be mapped in place
+    offset = HEADER.size + table_size
+    offset += -offset % 8
+    table = bytearray()
+    for name in SECTIONS:
+        table += SECTION.pack(offset, len(sections[name]))
+        offset += len(sections[name])
+        sections[name] += bytes(-offset % 8)
+        offset += -offset % 8
+    table += bytes(-(HEADER.size + table_size) % 8)
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, n, stat.st_size, stat.st_mtime_ns, hashlib.sha1(raw).digest())
+    tmp_path = output + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(table)
+        for name in SECTIONS:
+            f.write(sections[name])
+    os.replace(tmp_path, output)
+    return output
+
+
+# -------------------------
+# Load
+# -------------------------
+def _load_json(source):
+    with open(source, "rb") as f:
+        raw = f.read()
+    flags = json.loads(raw.decode("utf-8"))
+    return Catalog(flags, FlagIndex(flags), hashlib.sha1(raw).hexdigest(), source)
+
+
+def _load_compiled(source, path):
+    try:
+        with open(path, "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    if len(buf) < HEADER.size:
+        return None
+    magic, fmt, n, source_size, source_mtime_ns, digest = HEADER.unpack_from(buf, 0)
+    stat = os.stat(source)
+    if magic != MAGIC or fmt != FORMAT_VERSION or (source_size, source_mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+        buf.close()
+        return None
+
+    sections = {}
+    for i, name in enumerate(SECTIONS):
+        sections[name] = SECTION.unpack_from(buf, HEADER.size + i * SECTION.size)
+
+    flags = _FlagTable(buf, n, sections)
+    off, _ = sections["masks"]
+    width = (n + 7) // 8
+    # Example flags are built from the stored positions when the help
+    # asks for them
+    index = FlagIndex.from_masks(
+        flags,
+        _MappedMasks(buf, off, width, flags.colours),
+        _MappedMasks(buf, off + len(flags.colours) * width, width, flags.patterns),
+        flags.examples,
+    )
+    catalog = Catalog(flags, index, digest.hex(), source, compiled=True)
+    catalog._text_source = (buf, sections["text"][0])
+    catalog._names_source = (buf, sections["names"][0])
+    return catalog
+
+
+def load_catalog(base_dir, source=DEFAULT_SOURCE, compiled=True):
+    source = os.path.join(base_dir, source)
+    if compiled:
+        catalog = _load_compiled(source, artifact_path(source))
+        if catalog is not None:
+            return catalog
+    return _load_json(source)
+
+
+# -------------------------
+# CLI
+# -------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flag Finder catalog tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build-catalog", help="compile flags.json into a binary catalog")
+    build.add_argument("--source", default=os.path.join(*catalog_location(os.path.dirname(os.path.abspath(__file__)))))
+    build.add_argument("--output", default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == "build-catalog":
+        output = build_catalog(args.source, args.output)
+        print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import re
+
+import numpy as np
+from PIL import Image
+
+# -------------------------
+# Colour space helpers
+# -------------------------
+# sRGB -> CIE Lab (D65) for whole pixel arrays at once, and a cheap decode
+# that brings any image (a 2560px flag PNG, a 12 MP phone photo) down to a
+# few thousand pixels before anything looks at them. Distances in Lab are
+# close to how different two colours look, which RGB distances are not.
+
+WHITE = (255, 255, 255)
+
+# "#ce1126", "#c12" or "rgb(206, 17, 38)" (commas or spaces)
+_COLOUR_CODE = re.compile(
+    r"#([0-9a-f]{6}|[0-9a-f]{3})|rgb\(\s*(\d{1,3})\s*[,\s]\s*(\d{1,3})\s*[,\s]\s*(\d{1,3})\s*\)"
+)
+
+# Shades each of the catalog's colour words covers on real flags (navy,
+# royal and sky blue are all "blue"; silver, heraldic argent, is white)
+NAMED_COLOURS = {
+    "red": ((206, 17, 38), (237, 41, 57), (255, 0, 0), (218, 41, 28), (178, 34, 52), (191, 10, 48)),
+    "white": ((255, 255, 255), (240, 240, 240), (192, 192, 192)),
+    "blue": ((0, 56, 168), (0, 35, 149), (0, 114, 206), (117, 170, 219), (0, 0, 255), (0, 38, 84), (60, 59, 110)),
+    "yellow": ((252, 209, 22), (255, 206, 0), (255, 255, 0)),
+    "green": ((0, 122, 61), (0, 155, 58), (0, 104, 71), (0, 158, 96)),
+    "black": ((0, 0, 0), (35, 31, 32)),
+    "brown": ((120, 63, 0), (139, 90, 43), (165, 105, 50)),
+    "orange": ((255, 130, 0), (247, 127, 0), (255, 153, 51)),
+    "maroon": ((128, 0, 0), (138, 21, 56), (110, 20, 40)),
+}
+
+# sRGB primaries to XYZ, with the D65 white point folded into the rows
+_RGB_TO_XYZ = (np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+]) / np.array([[0.95047], [1.0], [1.08883]])).T.astype(np.float32)
+
+# Gamma expansion of every 8-bit channel value, looked up instead of computed
+_c = np.arange(256) / 255
+_LINEAR = np.where(_c <= 0.04045, _c / 12.92, ((_c + 0.055) / 1.055) ** 2.4).astype(np.float32)
+del _c
+
+_EPSILON = 216 / 24389
+_KAPPA = 24389 / 27
+
+
+def parse_colour_code(text):
+    # (r, g, b) for a hex or rgb() colour code, None when text isn't one
+    m = _COLOUR_CODE.fullmatch(text.strip().lower())
+    if not m:
+        return None
+    digits, *channels = m.groups()
+    if digits:
+        if len(digits) == 3:
+            digits = "".join(ch * 2 for ch in digits)
+        return tuple(int(digits[i:i + 2], 16) for i in (0, 2, 4))
+    rgb = tuple(int(c) for c in channels)
+    return rgb if max(rgb) <= 255 else None
+
+
+def srgb_to_lab(rgb):
+    # uint8 (..., 3) array -> float32 (..., 3) array of L, a, b
+    xyz = _LINEAR[np.asarray(rgb, dtype=np.uint8)] @ _RGB_TO_XYZ
+    f = np.where(xyz > _EPSILON, np.cbrt(xyz), (_KAPPA * xyz + 16) / 116)
+    lab = np.empty_like(f)
+    lab[..., 0] = 116 * f[..., 1] - 16
+    lab[..., 1] = 500 * (f[..., 0] - f[..., 1])
+    lab[..., 2] = 200 * (f[..., 1] - f[..., 2])
+    return lab
+
+
+class Palette:
+    # Lab reference shades for a set of colour names, and the nearest name
+    # for any number of Lab colours in one vectorized pass
+    def __init__(self, named=NAMED_COLOURS):
+        self.names = list(named)
+        shades = [(i, rgb) for i, name in enumerate(self.names) for rgb in named[name]]
+        self.shade_names = np.array([i for i, _ in shades])
+        self.shades = srgb_to_lab(np.array([rgb for _, rgb in shades], dtype=np.uint8))
+
+    def nearest(self, lab):
+        # (..., 3) Lab -> (..., ) index into names
+        lab = np.asarray(lab, dtype=np.float32)
+        flat = lab.reshape(-1, 3)
+        d = ((flat[:, None, :] - self.shades[None, :, :]) ** 2).sum(axis=2)
+        return self.shade_names[d.argmin(axis=1)].reshape(lab.shape[:-1])
+
+    def name_of(self, rgb):
+        # Nearest name for one (r, g, b) colour
+        return self.names[int(self.nearest(srgb_to_lab(np.array(rgb, dtype=np.uint8))))]
+
+
+def load_rgb(source, size, resample=Image.BOX, with_alpha=False):
+    # Path or file object -> uint8 (h, w, 3) array, scaled down to size.
+    # JPEGs are decoded straight at a fraction of their resolution (draft),
+    # palette PNGs (every flag) are sampled down to 4x the size before
+    # their colours are expanded, the rest shrink with reduce() before the
+    # final resample, and transparency is flattened onto white the way the
+    # apps show flags. with_alpha also returns the (h, w) alpha channel
+    # from before the flattening.
+    with Image.open(source) as img:
+        img.draft("RGB", (size[0] * 2, size[1] * 2))
+        if img.mode == "P" and (img.width > 4 * size[0] or img.height > 4 * size[1]):
+            img = img.resize((4 * size[0], 4 * size[1]), Image.NEAREST)
+        img = img.convert("RGBA")
+        if img.width > size[0] or img.height > size[1]:
+            img = img.resize(size, resample, reducing_gap=None if resample == Image.NEAREST else 2.0)
+        alpha = np.asarray(img.getchannel("A")) if with_alpha else None
+        if img.getextrema()[3][0] < 255:
+            background = Image.new("RGBA", img.size, WHITE + (255,))
+            img = Image.alpha_composite(background, img)
+        rgb = np.asarray(img.convert("RGB"))
+        return (rgb, alpha) if with_alpha else rgb
@@ -0,0 +1,180 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from flag_catalog import DEFAULT_SOURCE, catalog_location, load_catalog
+from flag_colour import load_rgb, srgb_to_lab
+from flag_matrix import top_k
+
+# -------------------------
+# Image feature vectors
+# -------------------------
+# One float32 vector per flag describing what the artwork looks like: a
+# quantized Lab colour histogram (which colours, in what amounts) and the
+# mean colour of a 3x3 layout grid (where they are, so a vertical and a
+# horizontal tricolour of the same colours still differ). Vectors are
+# L2-normalized, so "flags that look like this one" is a single
+# matrix-vector product plus a top-k.
+#
+# build writes <catalog>.features.npy (flags x FEATURES float32, catalog
+# order) and <catalog>.features.json (the image file behind each row).
+
+SIZE = (45, 30)
+GRID = (3, 3)
+L_EDGES = (35, 70)
+AB_EDGES = (-45, -12, 12, 45)
+BINS = (len(L_EDGES) + 1) * (len(AB_EDGES) + 1) ** 2
+FEATURES = BINS + GRID[0] * GRID[1] * 3
+# Layout cells against the histogram; the histogram part has unit length
+GRID_WEIGHT = 0.7
+SIMILAR_K = 24
+
+
+def features_path(source):
+    return os.path.splitext(source)[0] + ".features.npy"
+
+
+def _files_path(source):
+    return os.path.splitext(source)[0] + ".features.json"
+
+
+def features_stamp(source):
+    # Size and mtime of both feature files (None when missing), so a
+    # catalog that found no features only looks again once they're rebuilt
+    stamp = []
+    for path in (features_path(source), _files_path(source)):
+        try:
+            st = os.stat(path)
+        except OSError:
+            stamp.append(None)
+            continue
+        stamp.append((st.st_size, st.st_mtime_ns))
+    return tuple(stamp)
+
+
+def image_vector(rgb):
+    lab = srgb_to_lab(rgb)
+    h, w = lab.shape[0] // GRID[0] * GRID[0], lab.shape[1] // GRID[1] * GRID[1]
+    lab = lab[:h, :w]
+
+    ab = len(AB_EDGES) + 1
+    codes = (np.digitize(lab[..., 0], L_EDGES) * ab + np.digitize(lab[..., 1], AB_EDGES)) * ab
+    codes += np.digitize(lab[..., 2], AB_EDGES)
+    # Square roots of the bin fractions, so the dot product of two
+    # histograms is their Bhattacharyya coefficient
+    hist = np.sqrt(np.bincount(codes.ravel(), minlength=BINS) / codes.size)
+
+    cells = lab.reshape(GRID[0], h // GRID[0], GRID[1], w // GRID[1], 3).mean(axis=(1, 3))
+    cells = cells / np.array([100, 128, 128], dtype=np.float32) * GRID_WEIGHT
+
+    vector = np.concatenate([hist, cells.ravel()]).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def _vector_for(job):
+    base_dir, rel_path = job
+    try:
+        return rel_path, image_vector(load_rgb(os.path.join(base_dir, rel_path), SIZE))
+    except (OSError, ValueError):
+        return rel_path, None
+
+
+class FeatureIndex:
+    def __init__(self, flags, vectors):
+        # vectors[i] describes flags[i]; flags without artwork get a zero
+        # row, which nothing is ever similar to
+        self.flags = flags
+        self.vectors = vectors
+        self.rows = {flag["file"]: i for i, flag in enumerate(flags)}
+
+    def scores(self, vector):
+        # Cosine similarity of every flag to vector
+        return self.vectors @ np.asarray(vector, dtype=np.float32)
+
+    def nearest(self, vector, k=SIMILAR_K, exclude=()):
+        # Top k (position, cosine similarity), best first
+        scores = self.scores(vector)
+        for pos in exclude:
+            scores[pos] = -np.inf
+        return top_k(scores, k)
+
+    def similar(self, flag, k=SIMILAR_K):
+        # Flags that look most like flag, not counting itself
+        pos = self.rows.get(flag["file"])
+        if pos is None or not self.vectors[pos].any():
+            return []
+        return [self.flags[i] for i, _ in self.nearest(self.vectors[pos], k, exclude=(pos,))]
+
+
+def load_features(catalog):
+    # FeatureIndex for the catalog, or None when nothing has been built.
+    # Rows are matched up by image file, so a catalog that has been
+    # reordered or extended since still finds the vectors it has.
+    try:
+        with open(_files_path(catalog.source), "r", encoding="utf-8") as f:
+            files = json.load(f)["files"]
+        vectors = np.load(features_path(catalog.source), mmap_mode="r")
+    except (OSError, ValueError, KeyError):
+        return None
+    if vectors.shape != (len(files), FEATURES):
+        return None
+    wanted = [flag["file"] for flag in catalog.flags]
+    if wanted != files:
+        rows = {rel_path: i for i, rel_path in enumerate(files)}
+        aligned = np.zeros((len(wanted), FEATURES), dtype=np.float32)
+        for i, rel_path in enumerate(wanted):
+            row = rows.get(rel_path)
+            if row is not None:
+                aligned[i] = vectors[row]
+        vectors = aligned
+    return FeatureIndex(catalog.flags, vectors)
+
+
+# -------------------------
+# Build
+# -------------------------
+def build_features(base_dir, source=DEFAULT_SOURCE, workers=None):
+    catalog = load_catalog(base_dir, source)
+    files = [flag["file"] for flag in catalog.flags]
+    vectors = np.zeros((len(files), FEATURES), dtype=np.float32)
+    rows = {}
+    for i, rel_path in enumerate(files):
+        rows.setdefault(rel_path, []).append(i)
+
+    missing = 0
+    jobs = [(base_dir, rel_path) for rel_path in rows]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for rel_path, vector in pool.map(_vector_for, jobs, chunksize=16):
+            if vector is None:
+                missing += 1
+            else:
+                vectors[rows[rel_path]] = vector
+
+    path = features_path(catalog.source)
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, vectors)
+    os.replace(path + ".tmp", path)
+    files_path = _files_path(catalog.source)
+    with open(files_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "features": FEATURES, "files": files}, f)
+    os.replace(files_path + ".tmp", files_path)
+    return len(rows) - missing, missing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute image feature vectors for similar-flag search")
+    base_dir, source = catalog_location(os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument("--base-dir", default=base_dir)
+    parser.add_argument("--source", default=source, help="catalog file inside the base directory")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    built, missing = build_features(args.base_dir, args.source, args.workers)
+    print(f"Computed features for {built} images ({missing} missing or unreadable)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,173 +1,66 @@
-from nicegui import ui 
-import os, json
+from nicegui import app, background_tasks, run, ui 
+import asyncio
+import io
+import os
 from PIL import Image
-
-LOAD_BATCH = 60
-current_results = []
-shown_count = 0
-loading_more = False
+from flag_catalog import catalog_location, load_catalog
+from flag_photo import match_photo
+from flag_query import SHARE_MODES, QueryError, and_queries, share_query, split_list
+from flag_search import SearchCache
+from flag_session import SearchSession
+from flag_thumbnails import ThumbnailAtlas, ThumbnailCache
 
 # -------------------------
 # Load flags
 # -------------------------
+# The catalog, index and thumbnails are loaded once and shared read-only by
+# every connected client; per-client state lives in FlagFinderPage.
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-with open(os.path.join(BASE_DIR, "flags.json"), "r", encoding="utf-8") as f:
-    FLAGS = json.load(f)
-
-def handle_scroll(e):
-    global loading_more, shown_count
-
-    if loading_more:
-        return
-
-    scroll_top = e.args.get('scrollTop', 0)
-    client_height = e.args.get('clientHeight', 0)
-    scroll_height = e.args.get('scrollHeight', 0)
-
-    if scroll_top + client_height >= scroll_height - 50:
-        if shown_count < len(current_results):
-            loading_more = True
-            display_flags(append=True)
-
-
-# -------------------------
-# Containers
-# -------------------------
-search_card = None
-result_container = ui.column().style(
-    'margin:20px; gap:10px; align-items:flex-start; '
-    'height:89vh; overflow-y:auto;'
-)
-
-result_container.on('scroll', handle_scroll)
-
-reset_button = ui.button('Reset', on_click=lambda: reset_view()).style(
-    'position:fixed; top:20px; right:20px; font-size:16px; '
-    'background:#f44336; color:white; padding:10px 20px; display:none'
-)
-
-details_dialog = ui.dialog().style(
-    'min-width:400px; background:white; padding:20px; border-radius:8px'
-)
-
-with details_dialog:
-    with ui.column().style('gap:10px'):
-
-        details_title = ui.label().style(
-            'font-weight:bold; font-size:18px'
-        )
-
-        details_image = ui.image().style(
-            'width:100%; height:100%'
-        )
-
-        details_colours = ui.label()
-        details_patterns = ui.label()
-        details_text = ui.label()
-
-# -------------------------
-# Functions
-# -------------------------
-def search(colours, patterns):
-    results = []
-    for flag in FLAGS:
-        if colours and not all(c in flag["colours"] for c in colours):
-            continue
-        if patterns and not all(p in flag["patterns"] for p in patterns):
-            continue
-        results.append(flag)
-    return results
-
-def display_flags(results=None, append=False):
-    global shown_count, current_results, loading_more
-
-    if results is not None:
-        current_results = results
-
-    if not append:
-        result_container.clear()
-        shown_count = 0
-
-    with result_container:
-        with ui.row().style('flex-wrap: wrap; gap:20px; justify-content:flex-start;'):
-            for flag in current_results[shown_count:shown_count + LOAD_BATCH]:
-                with ui.column().style('width:100px; align-items:center;'):
-                    img_path = os.path.join(BASE_DIR, flag["file"])
-                    ui.image(img_path).style('width:80px; height:50px').props('loading="lazy"')
-                    ui.label(flag["country"]).style('text-align:center; font-size:14px')
-
-                    ui.button(
-                        'Details',
-                        on_click=lambda f=flag: show_flag_details(f)
-                    ).style('font-size:12px; margin-top:5px')
-
-    shown_count += LOAD_BATCH
-    loading_more = False
-
-def show_flag_details(flag):
-    details_title.set_text(flag["country"])
-    details_image.set_source(os.path.join(BASE_DIR, flag["file"]))
-    details_colours.set_text(f"Colours: {', '.join(flag['colours'])}")
-    details_patterns.set_text(f"Patterns: {', '.join(flag['patterns'])}")
-    details_text.set_text(flag.get("details") or flag.get("fun_fact") or "Every flag has a story!")
-    details_dialog.open()
-
-def apply_filter(colours=None, pattern=None, dialog=None):
-    global current_results, shown_count
-
-    reset_button.style('display:block')
-    search_card.style('display:none')
-
-    cols = colours or [c.strip().lower() for c in search_colours.value.split(',') if c.strip()]
-    pats = [pattern] if pattern else [p.strip().lower() for p in search_patterns.value.split(',') if p.strip()]
-
-    current_results = search(cols, pats)
-    shown_count = 0  # IMPORTANT RESET
-
-    display_flags(current_results)
-
-    if dialog:
-        dialog.close()
-
-def reset_view():
-    # Hide reset button
-    reset_button.style('display:none')
-
-    # Show search card again
-    search_card.style('display:flex')
-
-    # Clear previous results
-    result_container.clear()
-
-# -------------------------
-# Help dialog
-# -------------------------
-def show_help():
-    dialog = ui.dialog().style('min-width:600px; min-height:400px')
-    with dialog:
-        ui.label().style('font-weight:bold; font-size:18px; margin-bottom:10px')
-        with ui.row().style('gap:50px;'):
-            # Colours column
-            with ui.column():
-                ui.label("Available Colours:").style('font-weight:bold; font-size:16px')
-                for colour in sorted({c for flag in FLAGS for c in flag["colours"]}):
-                    with ui.row().style('align-items:center; gap:10px'):
-                        ui.label(' ').style(f'background:{colour}; width:80px; height:50px; display:inline-block; border:none;')
-                        ui.button(colour.capitalize(), on_click=lambda c=colour: apply_filter(colours=[c], dialog=dialog)).style(
-                            'background:none; border:none; color:black; cursor:pointer; font-size:14px'
-                        )
-            # Patterns column
-            with ui.column():
-                ui.label("Available Patterns:").style('font-weight:bold; font-size:16px')
-                for pattern in sorted({p for flag in FLAGS for p in flag["patterns"]}):
-                    example_flag = next((f for f in FLAGS if pattern in f["patterns"]), None)
-                    if example_flag:
-                        img_path = os.path.join(BASE_DIR, example_flag["file"])
-                        with ui.row().style('align-items:center; gap:10px'):
-                            ui.image(img_path).style('width:80px; height:50px')
-                            ui.button(pattern.capitalize(), on_click=lambda p=pattern: apply_filter(pattern=p, dialog=dialog))
-
-    dialog.open()
+DATA_DIR, CATALOG_SOURCE = catalog_location(BASE_DIR)
+CATALOG = load_catalog(DATA_DIR, CATALOG_SOURCE)
+FLAGS = CATALOG.flags
+INDEX = CATALOG.index
+SEARCH = SearchCache(CATALOG)
+THUMBNAILS = ThumbnailCache(DATA_DIR)
+ATLAS = ThumbnailAtlas(THUMBNAILS, (80, 50))
+
+# The whole grid shares one cached sprite sheet request
+ATLAS_URL = None
+if ATLAS.image_path and os.path.exists(ATLAS.image_path):
+    ATLAS_URL = app.add_static_file(local_file=ATLAS.image_path, max_cache_age=31536000)
+
+def thumbnail_path(flag, size=(80, 50)):
+    try:
+        return THUMBNAILS.path(flag["file"], size)
+    except FileNotFoundError:
+        return os.path.join(DATA_DIR, flag["file"])
+
+def flag_tile(flag):
+    rect = ATLAS.rect(flag["file"]) if ATLAS_URL else None
+    if rect is None:
+        return ui.image(thumbnail_path(flag)).style('width:80px; height:50px').props('loading="lazy"')
+    return ui.element('div').style(
+        f'width:80px; height:50px; background:url({ATLAS_URL}) -{rect[0]}px -{rect[1]}px no-repeat'
+    )
+
+def search(colours, patterns, query='', text=''):
+    return SEARCH.search(colours, patterns, query, text)
+
+# When nothing matches exactly, the flags sharing the most (and rarest)
+# attributes with the search are shown instead, labelled as such
+def closest(colours, patterns, query=''):
+    return SEARCH.closest(colours, patterns, query)
+
+# Search-as-you-type: the inputs only send their value once typing pauses
+# for INPUT_DEBOUNCE_MS (Quasar's debounce prop, so fast typing doesn't
+# flood the websocket), and the server waits LIVE_SEARCH_DELAY more before
+# searching, dropping the pending search whenever a newer value arrives
+INPUT_DEBOUNCE_MS = 250
+LIVE_SEARCH_DELAY = 0.1
+
+# Country name autocomplete, top SUGGESTIONS names per keystroke; the name
+# index is loaded on the first keystroke
+SUGGESTIONS = 8
 
 # -------------------------
 # Styling
@@ -183,6 +76,20 @@ body {
     font-family: Arial, sans-serif;
 }
 
+/* Search card docked above live results while typing */
+.search-docked {
+    top: 10px !important;
+    transform: translate(-50%, 0) !important;
+    padding: 12px 20px !important;
+}
+.search-docked .search-title, .search-docked .photo-upload {
+    display: none;
+}
+.results-docked {
+    margin-top: 450px !important;
+    height: calc(100vh - 470px) !important;
+}
+
 /* Add subtle texture using semi-transparent overlay */
 body::after {
     content: '';
@@ -224,33 +131,354 @@ body::after {
     }
 }
 </style>
-""")
+""", shared=True)
 
 # -------------------------
-# Main layout
+# Page
 # -------------------------
-# Search card - fixed in viewport for perfect centering
-with ui.card().style(
-    'position:fixed; top:50%; left:50%; transform:translate(-50%, -50%); '
-    'padding:40px; min-width:400px; text-align:center; box-shadow:0 4px 12px rgba(0,0,0,0.1)'
-) as card:
-    search_card = card
+class FlagFinderPage:
+    def __init__(self):
+        self.session = SearchSession()
+        # Tiles on the page by flag code, so a new result set only adds and
+        # removes the tiles that differ
+        self.tiles = {}
+        self.live_task = None
+        self.live_generation = 0
+        self.build()
+
+    # -------------------------
+    # Containers
+    # -------------------------
+    def build(self):
+        self.result_container = ui.column().style(
+            'margin:20px; gap:10px; align-items:flex-start; '
+            'height:89vh; overflow-y:auto;'
+        )
 
-    ui.label("🌍 Flag Finder").style('font-size:36px; font-weight:bold; margin-bottom:25px')
-    search_colours = ui.input(label='Colours (comma-separated)').style('font-size:16px; width:300px')
-    search_patterns = ui.input(label='Patterns (comma-separated)').style('font-size:16px; width:300px')
+        self.result_container.on('scroll', self.handle_scroll)
+        with self.result_container:
+            self.tile_row = ui.row().style('flex-wrap: wrap; gap:20px; justify-content:flex-start;')
 
-    with ui.row().style('gap:20px; justify-content:center; margin-top:25px'):
-        ui.button('Search', on_click=lambda: apply_filter()).style('font-size:16px; width:100px')
-        ui.button('Help', on_click=show_help).style('font-size:16px; width:100px')
+        self.reset_button = ui.button('Reset', on_click=self.reset_view).style(
+            'position:fixed; top:20px; right:20px; font-size:16px; '
+            'background:#f44336; color:white; padding:10px 20px; display:none'
+        )
 
-# -------------------------
-# Place scrollable result container below
-# -------------------------
-result_container
+        self.details_dialog = ui.dialog().style(
+            'min-width:400px; background:white; padding:20px; border-radius:8px'
+        )
 
-ui.run(
-    title="Flag Finder",
-    host='0.0.0.0',  # Required for Render
-    port=int(os.environ.get('PORT', 8080))
-)
\ No newline at end of file
+        with self.details_dialog:
+            with ui.column().style('gap:10px'):
+
+                self.details_title = ui.label().style(
+                    'font-weight:bold; font-size:18px'
+                )
+
+                self.details_image = ui.image().style(
+                    'width:100%; height:100%'
+                )
+
+                self.details_colours = ui.label()
+                self.details_patterns = ui.label()
+                self.details_text = ui.label()
+                # Only offered once flag_features.py has been run
+                self.details_similar = ui.button('Similar flags', on_click=self.show_similar)
+        self.details_flag = None
+
+        # Search card - fixed in viewport for perfect centering
+        with ui.card().style(
+            'position:fixed; top:50%; left:50%; transform:translate(-50%, -50%); '
+            'padding:40px; min-width:400px; text-align:center; box-shadow:0 4px 12px rgba(0,0,0,0.1)'
+        ) as card:
+            self.search_card = card
+
+            ui.label("🌍 Flag Finder").classes('search-title').style('font-size:36px; font-weight:bold; margin-bottom:25px')
+            self.search_colours = ui.input(label='Colours (comma-separated)').style('font-size:16px; width:300px')
+            # A picked colour goes in as a hex code, which searches for the
+            # nearest named colour
+            with self.search_colours.add_slot('append'):
+                with ui.button(icon='colorize').props('flat round dense'):
+                    ui.color_picker(on_pick=self.pick_colour)
+            self.search_patterns = ui.input(label='Patterns (comma-separated)').style('font-size:16px; width:300px')
+            self.search_query = ui.input(label='Query (e.g. red & (star | crescent) & !green)').style('font-size:16px; width:300px')
+            self.search_text = ui.input(label='Fun fact (e.g. eagle, independence)').style('font-size:16px; width:300px')
+            for field in (self.search_colours, self.search_patterns, self.search_query, self.search_text):
+                field.props(f'debounce={INPUT_DEBOUNCE_MS}').on_value_change(self.schedule_live_search)
+            # How much of the flag a colour covers, measured by flag_tagging.py
+            with ui.row().style('gap:8px; width:300px; flex-wrap:nowrap; align-items:flex-end'):
+                self.share_mode = ui.select(['any'] + list(SHARE_MODES), value='any', label='Colour share').style('width:110px')
+                self.share_percent = ui.number(label='%', value=30, min=0, max=100, step=5, format='%.0f').style('width:60px')
+                self.share_colour = ui.select(CATALOG.colours, label='Colour', clearable=True).style('width:110px')
+            self.share_percent.props(f'debounce={INPUT_DEBOUNCE_MS}')
+            for field in (self.share_mode, self.share_percent, self.share_colour):
+                field.on_value_change(self.schedule_live_search)
+            self.live_status = ui.label().style('font-size:14px; color:#555')
+
+            self.search_country = ui.input(label='Country name').props(f'debounce={INPUT_DEBOUNCE_MS} clearable').style('font-size:16px; width:300px')
+            self.search_country.on_value_change(self.update_suggestions)
+            self.suggestions = ui.list().props('dense bordered separator').style('width:300px; text-align:left; display:none')
+
+            # "What flag is this?": a photo is matched on its dominant colours
+            # and, when they have been computed, the flags' image features
+            ui.upload(label='What flag is this? Upload a photo', auto_upload=True, on_upload=self.match_upload) \
+                .props('accept=image/* flat bordered').classes('photo-upload').style('width:300px; margin-top:10px')
+
+            with ui.row().style('gap:20px; justify-content:center; margin-top:25px'):
+                ui.button('Search', on_click=lambda: self.apply_filter()).style('font-size:16px; width:100px')
+                ui.button('Help', on_click=self.show_help).style('font-size:16px; width:100px')
+
+    # -------------------------
+    # Functions
+    # -------------------------
+    def handle_scroll(self, e):
+        scroll_top = e.args.get('scrollTop', 0)
+        client_height = e.args.get('clientHeight', 0)
+        scroll_height = e.args.get('scrollHeight', 0)
+
+        if self.session.wants_more(scroll_top, client_height, scroll_height):
+            self.display_flags(append=True)
+
+    def flag_card(self, flag):
+        with ui.column().style('width:100px; align-items:center;') as card:
+            flag_tile(flag)
+            ui.label(flag["country"]).style('text-align:center; font-size:14px')
+
+            ui.button(
+                'Details',
+                on_click=lambda f=flag: self.show_flag_details(f)
+            ).style('font-size:12px; margin-top:5px')
+        return card
+
+    def display_flags(self, append=False):
+        batch = self.session.next_batch()
+        if append:
+            with self.tile_row:
+                for flag in batch:
+                    self.tiles[flag["code"]] = self.flag_card(flag)
+            return
+
+        # New result set: keep the tiles it shares with the page, drop the
+        # rest, build only the missing ones and send the new order once
+        wanted = {flag["code"] for flag in batch}
+        for code in [code for code in self.tiles if code not in wanted]:
+            self.tile_row.remove(self.tiles.pop(code))
+        with self.tile_row:
+            for flag in batch:
+                if flag["code"] not in self.tiles:
+                    self.tiles[flag["code"]] = self.flag_card(flag)
+        self.tile_row.default_slot.children[:] = [self.tiles[flag["code"]] for flag in batch]
+        self.tile_row.update()
+        # A page still being built has no browser to scroll yet
+        if self.result_container.client.has_socket_connection:
+            self.result_container.client.run_javascript(f'getHtmlElement({self.result_container.id}).scrollTop = 0')
+
+    def update_suggestions(self, e=None):
+        prefix = self.search_country.value or ''
+        matches = CATALOG.names().complete(prefix, SUGGESTIONS) if prefix.strip() else []
+        self.suggestions.clear()
+        with self.suggestions:
+            for flag in matches:
+                ui.item(flag["country"], on_click=lambda f=flag: self.pick_country(f))
+        self.suggestions.style(f'display:{"block" if matches else "none"}')
+
+    def pick_country(self, flag):
+        self.suggestions.clear()
+        self.suggestions.style('display:none')
+        self.show_flag_details(flag)
+
+    def show_flag_details(self, flag):
+        self.details_title.set_text(flag["country"])
+        self.details_image.set_source(thumbnail_path(flag, (320, 200)))
+        self.details_colours.set_text(f"Colours: {', '.join(flag['colours'])}")
+        self.details_patterns.set_text(f"Patterns: {', '.join(flag['patterns'])}")
+        self.details_text.set_text(flag.get("details") or flag.get("fun_fact") or "Every flag has a story!")
+        self.details_flag = flag
+        self.details_similar.set_visibility(CATALOG.features() is not None)
+        self.details_dialog.open()
+
+    def show_similar(self):
+        # Flags whose artwork looks most like the one in the details dialog
+        flag = self.details_flag
+        results = CATALOG.features().similar(flag)
+        self.details_dialog.close()
+        self.live_generation += 1
+        self.reset_button.style('display:block')
+        self.search_card.style('display:none')
+        self.dock_search(False)
+        self.session.start(results)
+        self.display_flags()
+        ui.notify(f'Flags that look like {flag["country"]}')
+
+    def pick_colour(self, e):
+        current = (self.search_colours.value or '').strip().rstrip(',')
+        self.search_colours.set_value(f'{current}, {e.color}' if current else e.color)
+
+    def current_search(self):
+        cols = split_list(self.search_colours.value)
+        pats = split_list(self.search_patterns.value)
+        percent = self.share_percent.value
+        share = share_query(self.share_colour.value, self.share_mode.value, '' if percent is None else percent)
+        return cols, pats, and_queries(self.search_query.value or '', share), self.search_text.value or ''
+
+    def facet_counts(self):
+        # Counts for the search currently typed in, or for the whole catalog
+        # while the query doesn't parse
+        try:
+            return SEARCH.facets(*self.current_search())
+        except QueryError:
+            return SEARCH.facets()
+
+    def schedule_live_search(self, e=None):
+        if self.live_task is not None:
+            self.live_task.cancel()
+        self.live_generation += 1
+        self.live_task = background_tasks.create(self.live_search(self.live_generation), name='live search')
+
+    async def live_search(self, generation):
+        await asyncio.sleep(LIVE_SEARCH_DELAY)
+        if generation != self.live_generation:
+            return
+        try:
+            cols, pats, query, text = self.current_search()
+        except QueryError as e:
+            self.live_status.set_text(f'Invalid query: {e}')
+            return
+        if not (cols or pats or query.strip() or text.strip()):
+            self.live_status.set_text('')
+            self.dock_search(False)
+            self.session.start([])
+            self.display_flags()
+            return
+        try:
+            results = search(cols, pats, query, text)
+        except QueryError as e:
+            self.live_status.set_text(f'Invalid query: {e}')
+            return
+        note = SEARCH.resolved(cols, pats, query, text)
+        status = f'{len(results)} matching flags'
+        if not results:
+            results = closest(cols, pats, query)
+            if results:
+                status = f'No exact matches, {len(results)} closest matches'
+        self.live_status.set_text(status + (f' ({note})' if note else ''))
+        self.dock_search(True)
+        self.session.start(results)
+        self.display_flags()
+
+    def dock_search(self, docked):
+        if docked:
+            self.search_card.classes(add='search-docked')
+            self.result_container.classes(add='results-docked')
+        else:
+            self.search_card.classes(remove='search-docked')
+            self.result_container.classes(remove='results-docked')
+
+    async def match_upload(self, e):
+        data = await e.file.read()
+        e.sender.reset()
+        try:
+            results, colours = await run.io_bound(match_photo, CATALOG, io.BytesIO(data))
+        except (OSError, ValueError):
+            ui.notify(f'Could not read {e.file.name} as an image', type='negative')
+            return
+        if not colours:
+            ui.notify(f'No colours found in {e.file.name}', type='warning')
+            return
+        self.live_generation += 1
+        self.reset_button.style('display:block')
+        self.search_card.style('display:none')
+        self.dock_search(False)
+        self.session.start(results)
+        self.display_flags()
+        named = ', '.join(f'{name} {share:.0%}' for name, share in colours)
+        ui.notify(f'Closest flags to your photo ({named})')
+
+    def apply_filter(self, colours=None, pattern=None, dialog=None):
+        # Help entries pass a colour or pattern that narrows the current search
+        try:
+            cols, pats, query, text = self.current_search()
+            cols += colours or []
+            pats += [pattern] if pattern else []
+            results = search(cols, pats, query, text)
+        except QueryError as e:
+            ui.notify(f'Invalid query: {e}', type='negative')
+            return
+
+        exact = bool(results)
+        if not exact:
+            results = closest(cols, pats, query)
+
+        self.live_generation += 1
+        self.reset_button.style('display:block')
+        self.search_card.style('display:none')
+        self.dock_search(False)
+
+        self.session.start(results)
+        self.display_flags()
+
+        note = SEARCH.resolved(cols, pats, query, text)
+        if not exact and results:
+            ui.notify('No exact matches, showing closest matches' + (f' for {note}' if note else ''))
+        elif note:
+            ui.notify(f'Showing results for {note}')
+
+        if dialog:
+            dialog.close()
+
+    def reset_view(self):
+        # Hide reset button
+        self.reset_button.style('display:none')
+
+        # Show search card again
+        self.search_card.style('display:flex')
+
+        # Clear previous results
+        self.session.start([])
+        self.display_flags()
+        self.live_status.set_text('')
+
+    # -------------------------
+    # Help dialog
+    # -------------------------
+    def show_help(self):
+        colour_counts, pattern_counts = self.facet_counts()
+        dialog = ui.dialog().style('min-width:600px; min-height:400px')
+        with dialog:
+            ui.label().style('font-weight:bold; font-size:18px; margin-bottom:10px')
+            with ui.row().style('gap:50px;'):
+                # Colours column
+                with ui.column():
+                    ui.label("Available Colours:").style('font-weight:bold; font-size:16px')
+                    for colour in CATALOG.colours:
+                        with ui.row().style('align-items:center; gap:10px'):
+                            ui.label(' ').style(f'background:{colour}; width:80px; height:50px; display:inline-block; border:none;')
+                            count = colour_counts.get(colour, 0)
+                            ui.button(f'{colour.capitalize()} ({count})', on_click=lambda c=colour: self.apply_filter(colours=[c], dialog=dialog)).style(
+                                f'background:none; border:none; color:{"black" if count else "gray"}; cursor:pointer; font-size:14px'
+                            )
+                # Patterns column
+                with ui.column():
+                    ui.label("Available Patterns:").style('font-weight:bold; font-size:16px')
+                    for pattern in CATALOG.patterns:
+                        example_flag = CATALOG.example_flag(pattern)
+                        if example_flag:
+                            with ui.row().style('align-items:center; gap:10px'):
+                                flag_tile(example_flag)
+                                count = pattern_counts.get(pattern, 0)
+                                ui.button(f'{pattern.capitalize()} ({count})', on_click=lambda p=pattern: self.apply_filter(pattern=p, dialog=dialog)).props(
+                                    '' if count else 'color=grey'
+                                )
+
+        dialog.open()
+
+@ui.page('/')
+def index_page():
+    FlagFinderPage()
+
+if __name__ in {"__main__", "__mp_main__"}:
+    ui.run(
+        title="Flag Finder",
+        host='0.0.0.0',  # Required for Render
+        port=int(os.environ.get('PORT', 8080))
+    )
\ No newline at end of file
@@ -1,8 +1,16 @@
 import streamlit as st
 import streamlit.components.v1 as components
 from PIL import Image, ImageDraw
-import json
+import base64
+import html
+import io
 import os
+import shutil
+from flag_catalog import catalog_location, load_catalog
+from flag_photo import match_photo
+from flag_query import QueryError, split_list
+from flag_search import SearchCache
+from flag_thumbnails import CACHE_DIR, MANIFEST, ThumbnailAtlas, ThumbnailCache, atlas_index_name
 
 st.set_page_config(
     page_title="Flag Finder",
@@ -19,35 +27,132 @@ st.markdown(
 # Setup
 # -------------------------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR, CATALOG_SOURCE = catalog_location(BASE_DIR)
 
-with open(os.path.join(BASE_DIR, "flags.json"), "r", encoding="utf-8") as f:
-    FLAGS = json.load(f)
+# Streamlit re-runs this whole script on every interaction, so everything
+# read from disk lives in one process-wide resource shared by all sessions.
+# It is rebuilt only when flags.json, flags/ or the thumbnail manifest and
+# atlas written by flag_thumbnails.py change; thumbnails the app adds to
+# the cache itself don't count.
+STAMPED = (CATALOG_SOURCE, "flags", os.path.join(CACHE_DIR, MANIFEST), os.path.join(CACHE_DIR, atlas_index_name((80, 50))))
+
+def source_stamp():
+    stamp = []
+    for name in STAMPED:
+        try:
+            stamp.append(os.stat(os.path.join(DATA_DIR, name)).st_mtime_ns)
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+class Resources:
+    def __init__(self):
+        self.catalog = load_catalog(DATA_DIR, CATALOG_SOURCE)
+        self.thumbnails = ThumbnailCache(DATA_DIR)
+        self.atlas = ThumbnailAtlas(self.thumbnails, (80, 50))
+        self.atlas_url = publish_atlas(self.atlas)
+        # Encoded thumbnails and published static URLs by the flag file's
+        # content hash (so a file replaced in place gets new entries once
+        # flag_thumbnails.py has recorded it), filled as flags are first
+        # shown; the hash of each file is looked up once
+        self.image_keys = {}
+        self.images = {}
+        self.static_urls = {}
+
+# Streamlit serves ./static/ at app/static/ (see .streamlit/config.toml);
+# cached thumbnails and sheets are named by content hash so browsers can
+# cache them for good
+def publish_static(path):
+    static_dir = os.path.join(BASE_DIR, "static")
+    published = os.path.join(static_dir, os.path.basename(path))
+    if not os.path.exists(published):
+        os.makedirs(static_dir, exist_ok=True)
+        shutil.copyfile(path, published)
+    return "app/static/" + os.path.basename(path)
+
+def publish_atlas(atlas):
+    if not atlas.image_path or not os.path.exists(atlas.image_path):
+        return None
+    return publish_static(atlas.image_path)
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_resources(stamp):
+    return Resources()
+
+RESOURCES = load_resources(source_stamp())
+CATALOG = RESOURCES.catalog
+FLAGS = CATALOG.flags
+INDEX = CATALOG.index
+THUMBNAILS = RESOURCES.thumbnails
+ATLAS = RESOURCES.atlas
+ATLAS_URL = RESOURCES.atlas_url
 
 # -------------------------
 # Flag image loader
 # -------------------------
 def load_flag_image(path):
-    full_path = os.path.join(BASE_DIR, path)
     try:
-        img = Image.open(full_path).resize((80, 50))
+        img = THUMBNAILS.load(path, (80, 50))
     except FileNotFoundError:
         img = Image.new("RGB", (80, 50), color="gray")
         draw = ImageDraw.Draw(img)
         draw.text((5, 20), "No Img", fill="white")
     return img
 
+def image_key(path):
+    # The hash comes from the thumbnail manifest (one stat() the first time
+    # a flag is shown, none on later reruns); missing files share the
+    # placeholder under their path
+    key = RESOURCES.image_keys.get(path)
+    if key is None:
+        try:
+            key = THUMBNAILS.digest(path)
+        except FileNotFoundError:
+            key = path
+        RESOURCES.image_keys[path] = key
+    return key
+
+def flag_image(path):
+    # PNG bytes go straight to the browser, so a rerun neither reads nor
+    # decodes/re-encodes a thumbnail it has already shown once
+    key = image_key(path)
+    data = RESOURCES.images.get(key)
+    if data is None:
+        buf = io.BytesIO()
+        load_flag_image(path).save(buf, "PNG")
+        data = RESOURCES.images[key] = buf.getvalue()
+    return data
+
+def flag_image_url(path):
+    key = image_key(path)
+    url = RESOURCES.static_urls.get(key)
+    if url is None:
+        try:
+            url = publish_static(THUMBNAILS.path(path, (80, 50)))
+        except FileNotFoundError:
+            url = "data:image/png;base64," + base64.b64encode(flag_image(path)).decode("ascii")
+        RESOURCES.static_urls[key] = url
+    return url
+
 # -------------------------
 # Search function
 # -------------------------
-def search_flags(colours, patterns):
-    results = []
-    for flag in FLAGS:
-        if colours and not all(c in flag["colours"] for c in colours):
-            continue
-        if patterns and not all(p in flag["patterns"] for p in patterns):
-            continue
-        results.append(flag)
-    return results
+# One result cache for every session; it survives catalog reloads and
+# drops its entries when the catalog version changes
+@st.cache_resource
+def search_cache():
+    return SearchCache(CATALOG)
+
+SEARCH = search_cache()
+SEARCH.attach(CATALOG)
+
+def search_flags(colours, patterns, query="", text=""):
+    return SEARCH.search(colours, patterns, query, text)
+
+# Country autocomplete; Streamlit only reruns on Enter or when the field
+# loses focus, so suggestions follow the typed prefix at that point. The
+# name index is only loaded once something has been typed.
+SUGGESTIONS = 8
 
 # -------------------------
 # Sidebar: Search controls
@@ -55,48 +160,138 @@ def search_flags(colours, patterns):
 st.sidebar.title("Flag Finder Controls")
 col_input = st.sidebar.text_input("Colours (comma separated, check Help)", "")
 pat_input = st.sidebar.text_input("Patterns (comma separated, check Help)", "")
+query_input = st.sidebar.text_input("Query (e.g. red & (star | crescent) & !green)", "")
+text_input = st.sidebar.text_input("Fun fact (e.g. eagle, independence)", "")
+country_input = st.sidebar.text_input("Country name", "")
+photo_input = st.sidebar.file_uploader("What flag is this? Upload a photo", type=["png", "jpg", "jpeg", "webp"])
 search_btn = st.sidebar.button("Search")
 reset_btn = st.sidebar.button("Reset")
 help_btn = st.sidebar.button("Help")
+render_mode = st.sidebar.radio("Layout", ["Mosaic", "Columns"], horizontal=True)
 
 # -------------------------
 # Help modal
 # -------------------------
+# Each entry says how many flags would be left if it were added to the
+# search typed in the sidebar
+def facet_counts():
+    cols = split_list(col_input)
+    pats = split_list(pat_input)
+    try:
+        return SEARCH.facets(cols, pats, query_input, text_input)
+    except QueryError:
+        return SEARCH.facets()
+
 if help_btn:
+    colour_counts, pattern_counts = facet_counts()
     st.sidebar.subheader("Help: Colours")
-    unique_colours = sorted({c for f in FLAGS for c in f["colours"]})
-    st.sidebar.write(", ".join(unique_colours))
+    unique_colours = CATALOG.colours
+    st.sidebar.write(", ".join(f"{c} ({colour_counts.get(c, 0)})" for c in unique_colours))
 
     st.sidebar.subheader("Help: Patterns")
-    unique_patterns = sorted({p for f in FLAGS for p in f["patterns"]})
-    st.sidebar.write(", ".join(unique_patterns))
+    unique_patterns = CATALOG.patterns
+    st.sidebar.write(", ".join(f"{p} ({pattern_counts.get(p, 0)})" for p in unique_patterns))
 
 # -------------------------
 # Process search
 # -------------------------
 if "results" not in st.session_state:
     st.session_state.results = FLAGS
+    st.session_state.resolved = ""
+    st.session_state.photo_note = ""
 
 if search_btn:
-    cols = [c.strip().lower() for c in col_input.split(",") if c.strip()]
-    pats = [p.strip().lower() for p in pat_input.split(",") if p.strip()]
-    st.session_state.results = search_flags(cols, pats)
+    cols = split_list(col_input)
+    pats = split_list(pat_input)
+    try:
+        st.session_state.results = search_flags(cols, pats, query_input, text_input)
+        st.session_state.resolved = SEARCH.resolved(cols, pats, query_input, text_input)
+        st.session_state.photo_note = ""
+    except QueryError as e:
+        st.sidebar.error(f"Invalid query: {e}")
 
 if reset_btn:
     st.session_state.results = FLAGS
+    st.session_state.resolved = ""
+    st.session_state.photo_note = ""
     col_input = ""
     pat_input = ""
+    query_input = ""
+    text_input = ""
+    country_input = ""
+
+# A photo is matched once, when it is uploaded, on its dominant colours
+# and (when they have been computed) the flags' image features
+if photo_input is not None and st.session_state.get("photo_id") != photo_input.file_id:
+    st.session_state.photo_id = photo_input.file_id
+    try:
+        st.session_state.results, colours = match_photo(CATALOG, photo_input)
+        st.session_state.resolved = ""
+        named = ", ".join(f"{name} {share:.0%}" for name, share in colours)
+        st.session_state.photo_note = f"Closest flags to your photo ({named})" if named else f"No colours found in {photo_input.name}"
+    except (OSError, ValueError):
+        st.sidebar.error(f"Could not read {photo_input.name} as an image")
+
+suggestions = CATALOG.names().complete(country_input, SUGGESTIONS) if country_input.strip() else []
+for flag in suggestions:
+    if st.sidebar.button(flag["country"], key=f"country-{flag['file']}"):
+        st.session_state.results = [flag]
+        st.session_state.resolved = ""
+        st.session_state.photo_note = ""
 
 # -------------------------
 # Display flags in grid
 # -------------------------
+# Mosaic mode sends the whole grid as one HTML element whose tiles point
+# into the cached sprite sheet (or at static thumbnails when there is no
+# atlas). Columns mode keeps the per-flag st.columns layout, with each
+# tile an atlas div, falling back to st.image for flags not in the atlas.
+def tile_html(flag):
+    rect = ATLAS.rect(flag["file"]) if ATLAS_URL else None
+    if rect is None:
+        background = f"url({flag_image_url(flag['file'])}) 0 0 / 80px 50px no-repeat"
+    else:
+        background = f"url({ATLAS_URL}) -{rect[0]}px -{rect[1]}px no-repeat"
+    return (
+        f'<figure><div style="background:{background}"></div>'
+        f'<figcaption>{html.escape(flag["country"].capitalize())}</figcaption></figure>'
+    )
+
+MOSAIC_STYLE = """<style>
+.flag-mosaic { display:grid; grid-template-columns:repeat(auto-fill, minmax(100px, 1fr)); gap:16px; }
+.flag-mosaic figure { margin:0; display:flex; flex-direction:column; align-items:center; }
+.flag-mosaic figure div { width:80px; height:50px; }
+.flag-mosaic figcaption { font-size:14px; color:rgba(49, 51, 63, 0.6); text-align:center; margin-top:4px; }
+</style>"""
+
+def render_mosaic(flags):
+    tiles = "".join(tile_html(flag) for flag in flags)
+    st.html(f'{MOSAIC_STYLE}<div class="flag-mosaic">{tiles}</div>')
+
+def render_columns(flags):
+    cols_per_row = 6  # adjust for width
+
+    for i in range(0, len(flags), cols_per_row):
+        row_flags = flags[i:i+cols_per_row]
+        cols = st.columns(len(row_flags))
+        for col, flag in zip(cols, row_flags):
+            rect = ATLAS.rect(flag["file"]) if ATLAS_URL else None
+            if rect is None:
+                col.image(flag_image(flag["file"]))
+            else:
+                col.markdown(
+                    f'<div style="width:80px; height:50px; background:url({ATLAS_URL}) '
+                    f'-{rect[0]}px -{rect[1]}px no-repeat"></div>',
+                    unsafe_allow_html=True,
+                )
+            col.caption(flag["country"].capitalize())
+
 flags = st.session_state.results
-cols_per_row = 6  # adjust for width
-
-for i in range(0, len(flags), cols_per_row):
-    row_flags = flags[i:i+cols_per_row]
-    cols = st.columns(len(row_flags))
-    for col, flag in zip(cols, row_flags):
-        img = load_flag_image(flag["file"])
-        col.image(img)
-        col.caption(flag["country"].capitalize())
+if st.session_state.resolved:
+    st.caption(f"Showing results for {st.session_state.resolved}")
+if st.session_state.photo_note:
+    st.caption(st.session_state.photo_note)
+if render_mode == "Mosaic":
+    render_mosaic(flags)
+else:
+    render_columns(flags)
@@ -1,127 +1,384 @@
-import json
 import tkinter as tk
-from tkinter import ttk
+from tkinter import colorchooser, messagebox, ttk
 from PIL import Image, ImageTk, ImageDraw
 import os
 import tkinter.font as tkFont
+from collections import OrderedDict
+from flag_catalog import catalog_location, load_catalog
+from flag_query import SHARE_MODES, QueryError, and_queries, share_query, split_list
+from flag_search import SearchCache
+from flag_thumbnails import ThumbnailAtlas, ThumbnailCache
 
 # -------------------------
 # Setup
 # -------------------------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-with open(os.path.join(BASE_DIR, "flags.json"), "r", encoding="utf-8") as f:
-    FLAGS = json.load(f)
+DATA_DIR, CATALOG_SOURCE = catalog_location(BASE_DIR)
+CATALOG = load_catalog(DATA_DIR, CATALOG_SOURCE)
+FLAGS = CATALOG.flags
+INDEX = CATALOG.index
+SEARCH = SearchCache(CATALOG)
+THUMBNAILS = ThumbnailCache(DATA_DIR)
+ATLAS = ThumbnailAtlas(THUMBNAILS, (80, 50))
 
-# Keep references to images to prevent garbage collection
-result_images = []
+# Decoded sprite sheet that flag tiles are copied out of
+atlas_photo = None
 
 # -------------------------
 # Flag image loader
 # -------------------------
 def load_flag_image(path):
-    full_path = os.path.join(BASE_DIR, path)
     try:
-        img = Image.open(full_path).resize((80, 50))
+        img = THUMBNAILS.load(path, (80, 50))
     except FileNotFoundError:
         img = Image.new("RGB", (80, 50), color="gray")
         draw = ImageDraw.Draw(img)
         draw.text((5, 20), "No Img", fill="white")
     return img
 
+def flag_photo(flag):
+    global atlas_photo
+    rect = ATLAS.rect(flag["file"])
+    if rect is None:
+        return ImageTk.PhotoImage(load_flag_image(flag["file"]))
+
+    # Decode the sprite sheet once and copy each flag's tile out of it
+    if atlas_photo is None:
+        atlas_photo = ImageTk.PhotoImage(ATLAS.image())
+    photo = tk.PhotoImage(width=rect[2] - rect[0], height=rect[3] - rect[1])
+    photo.tk.call(photo, "copy", atlas_photo, "-from", *rect)
+    return photo
+
 # -------------------------
 # Display flags
 # -------------------------
-def display_flags(results):
-    global result_images
-    result_images.clear()
-
-    for widget in flag_frame.winfo_children():
-        widget.destroy()
-
-    def redraw(event=None):
-        for widget in flag_frame.winfo_children():
-            widget.destroy()
-
-        canvas_width = canvas.winfo_width()
-        padding = 10  # horizontal padding per flag
-        default_flag_width = 80  # image width
-
-        # Prepare font to measure text width
-        label_font = tkFont.Font(family="Arial", size=10)
-
-        # Compute max column width dynamically based on flags and names
-        max_col_widths = []
+# Only the rows in view (plus OVERSCAN_ROWS either side) have widgets. A
+# fixed pool of cells is placed on the canvas; a flag that stays in view
+# keeps its cell (it is only moved), so scrolling or a new result set only
+# re-targets the cells whose flag changed. Their images are filled in
+# IMAGE_BATCH at a time from the event loop, always for the flag the cell
+# shows by then, so images for results that were already replaced are
+# never loaded.
+FLAG_WIDTH = 80
+FLAG_HEIGHT = 50
+CELL_PADDING = 10
+OVERSCAN_ROWS = 2
+RESIZE_DELAY_MS = 60
+IMAGE_BATCH = 24
+
+class GridCell:
+    def __init__(self, parent, on_click):
+        self.frame = ttk.Frame(parent)
+        self.image_label = ttk.Label(self.frame)
+        self.image_label.pack(padx=5, pady=(5,0))
+        self.name_label = ttk.Label(self.frame, font=("Arial", 10))
+        self.name_label.pack(padx=5, pady=(0,5))
+        for widget in (self.image_label, self.name_label):
+            widget.bind("<Button-1>", lambda e: self.flag is not None and on_click(self.flag))
+        self.window = parent.create_window(0, 0, window=self.frame, anchor="n", state="hidden")
+        self.pos = None
+        self.flag = None
+        self.xy = None
+
+class FlagGrid:
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.results = []
+        self.cells = []
+        self.columns = None
+        self.col_width = FLAG_WIDTH + CELL_PADDING
+        self.row_height = None
+        self.font = tkFont.Font(family="Arial", size=10)
+        # Country name widths never change for a catalog, so each one is
+        # measured once
+        self.text_widths = {}
+        self.pending_layout = None
+        # Space above the first row, left free for the docked search bar
+        self.top = 0
+        self.image_queue = []
+        self.pending_images = None
+        # Called with the flag when a cell is clicked
+        self.on_click = None
+        # Tiles for recently shown flags, bounded so huge catalogs don't
+        # keep every PhotoImage alive
+        self.photos = OrderedDict()
+
+    def show(self, results):
+        self.results = results
+        widest = FLAG_WIDTH
         for flag in results:
-            text_width = label_font.measure(flag["country"])
-            col_width = max(default_flag_width, text_width) + padding
-            max_col_widths.append(col_width)
-
-        avg_col_width = max(max_col_widths) if max_col_widths else default_flag_width + padding
-        max_columns = max(1, canvas_width // avg_col_width)
+            name = flag["country"]
+            width = self.text_widths.get(name)
+            if width is None:
+                width = self.text_widths[name] = self.font.measure(name)
+            if width > widest:
+                widest = width
+        self.col_width = widest + CELL_PADDING
+        self.canvas.yview_moveto(0)
+        self.layout(force=True)
+
+    def set_top(self, top):
+        # Takes effect on the next show()
+        self.top = top
+
+    def schedule_layout(self, event=None):
+        # Coalesce a burst of <Configure> events (e.g. dragging the window
+        # edge) into one layout once it settles
+        if self.pending_layout is not None:
+            self.canvas.after_cancel(self.pending_layout)
+        self.pending_layout = self.canvas.after(RESIZE_DELAY_MS, self.layout)
+
+    def layout(self, force=False):
+        self.pending_layout = None
+        columns = max(1, self.canvas.winfo_width() // self.col_width)
+        if columns != self.columns or force:
+            # Cells keep their flags; refresh() only moves them to their
+            # new row/column
+            self.columns = columns
+            rows = -(-len(self.results) // columns)
+            self.canvas.config(scrollregion=(0, 0, columns * self.col_width, self.top + rows * self._row_height()))
+        # Same column count: nothing moves, but a taller window may bring
+        # extra rows into view
+        self.refresh()
+
+    def refresh(self):
+        # Scrolling can arrive before the first layout has sized the grid
+        if self.columns is None:
+            return
+        row_height = self._row_height()
+        top = self.canvas.canvasy(0) - self.top
+        first_row = max(0, int(top // row_height) - OVERSCAN_ROWS)
+        last_row = int((top + self.canvas.winfo_height()) // row_height) + OVERSCAN_ROWS
+        start = first_row * self.columns
+        end = min(len(self.results), (last_row + 1) * self.columns)
+
+        needed = min(len(self.results), (last_row - first_row + 1) * self.columns)
+        while len(self.cells) < needed:
+            self.cells.append(GridCell(self.canvas, self.clicked))
+
+        # Cells already showing a flag that is still in view stay with it;
+        # every other cell is free to take a newly visible flag
+        visible = self.results[start:end]
+        wanted = {id(flag) for flag in visible}
+        kept = {id(cell.flag): cell for cell in self.cells if id(cell.flag) in wanted}
+        free = [cell for cell in self.cells if id(cell.flag) not in kept]
+
+        for pos, flag in enumerate(visible, start):
+            cell = kept.get(id(flag))
+            if cell is None:
+                cell = free.pop()
+                cell.flag = flag
+                photo = self.photos.get(flag["file"])
+                cell.image_label.configure(image=photo or "")
+                if photo is None:
+                    self.image_queue.append(cell)
+                cell.name_label.configure(text=flag["country"])
+            row, column = divmod(pos, self.columns)
+            xy = (column * self.col_width + self.col_width // 2, self.top + row * row_height)
+            if cell.xy != xy:
+                cell.xy = xy
+                self.canvas.coords(cell.window, *xy)
+            if cell.pos is None:
+                self.canvas.itemconfigure(cell.window, state="normal")
+            cell.pos = pos
+
+        for cell in free:
+            if cell.flag is not None:
+                cell.pos = None
+                cell.flag = None
+                self.canvas.itemconfigure(cell.window, state="hidden")
+
+        if self.image_queue and self.pending_images is None:
+            self.pending_images = self.canvas.after_idle(self._load_images)
+
+    def _load_images(self):
+        self.pending_images = None
+        batch = self.image_queue[:IMAGE_BATCH]
+        del self.image_queue[:IMAGE_BATCH]
+        for cell in batch:
+            if cell.flag is not None:
+                cell.image_label.configure(image=self._photo(cell.flag))
+        if self.image_queue:
+            self.pending_images = self.canvas.after(1, self._load_images)
+
+    def _row_height(self):
+        if self.row_height is None:
+            self.row_height = FLAG_HEIGHT + self.font.metrics("linespace") + 2 * CELL_PADDING
+        return self.row_height
+
+    def _photo(self, flag):
+        key = flag["file"]
+        photo = self.photos.get(key)
+        if photo is None:
+            photo = self.photos[key] = flag_photo(flag)
+            while len(self.photos) > 4 * len(self.cells) + 64:
+                self.photos.popitem(last=False)
+        else:
+            self.photos.move_to_end(key)
+        return photo
+
+    def clicked(self, flag):
+        if self.on_click is not None:
+            self.on_click(flag)
 
-        row = 0
-        column = 0
-
-        for flag in results:
-            img = load_flag_image(flag["file"])
-            img_tk = ImageTk.PhotoImage(img)
-            result_images.append(img_tk)
-
-            flag_label = ttk.Label(flag_frame, image=img_tk)
-            flag_label.grid(row=row, column=column, padx=5, pady=(5,0), sticky="n")
-
-            # <-- Change: set Arial font for country names
-            name_label = ttk.Label(flag_frame, text=flag["country"], font=("Arial", 10))
-            name_label.grid(row=row+1, column=column, padx=5, pady=(0,5))
-
-            column += 1
-            if column >= max_columns:
-                column = 0
-                row += 2
-
-        flag_frame.update_idletasks()
-        canvas.config(scrollregion=canvas.bbox("all"))
+def display_flags(results):
+    grid.show(results)
 
-    redraw()
-    canvas.bind("<Configure>", lambda e: redraw())
+def on_canvas_scroll(first, last):
+    scrollbar.set(first, last)
+    grid.refresh()
 
 # -------------------------
 # Search function
 # -------------------------
-def search(colours, patterns):
-    results = []
-    for flag in FLAGS:
-        if colours and not all(c in flag["colours"] for c in colours):
-            continue
-        if patterns and not all(p in flag["patterns"] for p in patterns):
-            continue
-        results.append(flag)
-    return results
+def search(colours, patterns, query="", text=""):
+    return SEARCH.search(colours, patterns, query, text)
+
+# When nothing matches exactly, the flags sharing the most (and rarest)
+# attributes with the search are shown instead, labelled as such
+def closest(colours, patterns, query=""):
+    return SEARCH.closest(colours, patterns, query)
+
+def current_search():
+    cols = split_list(entry_colours.get())
+    pats = split_list(entry_patterns.get())
+    share = share_query(share_colour.get(), share_mode.get(), share_percent.get())
+    return cols, pats, and_queries(entry_query.get(), share), entry_text.get()
+
+def pick_colour():
+    # A colour from the picker goes into the colours field as a hex code,
+    # which searches for the nearest named colour
+    _, code = colorchooser.askcolor(title="Pick a colour", parent=root)
+    if not code:
+        return
+    current = entry_colours.get().strip().rstrip(",")
+    entry_colours.delete(0, tk.END)
+    entry_colours.insert(0, f"{current}, {code}" if current else code)
+    schedule_live_search()
+
+def facet_counts():
+    # Counts for the search currently typed in, or for the whole catalog
+    # while the query doesn't parse
+    try:
+        return SEARCH.facets(*current_search())
+    except QueryError:
+        return SEARCH.facets()
 
 def on_search():
-    cols = [c.strip().lower() for c in entry_colours.get().split(",") if c.strip()]
-    pats = [p.strip().lower() for p in entry_patterns.get().split(",") if p.strip()]
-    results = search(cols, pats)
+    try:
+        cols, pats, query, text = current_search()
+        results = search(cols, pats, query, text)
+    except QueryError as e:
+        messagebox.showerror("Invalid query", str(e))
+        return
+    cancel_live_search()
     controls_frame.place_forget()
+    grid.set_top(0)
     show_reset_button()
+    note = SEARCH.resolved(cols, pats, query, text)
+    exact = bool(results)
+    if not exact:
+        results = closest(cols, pats, query)
+    show_resolved(note, closest=not exact and bool(results))
+    display_flags(results)
+
+# -------------------------
+# Search as you type
+# -------------------------
+# Each keystroke restarts a LIVE_SEARCH_DELAY_MS timer and the search runs
+# once typing pauses. While there are live results the search controls are
+# docked above the grid instead of covering the whole window.
+LIVE_SEARCH_DELAY_MS = 250
+pending_search = None
+last_live_search = None
+
+def cancel_live_search():
+    global pending_search, last_live_search
+    if pending_search is not None:
+        root.after_cancel(pending_search)
+    pending_search = None
+    last_live_search = None
+
+def schedule_live_search(event=None):
+    global pending_search
+    if pending_search is not None:
+        root.after_cancel(pending_search)
+    pending_search = root.after(LIVE_SEARCH_DELAY_MS, live_search)
+
+def live_search():
+    global pending_search, last_live_search
+    pending_search = None
+    try:
+        cols, pats, query, text = current_search()
+    except QueryError as e:
+        live_status.config(text=f"Invalid query: {e}")
+        return
+    key = (cols, pats, query.strip(), text.strip())
+    if key == last_live_search:
+        # Cursor keys, Shift and friends don't change the search
+        return
+    last_live_search = key
+
+    if not (cols or pats or query.strip() or text.strip()):
+        live_status.config(text="")
+        dock_controls(False)
+        grid.show([])
+        return
+    try:
+        results = search(cols, pats, query, text)
+    except QueryError as e:
+        live_status.config(text=f"Invalid query: {e}")
+        return
+    note = SEARCH.resolved(cols, pats, query, text)
+    status = f"{len(results)} matching flags"
+    if not results:
+        results = closest(cols, pats, query)
+        if results:
+            status = f"No exact matches, {len(results)} closest matches"
+    live_status.config(text=status + (f" ({note})" if note else ""))
+    dock_controls(True)
     display_flags(results)
 
+def dock_controls(docked):
+    if docked:
+        height = controls_inner.winfo_reqheight() + 20
+        controls_frame.place(relx=0, rely=0, relwidth=1, relheight=0, height=height)
+        grid.set_top(height)
+    else:
+        controls_frame.place(relx=0, rely=0, relwidth=1, relheight=1, height=0)
+        grid.set_top(0)
+
+# -------------------------
+# Similar flags
+# -------------------------
+# Clicking a flag in the grid shows the flags whose artwork looks most
+# like it, once flag_features.py has computed the image vectors
+def show_similar(flag):
+    features = CATALOG.features()
+    if features is None:
+        messagebox.showinfo("Similar flags", "Run flag_features.py to compute image features first.")
+        return
+    cancel_live_search()
+    controls_frame.place_forget()
+    grid.set_top(0)
+    show_reset_button()
+    resolved_label.config(text=f"Flags that look like {flag['country']}")
+    resolved_label.place(relx=0.02, rely=0.02, anchor="nw")
+    display_flags(features.similar(flag))
+
 # -------------------------
 # Reset function
 # -------------------------
 def reset_view():
-    global result_images
-    result_images.clear()
     hide_reset_button()
-
-    for widget in flag_frame.winfo_children():
-        widget.destroy()
+    show_resolved("")
+    cancel_live_search()
+    live_status.config(text="")
+    grid.show([])
 
     # Show full-screen search again
-    controls_frame.place(relx=0, rely=0, relwidth=1, relheight=1)
-    flag_frame.update_idletasks()
-    canvas.config(scrollregion=canvas.bbox("all"))
+    dock_controls(False)
 
 # -------------------------
 # Fullscreen toggle
@@ -168,18 +425,39 @@ def show_help():
     help_win.colour_images = []
     help_win.pattern_images = []
 
+    # Clicking an entry narrows the current search by that colour/pattern;
+    # the counts say how many flags that would leave
+    colour_counts, pattern_counts = facet_counts()
+
     def apply_filter(colours=None, pattern=None):
         help_win.destroy()
+        cancel_live_search()
+        grid.set_top(0)
+        try:
+            cols, pats, query, text = current_search()
+            cols += colours or []
+            pats += [pattern] if pattern else []
+            results = search(cols, pats, query, text)
+            note = SEARCH.resolved(cols, pats, query, text)
+        except QueryError:
+            cols, pats, query = colours or [], [pattern] if pattern else [], ""
+            results = search(cols, pats)
+            note = ""
+        exact = bool(results)
+        if not exact:
+            results = closest(cols, pats, query)
         controls_frame.place_forget()
         show_reset_button()
-        results = FLAGS
-        if colours:
-            results = [f for f in FLAGS if all(c in f["colours"] for c in colours)]
-        if pattern:
-            results = [f for f in results if pattern in f["patterns"]]
+        show_resolved(note, closest=not exact and bool(results))
         display_flags(results)
 
-    unique_colours = sorted({c for flag in FLAGS for c in flag["colours"]})
+    def count_label(row, name, count):
+        label = ttk.Label(row, text=f"{name.capitalize()} ({count})")
+        if not count:
+            label.configure(foreground="gray")
+        return label
+
+    unique_colours = CATALOG.colours
     for colour in unique_colours:
         row = ttk.Frame(colours_frame)
         row.pack(anchor="w", pady=5)
@@ -187,39 +465,42 @@ def show_help():
         canvas_sample.create_rectangle(0, 0, 80, 50, fill=colour)
         canvas_sample.pack(side="left", padx=(0,5))
         canvas_sample.bind("<Button-1>", lambda e, c=[colour]: apply_filter(colours=c))
-        ttk.Label(row, text=colour.capitalize()).pack(side="left", padx=5)
+        count_label(row, colour, colour_counts.get(colour, 0)).pack(side="left", padx=5)
 
-    unique_patterns = sorted({p for flag in FLAGS for p in flag["patterns"]})
+    unique_patterns = CATALOG.patterns
     for pattern in unique_patterns:
         row = ttk.Frame(patterns_frame)
         row.pack(anchor="w", pady=5)
-        example_flag = next((f for f in FLAGS if pattern in f["patterns"]), None)
+        example_flag = CATALOG.example_flag(pattern)
         if example_flag:
-            img = load_flag_image(example_flag["file"]).resize((80,50))
-            img_tk = ImageTk.PhotoImage(img)
+            img_tk = flag_photo(example_flag)
             help_win.pattern_images.append(img_tk)
             img_label = ttk.Label(row, image=img_tk)
             img_label.pack(side="left", padx=(0,5))
             img_label.bind("<Button-1>", lambda e, p=pattern: apply_filter(pattern=p))
-        ttk.Label(row, text=pattern.capitalize()).pack(side="left")
+        count_label(row, pattern, pattern_counts.get(pattern, 0)).pack(side="left")
 
 # -------------------------
 # GUI setup
 # -------------------------
 root = tk.Tk()
 root.title("Flag Finder")
-root.state("zoomed")
+try:
+    root.state("zoomed")
+except tk.TclError:
+    # X11 window managers have no "zoomed" state
+    root.attributes("-zoomed", True)
 root.resizable(True, True)
 root.bind("<Escape>", toggle_fullscreen)
 
 canvas = tk.Canvas(root)
 scrollbar = tk.Scrollbar(root, orient="vertical", command=canvas.yview)
-canvas.config(yscrollcommand=scrollbar.set)
-flag_frame = ttk.Frame(canvas)
-canvas.create_window((0,0), window=flag_frame, anchor="nw")
+canvas.config(yscrollcommand=on_canvas_scroll)
 canvas.pack(side="left", fill="both", expand=True)
 scrollbar.pack(side="right", fill="y")
-flag_frame.bind("<Configure>", lambda e: canvas.config(scrollregion=canvas.bbox("all")))
+grid = FlagGrid(canvas)
+grid.on_click = show_similar
+canvas.bind("<Configure>", grid.schedule_layout)
 
 controls_frame = ttk.Frame(root, relief="raised", borderwidth=2)
 controls_frame.place(relx=0, rely=0, relwidth=1, relheight=1)
@@ -229,13 +510,44 @@ controls_inner.place(relx=0.5, rely=0.5, anchor="center")
 ttk.Label(controls_inner, text="Colours (check help):", font=("Arial", 16)).grid(row=0, column=0, padx=10, pady=10, sticky="w")
 entry_colours = ttk.Entry(controls_inner, font=("Arial", 16), width=30)
 entry_colours.grid(row=0, column=1, padx=10, pady=10)
+ttk.Button(controls_inner, text="Pick…", command=pick_colour).grid(row=0, column=2, padx=(0,10), pady=10)
 
 ttk.Label(controls_inner, text="Patterns (check help):", font=("Arial", 16)).grid(row=1, column=0, padx=10, pady=10, sticky="w")
 entry_patterns = ttk.Entry(controls_inner, font=("Arial", 16), width=30)
 entry_patterns.grid(row=1, column=1, padx=10, pady=10)
 
-ttk.Button(controls_inner, text="Search", command=on_search, width=15).grid(row=2, column=0, columnspan=2, pady=(20,10))
-ttk.Button(controls_inner, text="Help", command=show_help, width=15).grid(row=3, column=0, columnspan=2, pady=(0,10))
+ttk.Label(controls_inner, text="Query (e.g. red & !green):", font=("Arial", 16)).grid(row=2, column=0, padx=10, pady=10, sticky="w")
+entry_query = ttk.Entry(controls_inner, font=("Arial", 16), width=30)
+entry_query.grid(row=2, column=1, padx=10, pady=10)
+
+ttk.Label(controls_inner, text="Fun fact (e.g. eagle):", font=("Arial", 16)).grid(row=3, column=0, padx=10, pady=10, sticky="w")
+entry_text = ttk.Entry(controls_inner, font=("Arial", 16), width=30)
+entry_text.grid(row=3, column=1, padx=10, pady=10)
+
+# How much of the flag a colour covers, measured by flag_tagging.py
+ttk.Label(controls_inner, text="Colour share:", font=("Arial", 16)).grid(row=4, column=0, padx=10, pady=10, sticky="w")
+share_frame = ttk.Frame(controls_inner)
+share_frame.grid(row=4, column=1, padx=10, pady=10, sticky="w")
+share_mode = ttk.Combobox(share_frame, values=["any"] + list(SHARE_MODES), state="readonly", font=("Arial", 16), width=8)
+share_mode.set("any")
+share_mode.pack(side="left")
+share_percent = ttk.Spinbox(share_frame, from_=0, to=100, increment=5, font=("Arial", 16), width=4)
+share_percent.set(30)
+share_percent.pack(side="left", padx=5)
+ttk.Label(share_frame, text="% of", font=("Arial", 16)).pack(side="left")
+share_colour = ttk.Combobox(share_frame, values=CATALOG.colours, state="readonly", font=("Arial", 16), width=9)
+share_colour.pack(side="left", padx=5)
+
+ttk.Button(controls_inner, text="Search", command=on_search, width=15).grid(row=5, column=0, columnspan=2, pady=(20,10))
+ttk.Button(controls_inner, text="Help", command=show_help, width=15).grid(row=6, column=0, columnspan=2, pady=(0,10))
+live_status = ttk.Label(controls_inner, font=("Arial", 12))
+live_status.grid(row=7, column=0, columnspan=2)
+
+for entry in (entry_colours, entry_patterns, entry_query, entry_text, share_percent):
+    entry.bind("<KeyRelease>", schedule_live_search)
+for box in (share_mode, share_colour):
+    box.bind("<<ComboboxSelected>>", schedule_live_search)
+share_percent.configure(command=schedule_live_search)
 
 # -------------------------
 # Reset button (floating)
@@ -257,4 +569,18 @@ def show_reset_button():
 def hide_reset_button():
     reset_button.place_forget()
 
-root.mainloop()
\ No newline at end of file
+# What misspelt or synonym terms were taken to mean
+resolved_label = tk.Label(root, bg="lightyellow", font=("Arial", 12), padx=10, pady=5)
+
+def show_resolved(note, closest=False):
+    if closest:
+        resolved_label.config(text="No exact matches, showing closest matches" + (f" for {note}" if note else ""))
+        resolved_label.place(relx=0.02, rely=0.02, anchor="nw")
+    elif note:
+        resolved_label.config(text=f"Showing results for {note}")
+        resolved_label.place(relx=0.02, rely=0.02, anchor="nw")
+    else:
+        resolved_label.place_forget()
+
+if __name__ == "__main__":
+    root.mainloop()
\ No newline at end of file
@@ -0,0 +1,217 @@
+import argparse
+import json
+import math
+import os
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageDraw
+
+from flag_catalog import DEFAULT_SOURCE, build_catalog
+
+# -------------------------
+# Synthetic catalog generator
+# -------------------------
+# Writes flags.json-schema catalogs of any size for scale testing. Colour
+# and pattern frequencies, and how many of each a flag has, are learned
+# from the real flags.json, so bitmask densities and result sizes look like
+# production. Point the apps at the output with FLAG_FINDER_CATALOG:
+#
+#   python flag_generator.py --count 100000 --output synthetic --images
+#   FLAG_FINDER_CATALOG=synthetic/flags.json python flag_finder_tkinter.py
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SYLLABLES = (
+    "al", "an", "ar", "bel", "bor", "ca", "dan", "del", "dor", "el", "fen", "gar", "hal", "is",
+    "ka", "kor", "la", "len", "mar", "mon", "nor", "os", "pal", "ra", "ren", "sal", "sor", "ta",
+    "tor", "ul", "va", "vel", "wen", "ya", "zan",
+)
+NAME_FORMS = (
+    "{}", "{}", "{}", "{} Islands", "Province of {}", "Republic of {}", "{} Territory",
+    "Free State of {}", "Historic {}", "{} Canton", "County of {}",
+)
+FACTS = (
+    "{name}'s flag was adopted in {year} and is mostly {colour}.",
+    "The {pattern} on {name}'s flag dates back to {year}.",
+    "{name} has flown a {colour} and {colour2} flag since {year}.",
+    "Legend says the {colour} on {name}'s flag stands for courage.",
+    "{name}'s flag was redesigned in {year} to add the {pattern}.",
+)
+
+
+class Distribution:
+    def __init__(self, flags):
+        colours = Counter(c for flag in flags for c in flag["colours"])
+        patterns = Counter(p for flag in flags for p in flag["patterns"])
+        self.colours, self.colour_weights = zip(*colours.most_common())
+        self.patterns, self.pattern_weights = zip(*patterns.most_common())
+        colour_counts = Counter(len(flag["colours"]) for flag in flags)
+        pattern_counts = Counter(len(flag["patterns"]) for flag in flags)
+        self.colour_counts, self.colour_count_weights = zip(*sorted(colour_counts.items()))
+        self.pattern_counts, self.pattern_count_weights = zip(*sorted(pattern_counts.items()))
+
+    @staticmethod
+    def _sample(rng, values, weights, k):
+        # Weighted sample without replacement
+        k = min(k, len(values))
+        chosen = []
+        while len(chosen) < k:
+            value = rng.choices(values, weights)[0]
+            if value not in chosen:
+                chosen.append(value)
+        return chosen
+
+    def colours_for(self, rng):
+        k = rng.choices(self.colour_counts, self.colour_count_weights)[0]
+        return self._sample(rng, self.colours, self.colour_weights, k)
+
+    def patterns_for(self, rng):
+        k = rng.choices(self.pattern_counts, self.pattern_count_weights)[0]
+        return self._sample(rng, self.patterns, self.pattern_weights, k)
+
+
+def _code(i):
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    code = ""
+    while True:
+        i, r = divmod(i, 36)
+        code = digits[r] + code
+        if not i:
+            break
+    return "x-" + code
+
+
+def _name(rng, used, code):
+    stem = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+    name = rng.choice(NAME_FORMS).format(stem)
+    if name in used:
+        # Codes are unique, so this always breaks the tie
+        name = f"{name} ({code.upper()})"
+    used.add(name)
+    return name
+
+
+def generate_flags(real_flags, count, seed=0):
+    rng = random.Random(seed)
+    dist = Distribution(real_flags)
+    used = set()
+    flags = []
+    for i in range(count):
+        code = _code(i)
+        name = _name(rng, used, code)
+        colours = dist.colours_for(rng)
+        patterns = dist.patterns_for(rng)
+        fact = rng.choice(FACTS).format(
+            name=name,
+            year=rng.randint(1600, 2020),
+            colour=colours[0],
+            colour2=colours[-1],
+            pattern=patterns[0] if patterns else "design",
+        )
+        flags.append({
+            "country": name,
+            "code": code,
+            "file": f"flags/{code}.png",
+            "colours": colours,
+            "patterns": patterns,
+            "fun_fact": fact,
+        })
+    return flags
+
+
+# -------------------------
+# Procedural flag images
+# -------------------------
+IMAGE_SIZE = (240, 150)
+
+
+def draw_flag(flag):
+    w, h = IMAGE_SIZE
+    colours = flag["colours"]
+    patterns = set(flag["patterns"])
+    img = Image.new("RGB", IMAGE_SIZE, colours[0])
+    draw = ImageDraw.Draw(img)
+    bands = colours[:3]
+
+    if "vertical" in patterns:
+        for i, colour in enumerate(bands):
+            draw.rectangle((i * w // len(bands), 0, (i + 1) * w // len(bands), h), fill=colour)
+    elif "horizontal" in patterns or len(colours) > 1:
+        for i, colour in enumerate(bands):
+            draw.rectangle((0, i * h // len(bands), w, (i + 1) * h // len(bands)), fill=colour)
+
+    accent = colours[-1]
+    if "cross" in patterns:
+        draw.rectangle((w // 3, 0, w // 3 + h // 6, h), fill=accent)
+        draw.rectangle((0, h // 2 - h // 12, w, h // 2 + h // 12), fill=accent)
+    if "diagonal" in patterns or "zigzag" in patterns:
+        draw.polygon(((0, h), (w // 5, h), (w, 0), (w - w // 5, 0)), fill=accent)
+    if "triangle" in patterns:
+        draw.polygon(((0, 0), (w // 3, h // 2), (0, h)), fill=accent)
+    if "circle" in patterns or "crescent" in patterns:
+        draw.ellipse((w // 2 - h // 5, h // 2 - h // 5, w // 2 + h // 5, h // 2 + h // 5), fill=accent)
+        if "crescent" in patterns:
+            draw.ellipse((w // 2 - h // 8, h // 2 - h // 5, w // 2 + h // 4, h // 2 + h // 5), fill=colours[0])
+    if "star" in patterns:
+        cx, cy, r = w // 6, h // 4, h // 8
+        points = []
+        for k in range(10):
+            radius = r if k % 2 == 0 else r * 0.4
+            angle = math.pi / 2 + k * math.pi / 5
+            points.append((cx + radius * math.cos(angle), cy - radius * math.sin(angle)))
+        draw.polygon(points, fill=accent)
+    if patterns & {"crest", "weapon", "dragon", "writing"}:
+        draw.rectangle((w // 2 - h // 8, h // 2 - h // 8, w // 2 + h // 8, h // 2 + h // 8), fill=accent, outline="black")
+    return img
+
+
+def _draw_chunk(job):
+    out_dir, flags = job
+    for flag in flags:
+        draw_flag(flag).save(os.path.join(out_dir, flag["file"]), "PNG")
+    return len(flags)
+
+
+def write_images(out_dir, flags, workers=None, chunk=500):
+    os.makedirs(os.path.join(out_dir, "flags"), exist_ok=True)
+    jobs = [(out_dir, flags[i:i + chunk]) for i in range(0, len(flags), chunk)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(_draw_chunk, jobs))
+
+
+# -------------------------
+# CLI
+# -------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic Flag Finder catalog")
+    parser.add_argument("--count", type=int, default=10_000)
+    parser.add_argument("--output", required=True, help="directory to write flags.json (and flags/) into")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--images", action="store_true", help="also draw a PNG for every flag")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--compile", action="store_true", help="also build the binary catalog")
+    parser.add_argument("--source", default=os.path.join(BASE_DIR, DEFAULT_SOURCE),
+                        help="real catalog to learn distributions from")
+    args = parser.parse_args(argv)
+
+    with open(args.source, "r", encoding="utf-8") as f:
+        real_flags = json.load(f)
+    flags = generate_flags(real_flags, args.count, args.seed)
+
+    os.makedirs(args.output, exist_ok=True)
+    target = os.path.join(args.output, DEFAULT_SOURCE)
+    with open(target, "w", encoding="utf-8") as f:
+        json.dump(flags, f, ensure_ascii=False, separators=(",", ":"))
+    print(f"Wrote {len(flags)} flags to {target}")
+
+    if args.images:
+        drawn = write_images(args.output, flags, args.workers)
+        print(f"Drew {drawn} flag images")
+    if args.compile:
+        print(f"Wrote {build_catalog(target)}")
+
+
+if __name__ == "__main__":
+    main()
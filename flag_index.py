@@ -0,0 +1,111 @@
+# -------------------------
+# Bitset inverted index
+# -------------------------
+# Every colour and pattern maps to one int whose bit i is set when flags[i]
+# has that attribute, so a query is a handful of ANDs plus a popcount and
+# costs roughly the same for 254 flags as for 250k.
+
+# Bit positions set in each byte value, used to walk a mask without
+# testing every bit one at a time
+_BYTE_BITS = [tuple(b for b in range(8) if value >> b & 1) for value in range(256)]
+
+
+def _positions_to_mask(positions, size):
+    buf = bytearray((size + 7) // 8)
+    for i in positions:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+def mask_positions(mask):
+    positions = []
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+    for byte_no, value in enumerate(data):
+        if value:
+            base = byte_no << 3
+            positions.extend(base + b for b in _BYTE_BITS[value])
+    return positions
+
+
+class FlagIndex:
+    def __init__(self, flags):
+        self.flags = flags
+        self.size = len(flags)
+        self.all_mask = (1 << self.size) - 1
+
+        colour_positions = {}
+        pattern_positions = {}
+        for i, flag in enumerate(flags):
+            for c in flag["colours"]:
+                colour_positions.setdefault(c, []).append(i)
+            for p in flag["patterns"]:
+                pattern_positions.setdefault(p, []).append(i)
+
+        self._set_masks(
+            {c: _positions_to_mask(pos, self.size) for c, pos in colour_positions.items()},
+            {p: _positions_to_mask(pos, self.size) for p, pos in pattern_positions.items()},
+        )
+
+    @classmethod
+    def from_masks(cls, flags, colour_bits, pattern_bits, example_positions=None):
+        # Rebuild an index from masks that were computed ahead of time;
+        # example_positions: pattern -> position of its first flag
+        index = cls.__new__(cls)
+        index.flags = flags
+        index.size = len(flags)
+        index.all_mask = (1 << index.size) - 1
+        index._set_masks(colour_bits, pattern_bits)
+        index.example_positions = example_positions or {}
+        return index
+
+    def _set_masks(self, colour_bits, pattern_bits):
+        self.colour_bits = colour_bits
+        self.pattern_bits = pattern_bits
+        self.colours = sorted(colour_bits)
+        self.patterns = sorted(pattern_bits)
+        self.examples = {}
+        self.example_positions = {}
+
+    def mask(self, colours=(), patterns=()):
+        mask = self.all_mask
+        for c in colours:
+            mask &= self.colour_bits.get(c, 0)
+            if not mask:
+                return 0
+        for p in patterns:
+            mask &= self.pattern_bits.get(p, 0)
+            if not mask:
+                return 0
+        return mask
+
+    def count(self, colours=(), patterns=()):
+        return self.mask(colours, patterns).bit_count()
+
+    def flags_for_mask(self, mask):
+        if mask == self.all_mask:
+            return list(self.flags)
+        flags = self.flags
+        return [flags[i] for i in mask_positions(mask)]
+
+    def search(self, colours=(), patterns=()):
+        return self.flags_for_mask(self.mask(colours, patterns))
+
+    def facets(self, mask=None):
+        # How many flags of the result set each colour and pattern would
+        # leave if it were added to the search: one AND and popcount each
+        if mask is None:
+            mask = self.all_mask
+        return (
+            {c: (mask & bits).bit_count() for c, bits in self.colour_bits.items()},
+            {p: (mask & bits).bit_count() for p, bits in self.pattern_bits.items()},
+        )
+
+    def example(self, pattern):
+        # First flag (in catalog order) carrying the pattern, for help dialogs
+        if pattern not in self.examples:
+            pos = self.example_positions.get(pattern)
+            if pos is None:
+                mask = self.pattern_bits.get(pattern, 0)
+                pos = (mask & -mask).bit_length() - 1 if mask else None
+            self.examples[pattern] = None if pos is None else self.flags[pos]
+        return self.examples[pattern]
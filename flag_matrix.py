@@ -0,0 +1,142 @@
+import numpy as np
+
+# -------------------------
+# Dense attribute matrix
+# -------------------------
+# The catalog's colours and patterns as one boolean flags x attributes
+# matrix (colours first, then patterns, in vocabulary order). A batch of N
+# queries becomes an N x attributes matrix, and every result set comes out
+# of one matrix multiply: a flag matches a query when the number of the
+# query's attributes it has equals the number the query asks for.
+
+# Working memory for one chunk of a batch: each query row costs a float32
+# product and a bool result per flag, so large catalogs get smaller chunks
+CHUNK_BYTES = 64 * 1024 * 1024
+CLOSEST_K = 24
+
+
+def top_k(scores, k):
+    # (position, score) of the k best positive scores, best first and ties
+    # in catalog order; argpartition avoids sorting the whole array
+    k = min(k, len(scores))
+    if not k:
+        return []
+    top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    top = top[scores[top] > 0]
+    order = np.lexsort((top, -scores[top]))
+    return list(zip(top[order].tolist(), scores[top][order].tolist()))
+
+
+def _mask_column(mask, size):
+    data = np.frombuffer(mask.to_bytes((size + 7) // 8, "little"), dtype=np.uint8)
+    return np.unpackbits(data, bitorder="little")[:size].astype(bool)
+
+
+def _column_mask(column):
+    # Boolean array over the flags -> index bitmask
+    return int.from_bytes(np.packbits(column, bitorder="little").tobytes(), "little")
+
+
+class AttributeMatrix:
+    def __init__(self, flags, attributes, matrix):
+        self.flags = flags
+        self.attributes = attributes
+        self.columns = {attr: i for i, attr in enumerate(attributes)}
+        self.matrix = matrix
+        # float32 so the multiply goes through BLAS; counts stay exact
+        self._weights = matrix.T.astype(np.float32)
+        # Rare attributes (dragon, zigzag) say more about a flag than
+        # common ones (red, white), so overlap is weighted by idf
+        df = matrix.sum(axis=0)
+        self.idf = np.log((len(flags) + 1) / (df + 1)).astype(np.float32) + 1
+        self._flag_weights = {}
+
+    @classmethod
+    def from_index(cls, index):
+        attributes = [("colour", c) for c in index.colours] + [("pattern", p) for p in index.patterns]
+        matrix = np.zeros((index.size, len(attributes)), dtype=bool)
+        for col, (kind, name) in enumerate(attributes):
+            bits = index.colour_bits if kind == "colour" else index.pattern_bits
+            matrix[:, col] = _mask_column(bits[name], index.size)
+        return cls(index.flags, attributes, matrix)
+
+    def query_matrix(self, queries):
+        # queries: iterable of (colours, patterns). A query naming an
+        # attribute the catalog has never seen can't match anything, so it
+        # gets an impossible required count.
+        queries = list(queries)
+        q = np.zeros((len(queries), len(self.attributes)), dtype=np.float32)
+        required = np.zeros(len(queries), dtype=np.float32)
+        for row, (colours, patterns) in enumerate(queries):
+            terms = {("colour", c) for c in colours} | {("pattern", p) for p in patterns}
+            for term in terms:
+                col = self.columns.get(term)
+                if col is None:
+                    required[row] = np.inf
+                    break
+                q[row, col] = 1
+            else:
+                required[row] = len(terms)
+        return q, required
+
+    def batch_search(self, queries):
+        # Q x flags boolean result matrix for the whole batch
+        q, required = self.query_matrix(queries)
+        return (q @ self._weights) == required[:, None]
+
+    def query_chunk(self):
+        # Queries per chunk that keep the intermediate matrices in CHUNK_BYTES
+        return max(1, CHUNK_BYTES // (5 * max(1, len(self.flags))))
+
+    def batch_positions(self, queries, chunk=None):
+        # Matching flag positions per query, evaluated a chunk of queries at
+        # a time to bound the size of the intermediate matrix
+        queries = list(queries)
+        chunk = chunk or self.query_chunk()
+        positions = []
+        for start in range(0, len(queries), chunk):
+            hits = self.batch_search(queries[start:start + chunk])
+            positions.extend(np.flatnonzero(row) for row in hits)
+        return positions
+
+    def batch_results(self, queries, chunk=None):
+        flags = self.flags
+        return [[flags[i] for i in row.tolist()] for row in self.batch_positions(queries, chunk)]
+
+    def _flag_weight(self, kind):
+        # Total idf weight of each flag's attributes (of one kind, or all)
+        weight = self._flag_weights.get(kind)
+        if weight is None:
+            idf = self.idf.copy()
+            if kind is not None:
+                idf[[i for i, attr in enumerate(self.attributes) if attr[0] != kind]] = 0
+            weight = self._flag_weights[kind] = idf @ self._weights
+        return weight
+
+    def overlap(self, wanted, unwanted=(), kind=None):
+        # Score per flag: idf-weighted Jaccard overlap with the wanted
+        # attributes, minus the weight of unwanted ones the flag has. kind
+        # limits the comparison to colours or patterns.
+        rows = np.zeros((2, len(self.attributes)), dtype=np.float32)
+        for row, attrs in enumerate((wanted, unwanted)):
+            for attr in attrs:
+                col = self.columns.get(attr)
+                if col is not None and kind in (None, attr[0]):
+                    rows[row, col] = self.idf[col]
+        query_weight = rows[0].sum()
+        if not query_weight:
+            return np.zeros(len(self.flags), dtype=np.float32)
+        shared, penalty = rows @ self._weights
+        return (shared - penalty) / (query_weight + self._flag_weight(kind) - shared)
+
+    def closest(self, wanted, unwanted=(), k=CLOSEST_K):
+        # Top k (position, score) by overlap; only the k best are sorted
+        return top_k(self.overlap(wanted, unwanted), k)
+
+    def batch_counts(self, queries, chunk=None):
+        queries = list(queries)
+        chunk = chunk or self.query_chunk()
+        counts = []
+        for start in range(0, len(queries), chunk):
+            counts.extend(self.batch_search(queries[start:start + chunk]).sum(axis=1).tolist())
+        return counts
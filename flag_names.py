@@ -0,0 +1,284 @@
+import struct
+from bisect import bisect_left, insort
+from collections import Counter
+from collections.abc import Sequence
+
+from flag_terms import edit_distance, normalize
+
+# -------------------------
+# Country name lookup
+# -------------------------
+# Autocomplete over accent-folded country names: "aland" finds Åland
+# Islands, and every word of a name is a way in, so "isl" finds it too. Keys
+# live in one sorted list and a prefix lookup is a bisect plus a short walk,
+# so it costs the same for 250 names as for 250k. add()/remove() keep the
+# list sorted, so a catalog that grows doesn't need a rebuild. The same
+# index serves exact and misspelled names ("Columbia") to the term
+# resolver through trigram postings over the distinct names.
+#
+# A compiled catalog stores the sorted entries and the postings (see
+# to_bytes), so loading the index there reads nothing per flag: bisect runs
+# over the mapped arrays and decodes only the keys it lands on, and a typo
+# only decodes the names it has to compare. Without one, the postings are
+# built on the first typo.
+
+DEFAULT_LIMIT = 10
+
+HEADER = struct.Struct("<IIII")
+
+
+def name_keys(name, position):
+    # (key, position, word) entries: the whole folded name (word 0) plus
+    # the tail starting at each later word
+    words = normalize(name).split()
+    return [(" ".join(words[i:]), position, i) for i in range(len(words))]
+
+
+def _u32s(values):
+    return struct.pack(f"<{len(values)}I", *values)
+
+
+def _trigrams(term):
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _gram_code(gram):
+    # A trigram as one sortable integer, 21 bits per code point
+    return ord(gram[0]) << 42 | ord(gram[1]) << 21 | ord(gram[2])
+
+
+class _MappedNames(Sequence):
+    # Distinct folded names, sorted, over offsets[n + 1] and a utf-8 blob
+    def __init__(self, buf, offsets, blob):
+        self._buf = buf
+        self._offsets = offsets
+        self._blob = blob
+
+    def tail(self, i, start):
+        # Name i from byte start on
+        return self._buf[self._blob + self._offsets[i] + start:self._blob + self._offsets[i + 1]].decode("utf-8")
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if not 0 <= i < len(self):
+            raise IndexError("name index out of range")
+        return self.tail(i, 0)
+
+
+class _MappedEntries(Sequence):
+    # The sorted (key, position, word) entries; each key is stored as the
+    # name it is a tail of and the byte it starts at
+    def __init__(self, names, ids, starts, positions, words):
+        self._names = names
+        self._ids = ids
+        self._starts = starts
+        self._positions = positions
+        self._words = words
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self._names.tail(self._ids[i], self._starts[i]), self._positions[i], self._words[i]
+
+
+class _MappedPostings:
+    # gram -> name ids over sorted gram codes, offsets[n + 1] and ids
+    def __init__(self, grams, offsets, ids):
+        self._grams = grams
+        self._offsets = offsets
+        self._ids = ids
+
+    def get(self, gram, default=None):
+        code = _gram_code(gram)
+        grams = self._grams
+        i = bisect_left(grams, code)
+        if i == len(grams) or grams[i] != code:
+            return default
+        return self._ids[self._offsets[i]:self._offsets[i + 1]]
+
+
+class NameIndex:
+    def __init__(self, flags, entries=None, names=None, postings=None):
+        # entries, names (the distinct folded names) and postings (gram ->
+        # ids into names) come mapped from a compiled catalog, or are built
+        # from the flags
+        self.flags = flags
+        if entries is None:
+            entries = sorted(entry for i, flag in enumerate(flags) for entry in name_keys(flag["country"], i))
+        self.entries = entries
+        self._names = names
+        self._postings = postings
+        self._owned = False
+
+    @classmethod
+    def from_buffer(cls, buf, offset, flags):
+        # All arrays are views into buf (e.g. the mapped catalog)
+        n_names, n_entries, n_grams, n_postings = HEADER.unpack_from(buf, offset)
+        view = memoryview(buf)
+        offset += HEADER.size
+
+        def array(count, code="I", width=4):
+            nonlocal offset
+            values = view[offset:offset + width * count].cast(code)
+            offset += width * count
+            return values
+
+        grams = array(n_grams, "Q", 8)
+        name_offsets = array(n_names + 1)
+        ids, starts, positions, words = (array(n_entries) for _ in range(4))
+        postings = _MappedPostings(grams, array(n_grams + 1), array(n_postings))
+        names = _MappedNames(buf, name_offsets, offset)
+        return cls(flags, _MappedEntries(names, ids, starts, positions, words), names, postings)
+
+    def to_bytes(self):
+        # Header, sorted gram codes as uint64, then as uint32 arrays: name
+        # offsets, the name id, tail start byte, position and word of each
+        # entry, and the postings' offsets and name ids; then the utf-8
+        # names
+        self._build_postings()
+        names = self._names
+        ids = {name: i for i, name in enumerate(names)}
+        grams = sorted(self._postings, key=_gram_code)
+        gram_offsets, posted = [0], []
+        for gram in grams:
+            posted.extend(self._postings[gram])
+            gram_offsets.append(len(posted))
+        whole = {position: key for key, position, word in self.entries if not word}
+        encoded = [name.encode("utf-8") for name in names]
+        offsets = [0]
+        for data in encoded:
+            offsets.append(offsets[-1] + len(data))
+        columns = ([], [], [], [])
+        for key, position, word in self.entries:
+            name = whole[position]
+            for column, value in zip(columns, (ids[name], len(name.encode("utf-8")) - len(key.encode("utf-8")), position, word)):
+                column.append(value)
+        return b"".join(
+            [HEADER.pack(len(names), len(self.entries), len(grams), len(posted)),
+             struct.pack(f"<{len(grams)}Q", *map(_gram_code, grams)), _u32s(offsets)]
+            + [_u32s(c) for c in columns] + [_u32s(gram_offsets), _u32s(posted)] + encoded
+        )
+
+    def _writable(self):
+        # add()/remove() work on copies, so the catalog's flags and the
+        # mapped entries are never changed; postings are rebuilt in memory
+        # on the next typo
+        if not self._owned:
+            self.flags = list(self.flags)
+            self.entries = list(self.entries)
+            self._names = None
+            self._postings = None
+            self._owned = True
+
+    def add(self, flag):
+        self._writable()
+        position = len(self.flags)
+        self.flags.append(flag)
+        for entry in name_keys(flag["country"], position):
+            insort(self.entries, entry)
+        name = normalize(flag["country"])
+        if self._postings is not None and self.positions(name) == [position]:
+            self._post(name)
+        return position
+
+    def remove(self, position):
+        # The position stays reserved so the others don't shift
+        self._writable()
+        for entry in name_keys(self.flags[position]["country"], position):
+            i = bisect_left(self.entries, entry)
+            if i < len(self.entries) and self.entries[i] == entry:
+                del self.entries[i]
+        self.flags[position] = None
+
+    def complete(self, prefix, limit=DEFAULT_LIMIT):
+        # Up to limit flags whose name, or a word in it, starts with prefix.
+        # Names that start with it come first, then word matches.
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        starts, words = [], []
+        seen = set()
+        entries = self.entries
+        i = bisect_left(entries, (prefix,))
+        # Only a bounded window is walked, so a one-letter prefix costs no
+        # more than a full name
+        while i < len(entries) and len(starts) < limit and len(seen) < 4 * limit:
+            key, position, word = entries[i]
+            if not key.startswith(prefix):
+                break
+            i += 1
+            if position in seen:
+                continue
+            seen.add(position)
+            (words if word else starts).append(self.flags[position])
+        return (starts + words)[:limit]
+
+    def positions(self, name):
+        # Positions of the flags whose whole folded name is name
+        found = []
+        entries = self.entries
+        i = bisect_left(entries, (name,))
+        while i < len(entries) and entries[i][0] == name:
+            if not entries[i][2]:
+                found.append(entries[i][1])
+            i += 1
+        return found
+
+    def _post(self, name):
+        name_id = len(self._names)
+        self._names.append(name)
+        postings = self._postings
+        for gram in _trigrams(name):
+            postings.setdefault(gram, []).append(name_id)
+
+    def _build_postings(self):
+        self._names = []
+        self._postings = {}
+        for name in sorted({key for key, _, word in self.entries if not word}):
+            self._post(name)
+
+    def fuzzy(self, term, limit):
+        # (distance, name) for every folded name within limit edits of term.
+        # Such a name shares all but at most 3 * limit of its trigrams, so
+        # it must appear in at least one of the 3 * limit + 1 rarest ones.
+        # Those candidates are then looked up in the other postings (sorted
+        # by name id) and dropped once they have missed more than that, so
+        # only a handful reach the edit distance.
+        if self._postings is None:
+            self._build_postings()
+        grams = _trigrams(term)
+        allowed = 3 * limit
+        if len(grams) <= allowed:
+            return []
+        lists = sorted((self._postings.get(g, ()) for g in grams), key=len)
+        hits = Counter()
+        for postings in lists[:allowed + 1]:
+            hits.update(postings)
+        misses = {name_id: allowed + 1 - n for name_id, n in hits.items()}
+        for postings in lists[allowed + 1:]:
+            if not misses:
+                break
+            for name_id, missed in list(misses.items()):
+                i = bisect_left(postings, name_id)
+                if i == len(postings) or postings[i] != name_id:
+                    if missed == allowed:
+                        del misses[name_id]
+                    else:
+                        misses[name_id] = missed + 1
+        found = []
+        names = self._names
+        for name_id in misses:
+            name = names[name_id]
+            d = edit_distance(term, name, limit)
+            # Names of removed flags stay posted, so they are checked here
+            if d <= limit and self.positions(name):
+                found.append((d, name))
+        return found
@@ -0,0 +1,104 @@
+import numpy as np
+from PIL import Image
+
+from flag_colour import Palette, load_rgb, srgb_to_lab
+from flag_features import SIZE as FEATURE_SIZE, image_vector
+from flag_matrix import top_k
+
+# -------------------------
+# Query by image
+# -------------------------
+# "What flag is this?" for an uploaded picture. The photo is decoded
+# straight down to PHOTO_SIZE (JPEGs at 1/8 scale), k-means in Lab finds
+# its dominant colours, and those are named with the catalog's colour
+# words. Flags are then ranked by how well their tagged colours overlap
+# the named ones and, once flag_features.py has run, by how close their
+# artwork's feature vector is to the photo's.
+
+PHOTO_SIZE = (96, 64)
+CLUSTERS = 5
+ITERATIONS = 8
+# A colour has to cover this much of the picture to count
+MIN_SHARE = 0.08
+# Colours along the edges that barely reach the middle are background
+EDGE = 0.15
+# Pixels more transparent than this are background too
+MIN_ALPHA = 128
+BACKGROUND_CENTRE_SHARE = 0.05
+# Artwork similarity against colour overlap when both are available
+FEATURE_WEIGHT = 0.85
+PHOTO_K = 24
+
+PALETTE = Palette()
+
+
+def dominant_colours(lab, clusters=CLUSTERS, iterations=ITERATIONS, seed=0):
+    # k-means over (n, 3) Lab pixels: (centres, cluster of each pixel).
+    # Seeded k-means++ so the same photo always gives the same answer.
+    rng = np.random.default_rng(seed)
+    centres = [lab[rng.integers(len(lab))]]
+    for _ in range(1, clusters):
+        d = ((lab[:, None, :] - np.array(centres)[None]) ** 2).sum(axis=2).min(axis=1)
+        if not d.any():
+            break
+        centres.append(lab[rng.choice(len(lab), p=d / d.sum())])
+    centres = np.array(centres)
+    for _ in range(iterations):
+        labels = ((lab[:, None, :] - centres[None]) ** 2).sum(axis=2).argmin(axis=1)
+        counts = np.bincount(labels, minlength=len(centres))
+        sums = np.zeros_like(centres)
+        np.add.at(sums, labels, lab)
+        moved = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centres)
+        if np.allclose(moved, centres, atol=0.5):
+            break
+        centres = moved
+    return centres, labels
+
+
+def photo_colours(rgb, opaque=None):
+    # ([(colour name, share of the flag)] largest first, (top, bottom,
+    # left, right) box around what isn't background). Only opaque pixels
+    # (all of them by default) are counted; with nothing to count, such as
+    # a transparent or tiny picture, there are no colours.
+    h, w = rgb.shape[:2]
+    if opaque is None:
+        opaque = np.ones((h, w), dtype=bool)
+    if not opaque.any():
+        return [], (0, h, 0, w)
+    centres, labels = dominant_colours(srgb_to_lab(rgb)[opaque])
+    # Transparent pixels get an extra label that is never kept
+    grid = np.full((h, w), len(centres))
+    grid[opaque] = labels
+    labels = grid
+    dy, dx = max(1, int(h * EDGE)), max(1, int(w * EDGE))
+    centre = np.bincount(labels[dy:-dy, dx:-dx].ravel(), minlength=len(centres) + 1)[:-1]
+    counts = np.bincount(labels.ravel(), minlength=len(centres) + 1)[:-1]
+    if not centre.sum():
+        return [], (0, h, 0, w)
+    keep = np.append(centre / centre.sum() >= BACKGROUND_CENTRE_SHARE, False)
+    shares = np.where(keep[:-1], counts, 0) / max(counts[keep[:-1]].sum(), 1)
+    totals = {}
+    for name, share in zip(PALETTE.nearest(centres), shares):
+        totals[PALETTE.names[name]] = totals.get(PALETTE.names[name], 0) + float(share)
+    colours = sorted(((n, s) for n, s in totals.items() if s >= MIN_SHARE), key=lambda item: -item[1])
+    rows, cols = np.nonzero(keep[labels])
+    if not len(rows):
+        return colours, (0, h, 0, w)
+    return colours, (rows.min(), rows.max() + 1, cols.min(), cols.max() + 1)
+
+
+def match_photo(catalog, source, k=PHOTO_K):
+    # (best matching flags, [(colour, share)]) for an image path or file;
+    # no flags when no colours could be read from it
+    rgb, alpha = load_rgb(source, PHOTO_SIZE, with_alpha=True)
+    colours, (top, bottom, left, right) = photo_colours(rgb, alpha >= MIN_ALPHA)
+    if not colours:
+        return [], colours
+    scores = catalog.matrix().overlap({("colour", name) for name, _ in colours}, kind="colour")
+    features = catalog.features()
+    if features is not None:
+        # Artwork is compared without the background around it
+        flag = Image.fromarray(np.ascontiguousarray(rgb[top:bottom, left:right]))
+        small = np.asarray(flag.resize(FEATURE_SIZE, Image.BOX))
+        scores = (1 - FEATURE_WEIGHT) * scores + FEATURE_WEIGHT * features.scores(image_vector(small))
+    return [catalog.flags[pos] for pos, _ in top_k(scores, k)], colours
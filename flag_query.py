@@ -0,0 +1,487 @@
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from flag_terms import KINDS as TERM_KINDS, TermResolver
+
+# -------------------------
+# Query language
+# -------------------------
+# Boolean queries over colours and patterns, for example
+#
+#   red & (star | crescent) & !green
+#   colours == {red, white}            only red and white, nothing else
+#   colours <= {red, white, blue}      no colours outside these
+#   patterns >= {star, cross}          at least these patterns
+#   blue >= 30%                        blue covers at least 30% of the flag
+#   mostly red                         red covers more than any other colour
+#   #ce1126                            the named colour nearest to a hex code
+#   exact:#ce1126                      artwork with (almost) exactly that colour
+#   rgb(206, 17, 38)                   colour codes can be rgb() as well as hex
+#
+# "and"/"or"/"not" work as well as &, | and !, a comma outside braces means
+# AND, and a term can be qualified (colour:red, pattern:star,
+# country:"costa rica"). Terms go through flag_terms, so synonyms, typos
+# and country names work too. Colour shares (>=, <=, > and < a percentage)
+# "mostly" and exact: are measured from the artwork by flag_tagging.py
+# rather than taken from the colour tags. Queries are
+# parsed into a canonical tree (flattened, deduplicated, sorted), and each
+# distinct canonical query is compiled once into a plan of closures over
+# the index's bitsets.
+
+
+class QueryError(ValueError):
+    pass
+
+
+_WORD = r"[^\W\d_]\w*"
+_HEX = r"#(?:[0-9a-fA-F]{6}|[0-9a-fA-F]{3})\b"
+_RGB = r"rgb\(\s*\d{1,3}(?:\s*,\s*|\s+)\d{1,3}(?:\s*,\s*|\s+)\d{1,3}\s*\)"
+_CODE = rf"(?:{_HEX}|{_RGB})"
+_TOKEN = re.compile(
+    rf'\s*(?:(==|<=|>=|[<>&|!(),{{}}])|((?:{_WORD}:)?"[^"]*")|((?:{_WORD}:)?{_CODE}|{_WORD}(?::{_WORD})?)'
+    rf'|(\d+(?:\.\d+)?\s*%?))',
+    re.IGNORECASE,
+)
+KEYWORDS = {"and": "&", "or": "|", "not": "!", "mostly": "mostly"}
+KINDS = {"colour": "colour", "color": "colour", "pattern": "pattern", "country": "country"}
+SET_FIELDS = {"colours": "colour", "colors": "colour", "patterns": "pattern"}
+SET_OPS = ("==", "<=", ">=")
+SHARE_OPS = (">=", "<=", ">", "<")
+
+
+def tokenize(text):
+    tokens = []
+    text = text.strip()
+    pos = 0
+    while pos < len(text):
+        m = _TOKEN.match(text, pos)
+        if not m:
+            raise QueryError(f"unexpected {text[pos:].split()[0][:1]!r} at position {pos + 1}")
+        op, quoted, word, number = m.groups()
+        if number:
+            word = number.replace(" ", "")
+        elif quoted:
+            # Kept with its quotes so it can't be mistaken for an operator
+            word = " ".join(quoted.lower().split())
+        elif word:
+            word = word.lower()
+            if "rgb(" in word:
+                # One spelling per code: rgb(206,17,38)
+                word = re.sub(r"\s+", ",", re.sub(r"\s*([(),])\s*", r"\1", word))
+            op = KEYWORDS.get(word)
+        tokens.append(op or word)
+        pos = m.end()
+    return tokens
+
+
+# -------------------------
+# Canonical query trees
+# -------------------------
+# ("term", name)                 colour or pattern, resolved against the index
+# ("attr", kind, name)           qualified term
+# ("only", kind, names)          no attribute of kind outside names
+# ("share", name, op, percent)   colour area compared with a percentage
+# ("mostly", name)               colour with the largest area
+# ("exact", code)                artwork colour within a few Lab units of code
+# ("not", node), ("and", nodes), ("or", nodes)
+def _is_term(token):
+    return token[0].isalpha() or token[0] == "#" or token.endswith('"')
+
+
+def _quote(name):
+    if (re.fullmatch(_WORD, name) and name not in KEYWORDS) or re.fullmatch(_CODE, name):
+        return name
+    return f'"{name}"'
+
+
+def format_query(node):
+    op = node[0]
+    if op == "term":
+        return _quote(node[1])
+    if op == "attr":
+        return f"{node[1]}:{_quote(node[2])}"
+    if op == "only":
+        return f"{node[1]}s <= {{{', '.join(_quote(name) for name in node[2])}}}"
+    if op == "share":
+        return f"{_quote(node[1])} {node[2]} {node[3]:g}%"
+    if op == "mostly":
+        return f"mostly {_quote(node[1])}"
+    if op == "exact":
+        return f"exact:{node[1]}"
+    if op == "not":
+        return "!" + format_query(node[1])
+    return "(" + f" {'&' if op == 'and' else '|'} ".join(format_query(c) for c in node[1]) + ")"
+
+
+def _not(node):
+    return node[1] if node[0] == "not" else ("not", node)
+
+
+def _join(op, nodes):
+    flat = {}
+    for node in nodes:
+        for child in (node[1] if node[0] == op else (node,)):
+            flat[format_query(child)] = child
+    if len(flat) == 1:
+        return next(iter(flat.values()))
+    return (op, tuple(flat[key] for key in sorted(flat)))
+
+
+def _split_term(token):
+    # 'kind:name', 'name', 'kind:"some name"' or '"some name"'
+    if token.endswith('"'):
+        kind, _, name = token[:-1].partition('"')
+        kind = kind[:-1]
+    else:
+        kind, _, name = token.rpartition(":")
+    if not name:
+        raise QueryError("empty quoted term")
+    return kind, name
+
+
+class _Parser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        if token is None:
+            raise QueryError("query ends unexpectedly")
+        self.pos += 1
+        return token
+
+    def expect(self, token):
+        found = self.take()
+        if found != token:
+            raise QueryError(f"expected {token!r} but found {found!r}")
+
+    def parse(self):
+        if self.peek() is None:
+            raise QueryError("empty query")
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise QueryError(f"unexpected {self.peek()!r}")
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.peek() == "|":
+            self.take()
+            nodes.append(self.parse_and())
+        return _join("or", nodes)
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while self.peek() in ("&", ","):
+            self.take()
+            nodes.append(self.parse_not())
+        return _join("and", nodes)
+
+    def parse_not(self):
+        if self.peek() == "!":
+            self.take()
+            return _not(self.parse_not())
+        return self.parse_atom()
+
+    def parse_atom(self):
+        token = self.take()
+        if token == "(":
+            node = self.parse_or()
+            self.expect(")")
+            return node
+        if token == "mostly":
+            return ("mostly", self.parse_colour(self.take()))
+        if not _is_term(token):
+            raise QueryError(f"unexpected {token!r}")
+        if token in SET_FIELDS and self.peek() in SET_OPS:
+            return self.parse_set(SET_FIELDS[token])
+        if self.peek() in SHARE_OPS:
+            return self.parse_share(self.parse_colour(token))
+        kind, name = _split_term(token)
+        if not kind:
+            return ("term", name)
+        if kind == "exact":
+            if not re.fullmatch(_CODE, name):
+                raise QueryError(f"exact: takes a colour code such as #ce1126 or rgb(206, 17, 38), not {name!r}")
+            return ("exact", name)
+        if kind not in KINDS:
+            raise QueryError(f"unknown qualifier {kind!r} (use colour:, pattern:, country: or exact:)")
+        return ("attr", KINDS[kind], name)
+
+    def parse_colour(self, token):
+        # Name of a colour for a share or "mostly"; only colours have area
+        if not _is_term(token):
+            raise QueryError(f"expected a colour name but found {token!r}")
+        kind, name = _split_term(token)
+        if kind and KINDS.get(kind) != "colour":
+            raise QueryError(f"only colours cover a share of the flag, not {token!r}")
+        return name
+
+    def parse_share(self, name):
+        op = self.take()
+        value = self.take()
+        if not value[0].isdigit():
+            raise QueryError(f"expected a percentage after {op!r} but found {value!r}")
+        percent = float(value.rstrip("%"))
+        if percent > 100:
+            raise QueryError(f"{value!r} is more than 100%")
+        return ("share", name, op, percent)
+
+    def parse_set(self, kind):
+        op = self.take()
+        self.expect("{")
+        names = []
+        while True:
+            token = self.take()
+            if not _is_term(token):
+                raise QueryError(f"expected a {kind} name but found {token!r}")
+            qualifier, name = _split_term(token)
+            if qualifier:
+                raise QueryError(f"expected a {kind} name but found {token!r}")
+            names.append(name)
+            sep = self.take()
+            if sep == "}":
+                break
+            if sep != ",":
+                raise QueryError(f"expected ',' or '}}' but found {sep!r}")
+        names = tuple(sorted(set(names)))
+        required = [("attr", kind, name) for name in names]
+        if op == ">=":
+            return _join("and", required)
+        only = ("only", kind, names)
+        return only if op == "<=" else _join("and", required + [only])
+
+
+@lru_cache(maxsize=1024)
+def parse_query(text):
+    return _Parser(tokenize(text)).parse()
+
+
+def canonical_query(text):
+    return format_query(parse_query(text))
+
+
+# Colour share choices in the search forms
+SHARE_MODES = {"at least": ">=", "at most": "<=", "mostly": None}
+
+
+def share_query(colour, mode, percent=0):
+    # Query text for a colour share picked in a form, "" when none is
+    if not colour or mode not in SHARE_MODES:
+        return ""
+    if mode == "mostly":
+        return f"mostly {_quote(colour)}"
+    try:
+        percent = float(percent)
+    except (TypeError, ValueError):
+        raise QueryError(f"{percent!r} is not a percentage") from None
+    return f"{_quote(colour)} {SHARE_MODES[mode]} {percent:g}%"
+
+
+def and_queries(*texts):
+    # Query texts ANDed together, blanks left out
+    texts = [text for text in texts if text and text.strip()]
+    if len(texts) <= 1:
+        return texts[0] if texts else ""
+    return " & ".join(f"({text})" for text in texts)
+
+
+_LIST_ITEM = re.compile(r"(?:[^,(]|\([^)]*\)?)+")
+
+
+def split_list(text):
+    # Terms of a comma-separated colours/patterns field, lower case; commas
+    # inside parentheses, as in rgb(206, 17, 38), don't split
+    return [item.strip().lower() for item in _LIST_ITEM.findall(text or "") if item.strip()]
+
+
+def query_terms(node, negated=False):
+    # (term, kinds, negated) for every term leaf; set constraints are left
+    # out, they say what a flag may have rather than what it should
+    op = node[0]
+    if op == "term":
+        return [(node[1], TERM_KINDS, negated)]
+    if op == "attr":
+        return [(node[2], (node[1],), negated)]
+    if op == "only":
+        return []
+    if op == "share":
+        # "red <= 10%" doesn't ask for red
+        return [(node[1], ("colour",), negated)] if node[2] in (">=", ">") and node[3] else []
+    if op in ("mostly", "exact"):
+        return [(node[1], ("colour",), negated)]
+    if op == "not":
+        return query_terms(node[1], not negated)
+    return [leaf for child in node[1] for leaf in query_terms(child, negated)]
+
+
+# -------------------------
+# Plans
+# -------------------------
+class QueryPlanner:
+    def __init__(self, index, max_plans=256, resolver=None, shares=None):
+        self.index = index
+        self.resolver = resolver or TermResolver(index)
+        # Callable returning the measured ColourShares (or None); only
+        # called once a query compares colour shares
+        self.shares = shares
+        self.max_plans = max_plans
+        # Shared by every session (and Streamlit's script threads), so the
+        # LRU order is only touched under the lock
+        self.plans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _bits(self, kind):
+        return self.index.colour_bits if kind == "colour" else self.index.pattern_bits
+
+    def _term(self, term, kinds, notes):
+        # Typos, synonyms and country names all go through the resolver;
+        # every resolution is kept so the UI can say what was searched
+        res = self.resolver.resolve(term, kinds)
+        notes.append(res)
+        if not res.matches:
+            raise QueryError(f"no {' or '.join(kinds)} matches {term!r}")
+        mask = 0
+        for kind, name in res.matches:
+            mask |= self.resolver.mask(kind, name)
+        return mask
+
+    def _compile(self, node, notes):
+        # Returns (constant mask, None) for leaves and (None, closure) for
+        # everything that has to combine masks at run time
+        op = node[0]
+        all_mask = self.index.all_mask
+        if op == "term":
+            return self._term(node[1], TERM_KINDS, notes), None
+        if op == "attr":
+            return self._term(node[2], (node[1],), notes), None
+        if op == "only":
+            kind = node[1]
+            names = set()
+            for term in node[2]:
+                self._term(term, (kind,), notes)
+                names.update(name for _, name in notes[-1].matches)
+            others = 0
+            for name, mask in self._bits(kind).items():
+                if name not in names:
+                    others |= mask
+            return all_mask & ~others, None
+        if op in ("share", "mostly", "exact"):
+            if op != "exact":
+                self._term(node[1], ("colour",), notes)
+                names = [name for _, name in notes[-1].matches]
+            shares = self.shares() if self.shares else None
+            if shares is None:
+                raise QueryError("colour shares haven't been measured yet (run flag_tagging.py)")
+            if op == "exact":
+                return shares.exact(node[1]), None
+            if op == "mostly":
+                return shares.mostly(names), None
+            return shares.compare(names, node[2], node[3]), None
+        if op == "not":
+            mask, fn = self._compile(node[1], notes)
+            if fn is None:
+                return all_mask & ~mask, None
+            return None, lambda: all_mask & ~fn()
+
+        parts = [self._compile(child, notes) for child in node[1]]
+        consts = [mask for mask, fn in parts if fn is None]
+        fns = [fn for mask, fn in parts if fn is not None]
+        if op == "and":
+            const = all_mask
+            for mask in consts:
+                const &= mask
+            if not fns or not const:
+                return const, None
+
+            def run_and():
+                mask = const
+                for fn in fns:
+                    mask &= fn()
+                    if not mask:
+                        return 0
+                return mask
+            return None, run_and
+
+        const = 0
+        for mask in consts:
+            const |= mask
+        if not fns or const == all_mask:
+            return const, None
+
+        def run_or():
+            mask = const
+            for fn in fns:
+                mask |= fn()
+            return mask
+        return None, run_or
+
+    def plan(self, text):
+        # (plan, resolutions) for the query
+        key = canonical_query(text)
+        with self._lock:
+            entry = self.plans.get(key)
+            if entry is not None:
+                self.plans.move_to_end(key)
+                return entry
+        # Compiled outside the lock; two threads racing on the same query
+        # just build it twice
+        notes = []
+        mask, fn = self._compile(parse_query(text), notes)
+        entry = (fn or (lambda: mask), notes)
+        with self._lock:
+            self.plans[key] = entry
+            self.plans.move_to_end(key)
+            if len(self.plans) > self.max_plans:
+                self.plans.popitem(last=False)
+        return entry
+
+    def mask(self, text):
+        return self.plan(text)[0]()
+
+    def resolve_search(self, text, colours=(), patterns=()):
+        # Query text ANDed with the plain comma-separated colour/pattern
+        # fields the frontends already have; returns (mask, resolutions).
+        # A field term that matches nothing just makes the result empty.
+        notes = []
+        mask = self.index.all_mask
+        for kind, terms in (("colour", colours), ("pattern", patterns)):
+            for term in terms:
+                res = self.resolver.resolve(term, (kind,))
+                notes.append(res)
+                term_mask = 0
+                for match_kind, name in res.matches:
+                    term_mask |= self.resolver.mask(match_kind, name)
+                mask &= term_mask
+        if text.strip():
+            plan, query_notes = self.plan(text)
+            notes.extend(query_notes)
+            if mask:
+                mask &= plan()
+        return mask, notes
+
+    def attributes(self, text, colours=(), patterns=()):
+        # (wanted, unwanted) sets of ("colour"|"pattern", name) the search
+        # mentions, for ranking flags by overlap; terms that don't resolve,
+        # and country names, are skipped
+        terms = [(t, ("colour",), False) for t in colours] + [(t, ("pattern",), False) for t in patterns]
+        if text.strip():
+            terms += query_terms(parse_query(text))
+        wanted, unwanted = set(), set()
+        for term, kinds, negated in terms:
+            for match in self.resolver.resolve(term, kinds).matches:
+                if match[0] != "country":
+                    (unwanted if negated else wanted).add(match)
+        return wanted - unwanted, unwanted
+
+    def search_mask(self, text, colours=(), patterns=()):
+        return self.resolve_search(text, colours, patterns)[0]
+
+    def search(self, text, colours=(), patterns=()):
+        return self.index.flags_for_mask(self.search_mask(text, colours, patterns))
@@ -0,0 +1,171 @@
+import threading
+from array import array
+from collections import OrderedDict
+from collections.abc import Sequence
+
+from flag_index import _positions_to_mask, mask_positions
+from flag_matrix import CLOSEST_K
+from flag_query import QueryPlanner, canonical_query
+from flag_terms import Resolution, TermResolver, describe_resolutions
+from flag_text import tokenize
+
+# -------------------------
+# Search result cache
+# -------------------------
+# Every frontend answers searches through one SearchCache. Queries are
+# normalized (case, whitespace, order, duplicates) into a canonical key, so
+# "Red, white" and "white,red ,RED" share an entry, and the LRU holds each
+# search's bitmask and result positions (4 bytes a flag, however large the
+# catalog). Real traffic repeats a few popular searches over and over, so
+# most of them never reach the index. Results are a read-only sequence
+# over those positions; only the flags actually read (a page, a batch) are
+# looked up. A search with fun fact words keeps only the flags whose fact
+# matches them, best BM25 match first; fun fact text with no words worth
+# searching for (only stopwords or single letters) matches nothing.
+
+DEFAULT_MAX_ENTRIES = 1024
+
+
+def _terms(values):
+    terms = {" ".join(v.split()).lower() for v in values}
+    terms.discard("")
+    return tuple(sorted(terms))
+
+
+def canonical_key(colours=(), patterns=(), query="", text=""):
+    query = canonical_query(query) if query and query.strip() else ""
+    # Word order and repeats don't change a BM25 ranking. Text with
+    # nothing to search for is kept as typed, to report it.
+    words = " ".join(sorted(set(tokenize(text)))) if text else ""
+    ignored = "" if words or not text else " ".join(text.split())
+    return _terms(colours), _terms(patterns), query, words, ignored
+
+
+class _Results(Sequence):
+    # A search's flags by cached position; slicing builds just that page
+    __slots__ = ("_flags", "_positions")
+
+    def __init__(self, flags, positions):
+        self._flags = flags
+        self._positions = positions
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            flags = self._flags
+            return [flags[pos] for pos in self._positions[i]]
+        return self._flags[self._positions[i]]
+
+    def __iter__(self):
+        flags = self._flags
+        for pos in self._positions:
+            yield flags[pos]
+
+
+class SearchCache:
+    def __init__(self, catalog, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Streamlit runs sessions on separate threads
+        self._lock = threading.Lock()
+        self._use(catalog)
+
+    def _use(self, catalog):
+        self.catalog = catalog
+        self.version = catalog.version
+        # Country names resolve through the catalog's autocomplete index
+        resolver = TermResolver(catalog.index, catalog.names)
+        self.queries = QueryPlanner(catalog.index, resolver=resolver, shares=catalog.shares)
+        self.entries.clear()
+
+    def attach(self, catalog):
+        # Point the cache at a (possibly reloaded) catalog; results computed
+        # against another version of the catalog are dropped
+        with self._lock:
+            if catalog.version != self.version:
+                self.invalidations += 1
+                self._use(catalog)
+            else:
+                self.catalog = catalog
+
+    def _entry(self, colours, patterns, query, text=""):
+        # [index, mask, positions, resolutions]; positions are only listed
+        # once something asks for the flags rather than just the counts
+        key = canonical_key(colours, patterns, query, text)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return entry
+            self.misses += 1
+            queries = self.queries
+            catalog = self.catalog
+
+        colours, patterns, query, words, ignored = key
+        index = queries.index
+        mask, resolutions = queries.resolve_search(query, colours, patterns)
+        entry = [index, mask, None, resolutions]
+        if ignored:
+            # Reported as unmatched rather than dropped, which would show
+            # every flag
+            entry[1] = 0
+            resolutions.append(Resolution(ignored, None, (), None))
+        elif words:
+            hits = catalog.text().search(text, None, None if mask == index.all_mask else mask)
+            positions = array("I", [pos for pos, _ in hits])
+            entry[1] = _positions_to_mask(positions, index.size)
+            entry[2] = positions
+        with self._lock:
+            if queries is self.queries:
+                self.entries[key] = entry
+                if len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                    self.evictions += 1
+        return entry
+
+    def search(self, colours=(), patterns=(), query="", text=""):
+        entry = self._entry(colours, patterns, query, text)
+        index, mask = entry[0], entry[1]
+        if entry[2] is None:
+            entry[2] = range(index.size) if mask == index.all_mask else array("I", mask_positions(mask))
+        return _Results(index.flags, entry[2])
+
+    def count(self, colours=(), patterns=(), query="", text=""):
+        return self._entry(colours, patterns, query, text)[1].bit_count()
+
+    def facets(self, colours=(), patterns=(), query="", text=""):
+        index, mask, _, _ = self._entry(colours, patterns, query, text)
+        return index.facets(mask)
+
+    def resolved(self, colours=(), patterns=(), query="", text=""):
+        # What typos, synonyms and country names in the search were taken
+        # to mean, as a line of text for the UI ("" when nothing was)
+        return describe_resolutions(self.queries.resolver, self._entry(colours, patterns, query, text)[3])
+
+    def closest(self, colours=(), patterns=(), query="", k=CLOSEST_K):
+        # Best partial matches for a search that matched nothing exactly
+        with self._lock:
+            queries, catalog = self.queries, self.catalog
+        wanted, unwanted = queries.attributes(query, colours, patterns)
+        flags = queries.index.flags
+        return [flags[pos] for pos, _ in catalog.matrix().closest(wanted, unwanted, k)]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "version": self.version,
+        }
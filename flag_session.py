@@ -0,0 +1,42 @@
+# -------------------------
+# Per-client search state
+# -------------------------
+# Each connected browser gets its own SearchSession holding its results and
+# infinite-scroll cursor. The catalog and index are shared by every session
+# and only ever read, so a session is just a few references and ints.
+
+LOAD_BATCH = 60
+SCROLL_MARGIN = 50
+
+
+class SearchSession:
+    __slots__ = ("results", "shown_count", "loading_more")
+
+    def __init__(self):
+        self.results = []
+        self.shown_count = 0
+        self.loading_more = False
+
+    def start(self, results):
+        self.results = results
+        self.shown_count = 0
+        self.loading_more = False
+
+    def has_more(self):
+        return self.shown_count < len(self.results)
+
+    def next_batch(self, size=LOAD_BATCH):
+        batch = self.results[self.shown_count:self.shown_count + size]
+        self.shown_count += len(batch)
+        self.loading_more = False
+        return batch
+
+    def wants_more(self, scroll_top, client_height, scroll_height):
+        # Called from the scroll handler: claim the next batch if the client
+        # is near the bottom and no batch is already being added
+        if self.loading_more or not self.has_more():
+            return False
+        if scroll_top + client_height < scroll_height - SCROLL_MARGIN:
+            return False
+        self.loading_more = True
+        return True
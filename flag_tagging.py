@@ -0,0 +1,380 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from flag_catalog import DEFAULT_SOURCE, catalog_location, load_catalog
+from flag_colour import Palette, load_rgb, parse_colour_code, srgb_to_lab
+from flag_matrix import _column_mask
+
+# -------------------------
+# Colour tagging audit
+# -------------------------
+# Measures how much of each flag's artwork is each of the catalog's named
+# colours and reports where that disagrees with the hand-entered colours
+# in flags.json. Images are sampled (not averaged, which would invent
+# in-between colours along every edge) at ANALYSIS_SIZE on a process pool
+# and every pixel goes to its nearest named colour in Lab.
+#
+# Results are kept in <catalog>.tags.json: per image file its size, mtime
+# and sha1, and per sha1 the area fraction of each named colour as a
+# 0-255 byte plus the exact colours (0xRRGGBB) the artwork is drawn in. A
+# rerun only re-reads files whose size or mtime moved, and only
+# re-analyses content it has never seen. The same data, one row per flag,
+# answers colour share queries ("blue >= 30%", "mostly red") and exact
+# colour queries ("exact:#ce1126"). The share rows are also written out as
+# <catalog>.shares.npy, a column-major uint8 matrix (each named colour,
+# then the largest colour and whether the flag was measured) that apps
+# memory-map instead of rebuilding it from the JSON, with the exact colours
+# per flag in <catalog>.exact.npz; <catalog>.shares.json records the
+# catalog version both were made for.
+
+ANALYSIS_SIZE = (240, 160)
+# Least area fraction that counts as "the flag has this colour"; smaller
+# than a typical star or emblem, larger than anti-aliased edges
+MIN_FRACTION = 0.01
+# Exact colours kept per image: those covering at least EXACT_MIN_SHARE,
+# largest first, at most EXACT_COLOURS of them
+EXACT_MIN_SHARE = 0.005
+EXACT_COLOURS = 12
+# Lab distance within which an artwork colour counts as the same colour
+EXACT_DELTA_E = 8
+CACHE_VERSION = 2
+
+PALETTE = Palette()
+
+
+def tags_path(source):
+    return os.path.splitext(source)[0] + ".tags.json"
+
+
+def shares_path(source):
+    return os.path.splitext(source)[0] + ".shares.npy"
+
+
+def exact_path(source):
+    return os.path.splitext(source)[0] + ".exact.npz"
+
+
+def _shares_info_path(source):
+    return os.path.splitext(source)[0] + ".shares.json"
+
+
+def report_path(source):
+    return os.path.splitext(source)[0] + ".tag_report.json"
+
+
+def _unpack(packed):
+    # 0xRRGGBB ints -> uint8 (n, 3) array
+    return ((np.asarray(packed, dtype=np.uint32)[:, None] >> np.array([16, 8, 0], dtype=np.uint32)) & 255).astype(np.uint8)
+
+
+def colour_fractions(rgb):
+    # (area fraction of each PALETTE name as 0-255 bytes, exact colours as
+    # 0xRRGGBB). Flag artwork has few distinct colours, so each is named
+    # once and weighted by its pixels.
+    packed = rgb.reshape(-1, 3).astype(np.uint32) @ np.array([1 << 16, 1 << 8, 1], dtype=np.uint32)
+    colours, pixels = np.unique(packed, return_counts=True)
+    names = PALETTE.nearest(srgb_to_lab(_unpack(colours)))
+    counts = np.bincount(names, weights=pixels, minlength=len(PALETTE.names))
+    order = np.argsort(-pixels, kind="stable")[:EXACT_COLOURS]
+    exact = colours[order][pixels[order] >= EXACT_MIN_SHARE * pixels.sum()]
+    return np.rint(counts * 255 / counts.sum()).astype(np.uint8).tolist(), exact.tolist()
+
+
+def _analyse(job):
+    digest, path = job
+    try:
+        return digest, colour_fractions(load_rgb(path, ANALYSIS_SIZE, Image.NEAREST))
+    except (OSError, ValueError):
+        return digest, None
+
+
+def _hash_file(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def load_tags(source):
+    # (files, fractions, exact colours) from the cache, empty when there is
+    # none or it was made with another palette
+    try:
+        with open(tags_path(source), "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        if cache["version"] == CACHE_VERSION and cache["palette"] == PALETTE.names:
+            return cache["files"], cache["fractions"], cache["exact"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return {}, {}, {}
+
+
+def tag_images(base_dir, source=DEFAULT_SOURCE, workers=None):
+    # {rel_path: fractions} for every readable image in the catalog, and
+    # how many images had to be hashed / analysed this time
+    catalog = load_catalog(base_dir, source)
+    files, fractions, exact = load_tags(catalog.source)
+    rel_paths = sorted({flag["file"] for flag in catalog.flags})
+
+    hashed = 0
+    digests = {}
+    for rel_path in rel_paths:
+        path = os.path.join(base_dir, rel_path)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entry = files.get(rel_path)
+        if not entry or entry[0] != stat.st_size or entry[1] != stat.st_mtime_ns:
+            entry = files[rel_path] = [stat.st_size, stat.st_mtime_ns, _hash_file(path)]
+            hashed += 1
+        digests[rel_path] = entry[2]
+
+    jobs = {}
+    for rel_path, digest in digests.items():
+        if digest not in fractions and digest not in jobs:
+            jobs[digest] = os.path.join(base_dir, rel_path)
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for digest, result in pool.map(_analyse, jobs.items(), chunksize=32):
+                if result is not None:
+                    fractions[digest], exact[digest] = result
+
+    # Only what the catalog still refers to is kept
+    files = {rel_path: files[rel_path] for rel_path in digests}
+    live = {entry[2] for entry in files.values()}
+    fractions = {digest: value for digest, value in fractions.items() if digest in live}
+    exact = {digest: value for digest, value in exact.items() if digest in fractions}
+    path = tags_path(catalog.source)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"version": CACHE_VERSION, "palette": PALETTE.names, "files": files,
+                   "fractions": fractions, "exact": exact}, f)
+    os.replace(path + ".tmp", path)
+    write_shares(catalog, files, fractions, exact)
+
+    results = {rel_path: fractions[d] for rel_path, d in digests.items() if d in fractions}
+    return catalog, results, hashed, len(jobs)
+
+
+# -------------------------
+# Colour shares
+# -------------------------
+class ExactColours:
+    def __init__(self, images, image_count, packed, image_rows):
+        # images: image row (below image_count) of every flag, -1 when it
+        # was never measured; packed / image_rows: one (0xRRGGBB, image
+        # row) pair per exact colour of every image. Each distinct colour
+        # is stored once, in Lab, with the run of image rows that use it.
+        packed = np.asarray(packed, dtype=np.uint32)
+        order = np.argsort(packed, kind="stable")
+        colours, starts = np.unique(packed[order], return_index=True)
+        self.lab = srgb_to_lab(_unpack(colours))
+        self.offsets = np.append(starts, len(order))
+        self.image_rows = np.asarray(image_rows, dtype=np.int64)[order]
+        self.images = images
+        self.image_count = image_count
+
+    def mask(self, rgb, delta_e=EXACT_DELTA_E):
+        # Bitmask of flags whose artwork has a colour within delta_e of rgb
+        lab = srgb_to_lab(np.array(rgb, dtype=np.uint8))
+        near = np.flatnonzero(((self.lab - lab) ** 2).sum(axis=1) <= delta_e ** 2)
+        # One spare slot at the end, which is where row -1 lands
+        has = np.zeros(self.image_count + 1, dtype=bool)
+        for i in near:
+            has[self.image_rows[self.offsets[i]:self.offsets[i + 1]]] = True
+        return _column_mask(has[self.images])
+
+
+class ColourShares:
+    def __init__(self, names, shares, measured, exact=None, dominant=None):
+        # shares: flags x names uint8 area fractions (0-255), kept column
+        # major so each colour is one contiguous run; flags whose artwork
+        # was never measured have measured False and never match. exact is
+        # the ExactColours of the same flags, or a function building them
+        # on first use, when known. dominant is each flag's largest colour,
+        # worked out from shares unless given.
+        self.names = names
+        self.columns = {name: i for i, name in enumerate(names)}
+        self.shares = np.asfortranarray(shares)
+        self.measured = measured
+        self.dominant = shares.argmax(axis=1).astype(np.uint8) if dominant is None else dominant
+        self._exact = exact
+
+    @property
+    def exact_colours(self):
+        if callable(self._exact):
+            self._exact = self._exact()
+        return self._exact
+
+    def _columns(self, names):
+        return [self.columns[name] for name in names if name in self.columns]
+
+    def compare(self, names, op, percent):
+        # Bitmask of flags where the names together cover op percent of
+        # the flag, e.g. (["blue"], ">=", 30)
+        cols = self._columns(names)
+        if len(cols) == 1:
+            total = self.shares[:, cols[0]]
+        else:
+            total = self.shares[:, cols].sum(axis=1, dtype=np.uint16)
+        # Shares are whole bytes, so the limit is rounded to the byte that
+        # gives the same answer and compared as an integer
+        limit = percent * 255 / 100
+        if op == ">=":
+            hits = total >= math.ceil(limit)
+        elif op == ">":
+            hits = total > math.floor(limit)
+        elif op == "<=":
+            hits = total <= math.floor(limit)
+        else:
+            hits = total < math.ceil(limit)
+        return _column_mask(hits & self.measured)
+
+    def mostly(self, names):
+        # Bitmask of flags whose largest colour is one of names
+        hits = np.zeros(len(self.dominant), dtype=bool)
+        for col in self._columns(names):
+            hits |= self.dominant == col
+        return _column_mask(hits & self.measured)
+
+    def exact(self, code, delta_e=EXACT_DELTA_E):
+        # Bitmask of flags drawn with (almost) exactly the colour code
+        rgb = parse_colour_code(code)
+        if rgb is None or self.exact_colours is None:
+            return 0
+        return self.exact_colours.mask(rgb, delta_e)
+
+
+def _share_rows(catalog, files, fractions):
+    # (flags x names shares, measured, image row of each flag, image
+    # count) from the tagging cache; the image rows follow fractions
+    rows = {digest: i for i, digest in enumerate(fractions)}
+    table = np.array(list(fractions.values()), dtype=np.uint8).reshape(-1, len(PALETTE.names))
+    positions = np.array([rows.get(files.get(flag["file"], (None,) * 3)[2], -1) for flag in catalog.flags], dtype=np.int64)
+    measured = positions >= 0
+    shares = np.where(measured[:, None], table[positions], 0).astype(np.uint8)
+    return shares, measured, positions, len(table)
+
+
+def _exact_pairs(fractions, exact):
+    # (0xRRGGBB colours, image row of each) for every exact colour
+    rows = {digest: i for i, digest in enumerate(fractions)}
+    pairs = [(colour, rows[digest]) for digest, colours in exact.items() if digest in rows for colour in colours]
+    packed, image_rows = zip(*pairs) if pairs else ((), ())
+    return np.array(packed, dtype=np.uint32), np.array(image_rows, dtype=np.int64)
+
+
+def write_shares(catalog, files, fractions, exact):
+    shares, measured, positions, image_count = _share_rows(catalog, files, fractions)
+    dominant = shares.argmax(axis=1) if len(shares) else np.zeros(0, dtype=np.uint8)
+    matrix = np.asfortranarray(np.column_stack([shares, dominant, measured]).astype(np.uint8))
+    path = shares_path(catalog.source)
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, matrix)
+    os.replace(path + ".tmp", path)
+    packed, image_rows = _exact_pairs(fractions, exact)
+    path = exact_path(catalog.source)
+    with open(path + ".tmp", "wb") as f:
+        np.savez(f, images=positions, image_count=image_count, packed=packed, image_rows=image_rows)
+    os.replace(path + ".tmp", path)
+    info_path = _shares_info_path(catalog.source)
+    with open(info_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"version": CACHE_VERSION, "palette": PALETTE.names, "catalog": catalog.version}, f)
+    os.replace(info_path + ".tmp", info_path)
+
+
+def _mapped_shares(catalog):
+    # The shares matrix written for this very catalog, memory-mapped, or None
+    try:
+        with open(_shares_info_path(catalog.source), "r", encoding="utf-8") as f:
+            info = json.load(f)
+        if (info["version"], info["palette"], info["catalog"]) != (CACHE_VERSION, PALETTE.names, catalog.version):
+            return None
+        matrix = np.load(shares_path(catalog.source), mmap_mode="r")
+    except (OSError, ValueError, KeyError):
+        return None
+    names = len(PALETTE.names)
+    if matrix.shape != (len(catalog.flags), names + 2) or not matrix.flags.f_contiguous:
+        return None
+    return matrix[:, :names], matrix[:, names], matrix[:, names + 1].view(bool)
+
+
+def _saved_exact(catalog):
+    try:
+        with np.load(exact_path(catalog.source)) as saved:
+            return ExactColours(saved["images"], int(saved["image_count"]), saved["packed"], saved["image_rows"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def load_shares(catalog):
+    # ColourShares for the catalog, or None when nothing has been measured.
+    # Exact colours are only loaded once somebody asks for one.
+    mapped = _mapped_shares(catalog)
+    if mapped is not None:
+        shares, dominant, measured = mapped
+        return ColourShares(PALETTE.names, shares, measured, lambda: _saved_exact(catalog), dominant)
+    # No matrix for this catalog (tagged before it changed, or by an older
+    # version): rebuilt from the JSON cache
+    files, fractions, exact = load_tags(catalog.source)
+    if not fractions:
+        return None
+    shares, measured, positions, image_count = _share_rows(catalog, files, fractions)
+    return ColourShares(PALETTE.names, shares, measured, ExactColours(positions, image_count, *_exact_pairs(fractions, exact)))
+
+
+def audit(catalog, results, min_fraction=MIN_FRACTION):
+    # One entry per flag whose measured colours disagree with its tags
+    entries = []
+    threshold = min_fraction * 255
+    for flag in catalog.flags:
+        values = results.get(flag["file"])
+        if values is None:
+            continue
+        measured = {name: value / 255 for name, value in zip(PALETTE.names, values) if value}
+        found = {name for name, value in zip(PALETTE.names, values) if value >= threshold}
+        tagged = {c for c in flag["colours"] if c in PALETTE.names}
+        if found != tagged:
+            entries.append({
+                "country": flag["country"],
+                "file": flag["file"],
+                "colours": list(flag["colours"]),
+                "missing": sorted(tagged - found),
+                "extra": sorted(found - tagged, key=lambda name: -measured[name]),
+                "measured": {name: round(share, 3) for name, share in sorted(measured.items(), key=lambda item: -item[1])},
+            })
+    return entries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure flag colours from the artwork and audit flags.json")
+    base_dir, source = catalog_location(os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument("--base-dir", default=base_dir)
+    parser.add_argument("--source", default=source, help="catalog file inside the base directory")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--min-fraction", type=float, default=MIN_FRACTION,
+                        help="area a colour must cover to count as present")
+    parser.add_argument("--report", default=None, help="where to write the JSON report")
+    args = parser.parse_args(argv)
+
+    catalog, results, hashed, analysed = tag_images(args.base_dir, args.source, args.workers)
+    entries = audit(catalog, results, args.min_fraction)
+    report = args.report or report_path(catalog.source)
+    with open(report, "w", encoding="utf-8") as f:
+        json.dump({"min_fraction": args.min_fraction, "images": len(results), "flags": entries}, f, indent=2, ensure_ascii=False)
+
+    print(f"{len(results)} images ({hashed} hashed, {analysed} analysed); {len(entries)} flags disagree with flags.json")
+    for name in PALETTE.names:
+        missing = sum(name in e["missing"] for e in entries)
+        extra = sum(name in e["extra"] for e in entries)
+        if missing or extra:
+            print(f"  {name:8} tagged but not found {missing:4}   found but not tagged {extra:4}")
+    print(f"Wrote {report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+import unicodedata
+from collections import namedtuple
+
+from flag_index import _positions_to_mask
+
+# -------------------------
+# Term resolution
+# -------------------------
+# Turns what people type into catalog terms: exact colours/patterns first,
+# then synonyms ("gold" -> yellow, "stripes" -> horizontal or vertical),
+# colour codes ("#ce1126" -> red, the nearest named colour in Lab) and
+# shades the catalog has no colour for ("grey", by the same measure),
+# then exact country names (accent-folded, so "aland islands" finds Åland
+# Islands), then near misses ("horizantal", "Columbia"). The attribute
+# vocabulary is tiny and sits in a BK-tree; country names can run to
+# hundreds of thousands, so they are looked up in the catalog's name index
+# (flag_names.py), which is built the first time a name is needed.
+
+KINDS = ("colour", "pattern", "country")
+MAX_MATCHES = 5
+MEMO_SIZE = 4096
+
+Resolution = namedtuple("Resolution", "term kind matches method")
+# matches: tuple of (kind, name), ORed together when there are several;
+# method: "exact", "synonym", "colour code", "shade", "fuzzy" or None when
+# nothing matched
+
+SYNONYMS = {
+    # Heraldic silver (argent) is drawn white. Grey and silver aren't
+    # catalog colours, so they are SHADES below. Heraldic "or" would clash
+    # with the query keyword.
+    "argent": ("white",),
+    "gold": ("yellow",), "golden": ("yellow",),
+    "crimson": ("red",), "scarlet": ("red",), "gules": ("red",),
+    "navy": ("blue",), "azure": ("blue",), "sky blue": ("blue",), "light blue": ("blue",),
+    "emerald": ("green",), "vert": ("green",),
+    "sable": ("black",),
+    "tan": ("brown",), "beige": ("brown",),
+    "burgundy": ("maroon",), "wine": ("maroon",),
+    "amber": ("orange",), "saffron": ("orange",),
+    "stripes": ("horizontal", "vertical"), "striped": ("horizontal", "vertical"),
+    "bands": ("horizontal", "vertical"), "tricolour": ("horizontal", "vertical"),
+    "tricolor": ("horizontal", "vertical"), "bars": ("vertical",), "pales": ("vertical",),
+    "fesses": ("horizontal",),
+    "moon": ("crescent",), "sun": ("circle",), "disc": ("circle",), "disk": ("circle",),
+    "saltire": ("cross", "diagonal"), "nordic cross": ("cross",),
+    "chevron": ("triangle",), "hoist triangle": ("triangle",),
+    "coat of arms": ("crest",), "emblem": ("crest",), "seal": ("crest",),
+    "sword": ("weapon",), "swords": ("weapon",), "gun": ("weapon",), "rifle": ("weapon",),
+    "spear": ("weapon",), "text": ("writing",), "inscription": ("writing",),
+    "words": ("writing",), "script": ("writing",), "zig zag": ("zigzag",), "serrated": ("zigzag",),
+    "wyvern": ("dragon",),
+}
+
+# Colour words with no catalog colour of their own; each goes to whichever
+# catalog colour is nearest, like a colour code
+SHADES = {
+    "grey": (128, 128, 128), "gray": (128, 128, 128), "silver": (192, 192, 192),
+}
+
+
+def normalize(text):
+    # Lower case, accents stripped, whitespace collapsed
+    folded = unicodedata.normalize("NFKD", text)
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    return " ".join(folded.lower().split())
+
+
+def max_distance(term):
+    # Edits tolerated for a term of this length
+    if len(term) <= 3:
+        return 0
+    return 1 if len(term) <= 5 else 2
+
+
+def edit_distance(a, b, limit):
+    # Levenshtein distance, giving up (limit + 1) once it must exceed limit
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        best = i
+        for j, cb in enumerate(b, 1):
+            value = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+            cur.append(value)
+            if value < best:
+                best = value
+        if best > limit:
+            return limit + 1
+        prev = cur
+    return prev[-1]
+
+
+class BKTree:
+    def __init__(self, words=()):
+        self.root = None
+        for word in words:
+            self.add(word)
+
+    def add(self, word):
+        if self.root is None:
+            self.root = (word, {})
+            return
+        node = self.root
+        while True:
+            d = edit_distance(word, node[0], len(word) + len(node[0]))
+            if d == 0:
+                return
+            child = node[1].get(d)
+            if child is None:
+                node[1][d] = (word, {})
+                return
+            node = child
+
+    def search(self, word, limit):
+        # (distance, word) for every word within limit edits
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            # Past limit + the farthest child, neither this node nor any
+            # child can match, so the exact distance doesn't matter
+            d = edit_distance(word, node[0], limit + max(node[1], default=0))
+            if d <= limit:
+                found.append((d, node[0]))
+            for dist, child in node[1].items():
+                if d - limit <= dist <= d + limit:
+                    stack.append(child)
+        return found
+
+
+class TermResolver:
+    def __init__(self, index, names=None):
+        # names: callable returning the catalog's NameIndex (Catalog.names);
+        # without one an index is built over index.flags when first needed
+        self.index = index
+        self._name_source = names
+        self.vocab = {c: ("colour", c) for c in index.colours}
+        self.vocab.update((p, ("pattern", p)) for p in index.patterns)
+        self.synonyms = {}
+        for word, names in SYNONYMS.items():
+            matches = tuple(self.vocab[name] for name in names if name in self.vocab)
+            if matches and word not in self.vocab:
+                self.synonyms[word] = matches
+        self.tree = BKTree(sorted(self.vocab) + sorted(self.synonyms))
+        self._names = None
+        self._palette = None
+        self._country_masks = {}
+        # The same few terms are resolved again on every keystroke
+        self._memo = {}
+
+    @property
+    def names(self):
+        if self._names is None:
+            if self._name_source is not None:
+                self._names = self._name_source()
+            else:
+                from flag_names import NameIndex
+                self._names = NameIndex(self.index.flags)
+        return self._names
+
+    def resolve(self, term, kinds=KINDS):
+        key = (term, kinds)
+        res = self._memo.get(key)
+        if res is None:
+            if len(self._memo) >= MEMO_SIZE:
+                self._memo.clear()
+            res = self._memo[key] = self._resolve(term, kinds)
+        return res
+
+    def _resolve(self, term, kinds):
+        text = normalize(term)
+        vocab = self.vocab.get(text)
+        if vocab and vocab[0] in kinds:
+            return Resolution(term, vocab[0], (vocab,), "exact")
+
+        matches = tuple(m for m in self.synonyms.get(text, ()) if m[0] in kinds)
+        if matches:
+            return Resolution(term, matches[0][0], matches, "synonym")
+
+        if "colour" in kinds and text.startswith(("#", "rgb(")):
+            match = self._colour_code(text)
+            if match:
+                return Resolution(term, "colour", (match,), "colour code")
+
+        if "colour" in kinds and text in SHADES and text not in self.vocab:
+            match = self._nearest(SHADES[text])
+            if match:
+                return Resolution(term, "colour", (match,), "shade")
+
+        if "country" in kinds and self.names.positions(text):
+            return Resolution(term, "country", (("country", text),), "exact")
+
+        limit = max_distance(text)
+        if limit:
+            # Ranked by distance, real terms ahead of synonyms at a tie
+            found = []
+            for d, word in self.tree.search(text, limit):
+                rank = (d, word in self.synonyms)
+                for match in self.synonyms.get(word) or (self.vocab[word],):
+                    if match[0] in kinds:
+                        found.append((rank, match))
+            if "country" in kinds and not found:
+                found = [((d, False), ("country", name)) for d, name in self.names.fuzzy(text, limit)]
+            if found:
+                best = min(rank for rank, _ in found)
+                matches = tuple(sorted({m for rank, m in found if rank == best}))[:MAX_MATCHES]
+                return Resolution(term, matches[0][0], matches, "fuzzy")
+
+        return Resolution(term, None, (), None)
+
+    def _colour_code(self, text):
+        # ("colour", nearest catalog colour) for a hex/rgb() code, or None
+        from flag_colour import parse_colour_code
+        rgb = parse_colour_code(text)
+        if rgb is None:
+            return None
+        return self._nearest(rgb)
+
+    def _nearest(self, rgb):
+        # NumPy is only imported once somebody asks for a colour this way
+        from flag_colour import NAMED_COLOURS, Palette
+        if self._palette is None:
+            self._palette = Palette({n: s for n, s in NAMED_COLOURS.items() if n in self.index.colour_bits})
+        if not self._palette.names:
+            return None
+        return ("colour", self._palette.name_of(rgb))
+
+    def mask(self, kind, name):
+        if kind == "colour":
+            return self.index.colour_bits.get(name, 0)
+        if kind == "pattern":
+            return self.index.pattern_bits.get(name, 0)
+        mask = self._country_masks.get(name)
+        if mask is None:
+            positions = self.names.positions(name)
+            mask = self._country_masks[name] = _positions_to_mask(positions, self.index.size)
+        return mask
+
+    def country_name(self, name):
+        # Display name for a normalized country name
+        return self.names.flags[self.names.positions(name)[0]]["country"]
+
+
+def describe_resolutions(resolver, resolutions):
+    # Short note on the terms that weren't taken literally, for the UI
+    notes = []
+    for res in resolutions:
+        if res.method == "exact":
+            continue
+        if not res.matches:
+            notes.append(f'no match for "{res.term}"')
+            continue
+        names = [resolver.country_name(n) if k == "country" else n for k, n in res.matches]
+        notes.append(f'"{res.term}" → {" or ".join(names)}')
+    return "; ".join(notes)
@@ -0,0 +1,183 @@
+import math
+import re
+import struct
+
+import numpy as np
+
+from flag_terms import normalize
+
+# -------------------------
+# Fun fact full-text index
+# -------------------------
+# BM25 over every flag's fun_fact. Words are accent-folded, lower-cased and
+# cut down to a rough stem ("eagles" -> "eagl", "independence" and
+# "independent" -> "independ"), and each stem keeps a postings list of
+# (flag position, term frequency). The lists sit in flat uint32 arrays, so
+# the compiled catalog stores them as they are and the loader maps them
+# without copying; a query is one vectorized pass per query word.
+
+K1 = 1.2
+B = 0.75
+DEFAULT_LIMIT = 50
+
+_WORDS = re.compile(r"[^\W_]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be been by for from has have in is it its of on or "
+    "since that the their this to was were which with".split()
+)
+
+# Tried longest first; the stem left behind must keep at least 3 letters
+_SUFFIXES = (
+    "ations", "ation", "ements", "ement", "ments", "ment", "ness", "ence", "ance",
+    "ing", "ity", "ism", "ist", "ent", "ant", "ed", "ly", "al",
+)
+
+HEADER = struct.Struct("<IIII")
+# docs, terms, postings, bytes of term text
+
+
+def stem(word):
+    if len(word) <= 3:
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        word = word[:-3] + "y"
+    elif word.endswith(("sses", "xes", "zes", "ches", "shes")):
+        word = word[:-2]
+    elif word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        word = word[:-1]
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    if word.endswith("e") and len(word) > 4:
+        word = word[:-1]
+    return word
+
+
+def tokenize(text):
+    # Single letters are mostly the s of a possessive
+    return [stem(w) for w in _WORDS.findall(normalize(text)) if len(w) > 1 and w not in STOPWORDS]
+
+
+class TextIndex:
+    def __init__(self, terms, offsets, docs, tfs, lengths):
+        # terms: stem -> id; postings of term t are docs/tfs[offsets[t]:offsets[t + 1]]
+        self.terms = terms
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.lengths = lengths
+        self.size = len(lengths)
+        avgdl = float(lengths.mean()) if self.size and lengths.any() else 1.0
+        # The length part of the BM25 denominator, once per flag
+        self._norm = (K1 * (1 - B + B * lengths / avgdl)).astype(np.float32)
+
+    @classmethod
+    def build(cls, flags):
+        postings = {}
+        lengths = np.zeros(len(flags), dtype=np.uint32)
+        for pos, flag in enumerate(flags):
+            words = tokenize(flag.get("fun_fact") or "")
+            lengths[pos] = len(words)
+            counts = {}
+            for word in words:
+                counts[word] = counts.get(word, 0) + 1
+            for word, tf in counts.items():
+                postings.setdefault(word, []).append((pos, tf))
+        terms = {word: i for i, word in enumerate(sorted(postings))}
+        offsets = [0]
+        docs, tfs = [], []
+        for word in terms:
+            for pos, tf in postings[word]:
+                docs.append(pos)
+                tfs.append(tf)
+            offsets.append(len(docs))
+        return cls(
+            terms,
+            np.array(offsets, dtype=np.uint32),
+            np.array(docs, dtype=np.uint32),
+            np.array(tfs, dtype=np.uint32),
+            lengths,
+        )
+
+    def to_bytes(self):
+        # Header, then lengths, offsets, docs, tfs as uint32 arrays (all
+        # 4-byte aligned), then term character offsets and the utf-8 text
+        words = list(self.terms)
+        text = "".join(words)
+        char_offsets = [0]
+        for word in words:
+            char_offsets.append(char_offsets[-1] + len(word))
+        blob = text.encode("utf-8")
+        return b"".join((
+            HEADER.pack(self.size, len(words), len(self.docs), len(blob)),
+            self.lengths.astype("<u4").tobytes(),
+            self.offsets.astype("<u4").tobytes(),
+            self.docs.astype("<u4").tobytes(),
+            self.tfs.astype("<u4").tobytes(),
+            np.array(char_offsets, dtype="<u4").tobytes(),
+            blob,
+        ))
+
+    @classmethod
+    def from_buffer(cls, buf, offset=0):
+        # The arrays are views into buf (e.g. the mapped catalog)
+        n, n_terms, n_postings, n_blob = HEADER.unpack_from(buf, offset)
+        offset += HEADER.size
+
+        def array(count):
+            nonlocal offset
+            values = np.frombuffer(buf, dtype="<u4", count=count, offset=offset)
+            offset += 4 * count
+            return values
+
+        lengths = array(n)
+        offsets = array(n_terms + 1)
+        docs = array(n_postings)
+        tfs = array(n_postings)
+        char_offsets = array(n_terms + 1).tolist()
+        text = bytes(buf[offset:offset + n_blob]).decode("utf-8")
+        terms = {text[start:end]: i for i, (start, end) in enumerate(zip(char_offsets, char_offsets[1:]))}
+        return cls(terms, offsets, docs, tfs, lengths)
+
+    def idf(self, term_id):
+        df = int(self.offsets[term_id + 1] - self.offsets[term_id])
+        return math.log(1 + (self.size - df + 0.5) / (df + 0.5))
+
+    def scores(self, text):
+        # (positions, scores) of every flag matching at least one word
+        term_ids = sorted({self.terms[w] for w in tokenize(text) if w in self.terms})
+        if not term_ids:
+            return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.float32)
+        # Only the postings are touched, never an array the size of the
+        # catalog, so rare words stay cheap however many flags there are
+        positions, weights = [], []
+        for term_id in term_ids:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.docs[start:end]
+            tf = self.tfs[start:end].astype(np.float32)
+            positions.append(docs)
+            weights.append(self.idf(term_id) * tf * (K1 + 1) / (tf + self._norm[docs]))
+        if len(term_ids) == 1:
+            # Postings are in catalog order with each flag once
+            return positions[0], weights[0]
+        positions, flag_ids = np.unique(np.concatenate(positions), return_inverse=True)
+        scores = np.bincount(flag_ids, weights=np.concatenate(weights)).astype(np.float32)
+        return positions, scores
+
+    def search(self, text, limit=DEFAULT_LIMIT, mask=None):
+        # Best-first (position, score) pairs, ties in catalog order. mask
+        # keeps only the flags whose bit is set in it.
+        positions, scores = self.scores(text)
+        if mask is not None and len(positions):
+            bits = np.frombuffer(mask.to_bytes((self.size + 7) // 8, "little"), dtype=np.uint8)
+            keep = np.unpackbits(bits, bitorder="little")[positions].astype(bool)
+            positions, scores = positions[keep], scores[keep]
+        if limit is not None and len(positions) > limit:
+            # Only flags scoring at least the limit-th best need sorting
+            cutoff = np.partition(scores, len(scores) - limit)[len(scores) - limit]
+            top = scores >= cutoff
+            positions, scores = positions[top], scores[top]
+        order = np.lexsort((positions, -scores))[:limit]
+        return list(zip(positions[order].tolist(), scores[order].tolist()))
@@ -0,0 +1,233 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from flag_catalog import DEFAULT_SOURCE, catalog_location, load_catalog
+
+# -------------------------
+# Thumbnail cache
+# -------------------------
+# Every flag is pre-scaled into each of SIZES and written to CACHE_DIR as
+# <sha1 of the original png>_<w>x<h>.png. manifest.json maps each original
+# (by path, size and mtime) to its hash so the apps can find a thumbnail
+# with one stat() instead of reading or decoding the full-resolution file.
+
+SIZES = ((80, 50), (160, 100), (320, 200))
+CACHE_DIR = ".thumbnails"
+MANIFEST = "manifest.json"
+
+
+def _thumb_name(digest, size):
+    return f"{digest}_{size[0]}x{size[1]}.png"
+
+
+def _write_variants(data, digest, cache_dir):
+    with Image.open(data) as img:
+        img = img.convert("RGBA")
+        # Scale down from the largest variant so each original is only
+        # resampled at full resolution once
+        for size in sorted(SIZES, reverse=True):
+            img = img.resize(size, Image.LANCZOS, reducing_gap=3.0)
+            out = os.path.join(cache_dir, _thumb_name(digest, size))
+            # Unique per writer: app threads and build workers can be
+            # writing the same thumbnail at once
+            fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                img.save(f, "PNG")
+            os.replace(tmp, out)
+
+
+def _build_one(job):
+    base_dir, cache_dir, rel_path = job
+    full_path = os.path.join(base_dir, rel_path)
+    try:
+        stat = os.stat(full_path)
+        with open(full_path, "rb") as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return rel_path, None
+    digest = hashlib.sha1(raw).hexdigest()
+    if not all(os.path.exists(os.path.join(cache_dir, _thumb_name(digest, s))) for s in SIZES):
+        _write_variants(io.BytesIO(raw), digest, cache_dir)
+    return rel_path, [stat.st_size, stat.st_mtime_ns, digest]
+
+
+class ThumbnailCache:
+    def __init__(self, base_dir, cache_dir=None):
+        self.base_dir = base_dir
+        self.cache_dir = cache_dir or os.path.join(base_dir, CACHE_DIR)
+        self.entries = {}
+        try:
+            with open(os.path.join(self.cache_dir, MANIFEST), "r", encoding="utf-8") as f:
+                self.entries = json.load(f)["files"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _digest(self, rel_path):
+        stat = os.stat(os.path.join(self.base_dir, rel_path))
+        entry = self.entries.get(rel_path)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2], None
+        # Not in the manifest (or changed since the last build): hash the
+        # original, which is still much cheaper than decoding it
+        with open(os.path.join(self.base_dir, rel_path), "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha1(raw).hexdigest()
+        self.entries[rel_path] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest, raw
+
+    def digest(self, rel_path):
+        return self._digest(rel_path)[0]
+
+    def path(self, rel_path, size=SIZES[0]):
+        digest, raw = self._digest(rel_path)
+        thumb = os.path.join(self.cache_dir, _thumb_name(digest, size))
+        if not os.path.exists(thumb):
+            # Cache miss: decode the original once and write every variant
+            if raw is None:
+                with open(os.path.join(self.base_dir, rel_path), "rb") as f:
+                    raw = f.read()
+            os.makedirs(self.cache_dir, exist_ok=True)
+            _write_variants(io.BytesIO(raw), digest, self.cache_dir)
+        return thumb
+
+    def load(self, rel_path, size=SIZES[0]):
+        with Image.open(self.path(rel_path, size)) as img:
+            img.load()
+        return img
+
+
+# -------------------------
+# Atlas
+# -------------------------
+# One sprite sheet per thumbnail size with every flag packed into a grid,
+# plus atlas_<w>x<h>.json holding each flag's rectangle and the thumbnail
+# hash it was packed from. The sheet's name carries its own hash so web
+# clients can cache it forever.
+
+def atlas_index_name(size):
+    return f"atlas_{size[0]}x{size[1]}.json"
+
+
+class ThumbnailAtlas:
+    def __init__(self, cache, size=SIZES[0]):
+        self.cache = cache
+        self.size = size
+        self.image_path = None
+        self.rects = {}
+        self._image = None
+        try:
+            with open(os.path.join(cache.cache_dir, atlas_index_name(size)), "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.image_path = os.path.join(cache.cache_dir, index["image"])
+        self.width, self.height = index["width"], index["height"]
+        # Only trust rectangles packed from the thumbnail the manifest
+        # currently points at
+        for rel_path, (x, y, digest) in index["rects"].items():
+            entry = cache.entries.get(rel_path)
+            if entry and entry[2] == digest:
+                self.rects[rel_path] = (x, y, x + size[0], y + size[1])
+
+    def rect(self, rel_path):
+        return self.rects.get(rel_path)
+
+    def image(self):
+        if self._image is None:
+            with Image.open(self.image_path) as img:
+                img.load()
+            self._image = img
+        return self._image
+
+    def crop(self, rel_path):
+        rect = self.rects.get(rel_path)
+        if rect is None:
+            return self.cache.load(rel_path, self.size)
+        return self.image().crop(rect)
+
+
+def build_atlas(cache, files, size=SIZES[0]):
+    packed = [rel_path for rel_path in files if rel_path in cache.entries]
+    columns = max(1, int(len(packed) ** 0.5 + 0.999))
+    rows = max(1, (len(packed) + columns - 1) // columns)
+    sheet = Image.new("RGBA", (columns * size[0], rows * size[1]), (0, 0, 0, 0))
+
+    rects = {}
+    for i, rel_path in enumerate(packed):
+        x, y = (i % columns) * size[0], (i // columns) * size[1]
+        digest = cache.entries[rel_path][2]
+        with Image.open(os.path.join(cache.cache_dir, _thumb_name(digest, size))) as thumb:
+            sheet.paste(thumb, (x, y))
+        rects[rel_path] = [x, y, digest]
+
+    buf = io.BytesIO()
+    sheet.save(buf, "PNG", optimize=True)
+    data = buf.getvalue()
+    image_name = f"atlas_{size[0]}x{size[1]}_{hashlib.sha1(data).hexdigest()[:16]}.png"
+    with open(os.path.join(cache.cache_dir, image_name), "wb") as f:
+        f.write(data)
+
+    index_path = os.path.join(cache.cache_dir, atlas_index_name(size))
+    with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "image": image_name, "width": sheet.width, "height": sheet.height, "rects": rects}, f)
+    os.replace(index_path + ".tmp", index_path)
+
+    # Drop sheets left over from earlier builds
+    prefix = f"atlas_{size[0]}x{size[1]}_"
+    for name in os.listdir(cache.cache_dir):
+        if name.startswith(prefix) and name.endswith(".png") and name != image_name:
+            os.remove(os.path.join(cache.cache_dir, name))
+    return image_name
+
+
+# -------------------------
+# Build
+# -------------------------
+def build_thumbnails(base_dir, cache_dir=None, workers=None, atlas=False, source=DEFAULT_SOURCE):
+    cache_dir = cache_dir or os.path.join(base_dir, CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+    catalog = load_catalog(base_dir, source)
+    files = sorted({flag["file"] for flag in catalog.flags})
+
+    jobs = [(base_dir, cache_dir, rel_path) for rel_path in files]
+    entries = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for rel_path, entry in pool.map(_build_one, jobs, chunksize=8):
+            if entry:
+                entries[rel_path] = entry
+
+    tmp = os.path.join(cache_dir, MANIFEST + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "sizes": SIZES, "files": entries}, f)
+    os.replace(tmp, os.path.join(cache_dir, MANIFEST))
+
+    if atlas:
+        cache = ThumbnailCache(base_dir, cache_dir)
+        for size in SIZES:
+            build_atlas(cache, files, size)
+    return len(entries), len(files) - len(entries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the Flag Finder thumbnail cache")
+    base_dir, source = catalog_location(os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument("--base-dir", default=base_dir)
+    parser.add_argument("--source", default=source, help="catalog file inside the base directory")
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--atlas", action="store_true", help="also pack each size into a single sprite sheet")
+    args = parser.parse_args(argv)
+
+    built, missing = build_thumbnails(args.base_dir, args.cache_dir, args.workers, args.atlas, args.source)
+    print(f"Cached {built} flags ({missing} missing originals)")
+
+
+if __name__ == "__main__":
+    main()
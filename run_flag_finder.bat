@@ -1,2 +1,6 @@
 cd /d "C:\Users\charl\OneDrive\Coding\Python\Flag Finder"
+python flag_catalog.py build-catalog
+python flag_thumbnails.py --atlas
+python flag_features.py
+python flag_tagging.py
 streamlit run flag_finder_streamlit.py
\ No newline at end of file